@@ -0,0 +1,91 @@
+"""
+Micro-benchmark: per-frame cost of the float brightness path vs the lookup table path.
+
+Runs under CPython from the repository root:
+    python benchmarks/bench_brightness.py
+or on the Pico, after uploading it alongside colour.py.
+"""
+
+import sys
+
+try:
+    from time import ticks_us, ticks_diff
+except ImportError:
+    # CPython
+    import os
+    from time import perf_counter_ns
+    
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    
+    def ticks_us():
+        return perf_counter_ns() // 1000
+    
+    def ticks_diff(a, b):
+        return a - b
+
+import colour
+
+
+FRAMES = 2000
+NUMBER_OF_LEDS = 12
+BRIGHTNESS = 0.37
+
+
+def float_frame(buf, col):
+    # the previous adjust_brightness() + write_all_leds() path
+    col = [c * BRIGHTNESS for c in col]
+    col = [int(c) for c in col]
+    col = tuple(col)
+    for i in range(NUMBER_OF_LEDS):
+        offset = i * 4
+        for j in range(4):
+            buf[offset + j] = col[j]
+
+
+def lut_frame(buf, pattern, col, level):
+    # the lookup table path: brightness applied once, to the preallocated pattern
+    lut = colour.brightness_lut(level)
+    for i in range(4):
+        pattern[i] = lut[col[i]]
+    for offset in range(0, len(buf), 4):
+        for j in range(4):
+            buf[offset + j] = pattern[j]
+
+
+def float_brightness(col):
+    return [int(c * BRIGHTNESS) for c in col]
+
+
+def lut_brightness(pattern, col, level):
+    lut = colour.brightness_lut(level)
+    for i in range(4):
+        pattern[i] = lut[col[i]]
+
+
+def run(name, frame, *args):
+    start = ticks_us()
+    for _ in range(FRAMES):
+        frame(*args)
+    elapsed = ticks_diff(ticks_us(), start)
+    print(f"{name}: {elapsed / FRAMES:.2f} us/frame")
+    return elapsed
+
+
+def main():
+    buf = bytearray(NUMBER_OF_LEDS * 4)
+    pattern = bytearray(4)
+    col = [255, 255, 102, 255]
+    level = colour.brightness_to_level(BRIGHTNESS)
+    
+    print("brightness step only")
+    float_us = run("  float", float_brightness, col)
+    lut_us = run("  lut", lut_brightness, pattern, col, level)
+    print(f"  speed-up: {float_us / lut_us:.2f}x")
+    
+    print(f"whole frame, {NUMBER_OF_LEDS} RGBW LEDs")
+    float_us = run("  float", float_frame, buf, col)
+    lut_us = run("  lut", lut_frame, buf, pattern, col, level)
+    print(f"  speed-up: {float_us / lut_us:.2f}x")
+
+
+main()
@@ -0,0 +1,204 @@
+"""
+Render benchmark for every LED mode, at several string lengths.
+
+Each mode runs on the host stand-ins (see host/) in virtual time, driven by the real
+frame scheduler. Every scheduler tick that produces a frame is timed, and separately
+traced for allocations. Results are printed as JSON, so runs can be compared.
+
+From the repository root:
+    python benchmarks/bench_render.py
+    python benchmarks/bench_render.py --leds 12,60,300 --output bench.json
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import host  # noqa: E402
+from host.clock import Clock  # noqa: E402
+
+clock = Clock(virtual=True)
+host.install(clock)
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import platform  # noqa: E402
+import time  # noqa: E402
+import tracemalloc  # noqa: E402
+
+import uasyncio  # noqa: E402
+
+from brightness_control import brightness_control  # noqa: E402
+from host import virtual  # noqa: E402
+from leds import LEDController  # noqa: E402
+from renderer import renderer  # noqa: E402
+from scheduler import Alarm  # noqa: E402
+
+
+async def hold_brightness_button(controller):
+    # white is static, so only re-renders on brightness changes - hold the button to force them
+    direction = 1
+    while True:
+        brightness_control.brightness = min(1, max(0, brightness_control.brightness + 0.01 * direction))
+        if brightness_control.brightness in (0, 1):
+            direction = -direction
+        await uasyncio.sleep(0.025)
+
+
+async def turn_on(controller):
+    controller.turn_on()
+    task = uasyncio.create_task(hold_brightness_button(controller))
+    await uasyncio.sleep(5)
+    task.cancel()
+
+
+async def turn_on_rainbow(controller):
+    controller.turn_on_rainbow()
+    await uasyncio.sleep(5)
+
+
+async def alarm_mode(controller):
+    await controller.alarm_mode(Alarm(6, 35, fade_in_s=5, fade_out_s=5))
+
+
+async def fadeout_leds(controller):
+    controller.write_all_leds(controller.adjust_for_rgbw([255, 255, 255]))
+    await uasyncio.sleep(0.1)
+    await controller.fadeout_leds(fade_duration=5)
+
+
+async def flash_clock(controller):
+    await controller.flash_alarm_time_indicator((11, 55))
+
+
+MODES = {
+    "turn_on": turn_on,
+    "turn_on_rainbow": turn_on_rainbow,
+    "alarm_mode": alarm_mode,
+    "fadeout_leds": fadeout_leds,
+    "flash_clock": flash_clock,
+}
+
+
+def frames_shown(controller) -> int:
+    shown = 0
+    for written, skipped in controller.frame_counts.values():
+        shown += written + skipped
+    return shown
+
+
+def run_mode(mode: str, number_of_leds: int, trace_allocations: bool) -> list:
+    """
+    Runs one mode to completion in virtual time.
+
+    Returns:
+        per-frame samples: ns of CPU time, or bytes allocated if trace_allocations
+    """
+
+    controller = LEDController(
+        leds_pin=4,
+        mode_button_pin=12,
+        number_of_leds=number_of_leds,
+        led_function="sunrise",
+        led_type="rgbw",
+        )
+    controller.neopix.max_frames = 0
+    renderer.controllers = [controller]
+    # asyncio binds events to the first loop that waits on them, and each run gets a new loop
+    renderer.wake_event = uasyncio.Event()
+    brightness_control.brightness = 0.5
+
+    samples = []
+    render_frame = renderer.render_frame
+
+    def measured_render_frame(now):
+        shown = frames_shown(controller)
+        if trace_allocations:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            result = render_frame(now)
+            sample = tracemalloc.get_traced_memory()[1] - before
+        else:
+            start = time.perf_counter_ns()
+            result = render_frame(now)
+            sample = time.perf_counter_ns() - start
+        # only ticks that produced a frame count
+        if frames_shown(controller) != shown:
+            samples.append(sample)
+        return result
+
+    async def scenario():
+        render_task = uasyncio.create_task(renderer.run())
+        await MODES[mode](controller)
+        render_task.cancel()
+        try:
+            await render_task
+        except uasyncio.CancelledError:
+            pass
+
+    renderer.render_frame = measured_render_frame
+    if trace_allocations:
+        tracemalloc.start()
+    try:
+        virtual.run(scenario(), clock)
+    finally:
+        if trace_allocations:
+            tracemalloc.stop()
+        del renderer.render_frame
+
+    return samples
+
+
+def benchmark(mode: str, number_of_leds: int) -> dict:
+
+    times = run_mode(mode, number_of_leds, trace_allocations=False)
+    allocations = run_mode(mode, number_of_leds, trace_allocations=True)
+
+    us_per_frame = sum(times) / len(times) / 1000
+
+    return {
+        "mode": mode,
+        "leds": number_of_leds,
+        "frames": len(times),
+        "us_per_frame": round(us_per_frame, 2),
+        "us_per_frame_max": round(max(times) / 1000, 2),
+        "max_fps": round(1000000 / us_per_frame),
+        "alloc_bytes_per_frame": round(sum(allocations) / len(allocations), 1),
+    }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leds", default="12,60,300", help="comma separated string lengths")
+    parser.add_argument("--modes", default=",".join(MODES), help="comma separated modes")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = []
+    # keep the lamp's own prints off stdout, which carries the results
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        for number_of_leds in [int(n) for n in args.leds.split(",")]:
+            for mode in args.modes.split(","):
+                results.append(benchmark(mode, number_of_leds))
+    finally:
+        sys.stdout = stdout
+
+    report = {
+        "python": platform.python_implementation() + " " + platform.python_version(),
+        "note": "allocations are CPython heap bytes; MicroPython small ints and bytearray writes do not allocate",
+        "results": results,
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
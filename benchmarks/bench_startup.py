@@ -0,0 +1,122 @@
+"""
+Startup benchmark: runs main.main() on the host stand-ins in virtual time, presses the
+brightness button straight away, and reports when the button responded relative to
+when Wi-Fi came up.
+
+Wi-Fi association takes --connect-ms, and the access point can be made unreachable for
+the first --ap-down-s seconds, to exercise the reconnect backoff. The HTTP listener isn't
+started and NTP queries are answered from the host clock (there are no sockets in virtual
+time, and no DNS lookups should be made).
+
+From the repository root:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --connect-ms 8000 --ap-down-s 60
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import host  # noqa: E402
+from host.clock import Clock  # noqa: E402
+
+clock = Clock(virtual=True)
+host.install(clock)
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+
+import uasyncio  # noqa: E402
+
+import network  # noqa: E402
+from host import virtual  # noqa: E402
+
+
+async def scenario(args) -> dict:
+
+    import main
+    from brightness_control import brightness_control
+    from ntp import NTPClient
+    from server import HTTPServer
+    from telemetry import telemetry
+
+    async def no_listener(self):
+        pass
+
+    async def host_time(self, server):
+        return round(clock.epoch() * 1000), time.ticks_ms()
+
+    HTTPServer.start_server = no_listener
+    NTPClient.query = host_time
+
+    network.WLAN.connect_ms = args.connect_ms
+    network.WLAN.available = args.ap_down_s == 0
+
+    start = time.ticks_ms()
+    uasyncio.create_task(main.main())
+
+    # press and hold the brightness button as soon as the program is running
+    await uasyncio.sleep_ms(0)
+    pressed_ms = time.ticks_ms()
+    brightness = brightness_control.brightness
+    brightness_control.pin.inject(0)
+    while brightness_control.brightness == brightness:
+        await uasyncio.sleep_ms(1)
+    button_response_ms = time.ticks_diff(time.ticks_ms(), pressed_ms)
+    brightness_control.pin.inject(1)
+
+    if args.ap_down_s:
+        await uasyncio.sleep(args.ap_down_s)
+        network.WLAN.available = True
+
+    while "wifi_connected" not in telemetry.marks:
+        await uasyncio.sleep(1)
+
+    # stop main() and every task it started
+    tasks = [task for task in uasyncio.all_tasks() if task is not uasyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        try:
+            await task
+        except uasyncio.CancelledError:
+            pass
+
+    return {
+        "connect_ms": args.connect_ms,
+        "ap_down_s": args.ap_down_s,
+        "button_response_ms": button_response_ms,
+        "milestones_ms": {name: time.ticks_diff(ms, start) for name, ms in telemetry.marks.items()},
+        "wifi_attempts": telemetry.wakeups.get("wifi", 0),
+    }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connect-ms", type=int, default=3000, help="Wi-Fi association time")
+    parser.add_argument("--ap-down-s", type=int, default=0, help="access point unreachable for this long")
+    args = parser.parse_args()
+
+    # main.py reads secrets.json, and the logger writes to the working directory
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        with open("secrets.json", "w") as f:
+            json.dump({"ssid": "lamp", "password": "password"}, f)
+
+        # keep the lamp's own prints off stdout, which carries the results
+        stdout = sys.stdout
+        sys.stdout = sys.stderr
+        try:
+            report, _ = virtual.run(scenario(args), clock)
+        finally:
+            sys.stdout = stdout
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+HTTP load test against the lamp's server, running on the host stand-ins with both LED
+strings rendering the rainbow.
+
+The server runs in a subprocess, so client and server don't share an event loop.
+Reports requests per second and latency percentiles as JSON, along with the frame
+scheduler's tick rate meanwhile (40 if the server never holds up rendering).
+
+From the repository root:
+    python benchmarks/loadtest.py
+    python benchmarks/loadtest.py --concurrency 16 --requests 5000 --keep-alive --path /
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import host  # noqa: E402
+
+host.install()
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import json  # noqa: E402
+import signal  # noqa: E402
+import subprocess  # noqa: E402
+import time  # noqa: E402
+
+
+async def serve(port: int, max_clients: int, stats_out):
+    """
+    Run the lamp's server and renderer until SIGTERM, then write render stats as JSON to stats_out.
+    """
+
+    from leds import sunrise_led, main_led
+    from renderer import renderer
+    from server import HTTPServer
+
+    server = HTTPServer("ssid", "password")
+    server.port = port
+    server.max_clients = max_clients
+
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+
+    asyncio.create_task(renderer.run())
+    for controller in (sunrise_led, main_led):
+        controller.request_mode("rainbow")
+    await server.start_server()
+    print("ready", file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    start_ticks = renderer.tick_count
+    start_writes = sunrise_led.neopix.write_count + main_led.neopix.write_count
+
+    await stop.wait()
+
+    seconds = time.perf_counter() - start
+    stats = {
+        "seconds": round(seconds, 3),
+        "render_ticks_per_second": round((renderer.tick_count - start_ticks) / seconds, 1),
+        "frames_written": sunrise_led.neopix.write_count + main_led.neopix.write_count - start_writes,
+        "rejected_clients": server.rejected_clients,
+    }
+    print(json.dumps(stats), file=stats_out, flush=True)
+
+
+async def read_response(reader) -> int:
+    """
+    Read one response, by Content-Length (or to EOF if there is none).
+
+    Returns:
+        the status code
+    """
+
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode().split("\r\n")
+    status = int(lines[0].split()[1])
+
+    length = None
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+
+    if length is None:
+        await reader.read()
+    else:
+        await reader.readexactly(length)
+    return status
+
+
+async def worker(args, remaining: list, latencies: list, statuses: dict):
+
+    connection = None
+
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        start = time.perf_counter()
+
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection("127.0.0.1", args.port)
+            reader, writer = connection
+
+            header = b"keep-alive" if args.keep_alive else b"close"
+            writer.write(b"GET " + args.path.encode() + b" HTTP/1.1\r\nHost: lamp\r\nConnection: " + header + b"\r\n\r\n")
+            await writer.drain()
+            status = await read_response(reader)
+
+            if not args.keep_alive or status == 503:
+                writer.close()
+                connection = None
+
+        except (OSError, asyncio.IncompleteReadError):
+            status = "error"
+            connection = None
+
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+
+    if connection is not None:
+        connection[1].close()
+
+
+def percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def load(args) -> dict:
+
+    remaining = [args.requests]
+    latencies = []
+    statuses = {}
+
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        worker(args, remaining, latencies, statuses) for _ in range(args.concurrency)
+        ])
+    duration = time.perf_counter() - start
+
+    return {
+        "path": args.path,
+        "keep_alive": args.keep_alive,
+        "concurrency": args.concurrency,
+        "requests": len(latencies),
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "seconds": round(duration, 3),
+        "requests_per_second": round(len(latencies) / duration, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--path", default="/api/state")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--keep-alive", action="store_true", help="reuse connections")
+    parser.add_argument("--max-clients", type=int, default=8, help="server's concurrent client limit")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        # keep the lamp's own prints off stdout, which carries the stats
+        stdout = sys.stdout
+        sys.stdout = sys.stderr
+        asyncio.run(serve(args.port, args.max_clients, stdout))
+        return
+
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(args.port), "--max-clients", str(args.max_clients)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        )
+    try:
+        # wait for the server to start listening
+        for line in server.stderr:
+            if line.strip() == "ready":
+                break
+
+        report = asyncio.run(load(args))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        out, _ = server.communicate(timeout=10)
+
+    report["server"] = json.loads(out.strip().splitlines()[-1])
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 from machine import Pin
-import time
-import uasyncio
+import colour
+import debounce
+from renderer import renderer
+from state_events import state_events
+from telemetry import telemetry
 
 
 class BrightnessControl:
@@ -8,54 +11,80 @@ class BrightnessControl:
     def __init__(self, pin: int):
         
         self.pin = Pin(pin, Pin.IN, Pin.PULL_UP)
-        self.event = uasyncio.Event()
-        self.pin.irq(trigger=Pin.IRQ_FALLING, handler=self.button_irq)
+        # pin needs to be stable for a continuous 35ms; holding it steps the brightness every 25ms
+        self.debouncer = debounce.Debouncer(self.pin, stable_ms=35, repeat_ms=25)
         self.control_direction = 1
+        # perceptual curve applied to brightness - 1.0 is linear (see the gamma property)
+        self._gamma = 1.0
         self.brightness = 0.05
-
-
-    def button_irq(self, pin):
-        self.event.set()
+        
+        
+    @property
+    def brightness(self):
+        return self._brightness
+    
+    
+    @brightness.setter
+    def brightness(self, value: float):
+        self._brightness = value
+        # integer level used to select the brightness lookup table
+        self.level = colour.brightness_to_level(value)
+        # static frames (e.g. white) need re-rendering at the new brightness
+        renderer.request_redraw()
+        state_events.publish("brightness", round(100 * value))
+        
+        
+    @property
+    def gamma(self):
+        """
+        Perceptual curve applied to the brightness level. 1.0 is linear.
+        """
+        return self._gamma
+    
+    
+    @gamma.setter
+    def gamma(self, value: float):
+        self._gamma = value
+        # build the current level's table now, rather than during the next frame
+        colour.brightness_lut(self.level, value)
+        # static frames need re-rendering through the new curve
+        renderer.request_redraw()
+        
+        
+    def lut(self) -> bytearray:
+        """
+        Lookup table mapping a full-brightness channel value to its value at the current brightness.
+        Only rebuilt when the brightness or gamma changes.
+        """
+        
+        return colour.brightness_lut(self.level, self._gamma)
 
 
     async def handle_button(self):
         
         while True:
-
-            await self.event.wait()
-
-                 
-            # Debouncing - wait for pin to change value
-            # it needs to be stable for a continuous 35ms
-            active = 0
-            while active < 35:            
-                if self.pin.value() == 0:
-                    active += 1
-                else:
-                    active = 0
-                await uasyncio.sleep(0.001)
             
-            # Increase/Decrease brightness
-            while self.pin.value() == 0:
+            event = await self.debouncer.next_event()
+            telemetry.wake("brightness_button")
+            
+            # Increase/Decrease brightness while held
+            if event == debounce.PRESS or event == debounce.REPEAT:
+                brightness = self.brightness + 0.01 * self.control_direction
+                # print(round(brightness, 3))
                 
-                self.brightness += 0.01 * self.control_direction
-                # print(round(self.brightness, 3))
+                if brightness <= 0:
+                    brightness = 0
+                elif brightness >= 1:
+                    brightness = 1
                 
-                if self.brightness <= 0:
-                    self.brightness = 0
-                    break
-                elif self.brightness >= 1:
-                    self.brightness = 1
-                    break
-                else:                    
-                    await uasyncio.sleep(0.025)
+                if brightness != self.brightness:
+                    self.brightness = brightness
             
             # TODO - cap the brightness according to max current limits
             
             # flip direction setting ready for next press
-            self.control_direction = self.control_direction * -1
-            # Reset event flag for next press
-            self.event.clear()
+            elif event == debounce.RELEASE:
+                self.control_direction = self.control_direction * -1
 
 
 brightness_control = BrightnessControl(pin=3)
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""
+Colour lookup tables shared by the LED strings.
+
+Everything here is pure integer/bytearray work with no hardware imports,
+so it can also be imported on a host machine (e.g. by the benchmarks).
+"""
+
+
+# number of brightness lookup tables kept alive at once.
+# two strings at the set brightness plus an alarm fade only ever need a few.
+LUT_CACHE_SIZE = 4
+
+_luts = [bytearray(256) for _ in range(LUT_CACHE_SIZE)]
+_lut_levels = [None] * LUT_CACHE_SIZE
+_lut_gammas = [None] * LUT_CACHE_SIZE
+_next_lut_slot = 0
+
+
+def brightness_to_level(brightness: float) -> int:
+    """
+    Converts a 0-1 brightness to an integer 0-255 brightness level.
+    """
+    
+    level = int(brightness * 255 + 0.5)
+    return min(255, max(0, level))
+
+
+def fill_brightness_lut(lut: bytearray, level: int, gamma: float = 1.0):
+    """
+    Fills a 256 entry table mapping a full-brightness channel value to its dimmed value.
+
+    Args:
+        lut: bytearray(256) to fill in place
+        level: brightness level, 0-255
+        gamma: perceptual curve applied to the brightness level. 1.0 is linear.
+    """
+    
+    scale = (level / 255) ** gamma
+    for v in range(256):
+        lut[v] = int(v * scale)
+
+
+def brightness_lut(level: int, gamma: float = 1.0) -> bytearray:
+    """
+    Returns the (cached) brightness lookup table for a brightness level.
+
+    Tables are only rebuilt on a cache miss, i.e. when the brightness changes.
+    The returned table is owned by the cache - use it, don't keep it.
+
+    Args:
+        level: brightness level, 0-255
+        gamma: perceptual curve applied to the brightness level. 1.0 is linear.
+    """
+    
+    global _next_lut_slot
+    
+    for i in range(LUT_CACHE_SIZE):
+        if _lut_levels[i] == level and _lut_gammas[i] == gamma:
+            return _luts[i]
+    
+    # cache miss - overwrite the oldest table in place
+    i = _next_lut_slot
+    _next_lut_slot = (i + 1) % LUT_CACHE_SIZE
+    fill_brightness_lut(_luts[i], level, gamma)
+    _lut_levels[i] = level
+    _lut_gammas[i] = gamma
+    
+    return _luts[i]
+
+
+# fixed-point phase: the top bits index a table entry, the low PHASE_SHIFT bits are the fraction
+PHASE_SHIFT = 16
+
+# define rgb colours at 100% brightness
+RED = (255, 0, 0)
+YELLOW = (255, 150, 0)
+GREEN = (0, 255, 0)
+CYAN = (0, 255, 255)
+BLUE = (0, 0, 255)
+PURPLE = (180, 0, 255)
+
+RAINBOW_COLOURS = (RED, YELLOW, GREEN, CYAN, BLUE, PURPLE)
+
+
+def build_rainbow_table(steps_per_colour: int = 32, colours: tuple = RAINBOW_COLOURS) -> bytearray:
+    """
+    Precomputes a full colour cycle as packed RGB bytes.
+
+    Each colour is linearly interpolated to the next over steps_per_colour entries,
+    including the last colour back to the first, so the table loops seamlessly.
+
+    Args:
+        steps_per_colour: table entries per colour transition, e.g. RED to YELLOW
+        colours: sequence of (r, g, b) vertices to cycle through
+    """
+    
+    len_colours = len(colours)
+    table = bytearray(len_colours * steps_per_colour * 3)
+    
+    i = 0
+    for c in range(len_colours):
+        c0 = colours[c]
+        c1 = colours[(c + 1) % len_colours]
+        for step in range(steps_per_colour):
+            for channel in range(3):
+                table[i] = c0[channel] + ((c1[channel] - c0[channel]) * step) // steps_per_colour
+                i += 1
+    
+    return table
+
+
+# built once at import, shared by every LED string
+RAINBOW_TABLE = build_rainbow_table()
@@ -0,0 +1,46 @@
+"""
+Conversions between RTC().datetime() tuples and seconds since 1970-01-01, shared by the
+logger, the NTP client and the alarm scheduler.
+"""
+
+
+def datetime_to_epoch(datetime) -> int:
+    """
+    Seconds since 1970-01-01 for an RTC().datetime() tuple
+    (year, month, day, weekday, hours, minutes, seconds, subseconds).
+    """
+
+    year, month, day = datetime[0], datetime[1], datetime[2]
+
+    # days since 1970-01-01, counting years from March so the leap day comes last
+    if month <= 2:
+        year -= 1
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    days = era * 146097 + day_of_era - 719468
+
+    return days * 86400 + datetime[4] * 3600 + datetime[5] * 60 + datetime[6]
+
+
+def epoch_to_datetime(epoch: int) -> tuple:
+    """
+    RTC().datetime() tuple for seconds since 1970-01-01 (weekday 0 is Monday).
+    """
+
+    days, seconds = divmod(epoch, 86400)
+    weekday = (days + 3) % 7  # 1970-01-01 was a Thursday
+
+    # civil date from days since 1970-01-01, counting years from March
+    days += 719468
+    era = days // 146097
+    day_of_era = days - era * 146097
+    year_of_era = (day_of_era - day_of_era // 1460 + day_of_era // 36524 - day_of_era // 146096) // 365
+    day_of_year = day_of_era - (365 * year_of_era + year_of_era // 4 - year_of_era // 100)
+    month_index = (5 * day_of_year + 2) // 153
+    day = day_of_year - (153 * month_index + 2) // 5 + 1
+    month = month_index + 3 if month_index < 10 else month_index - 9
+    year = year_of_era + era * 400 + (1 if month <= 2 else 0)
+
+    return (year, month, day, weekday, seconds // 3600, seconds // 60 % 60, seconds % 60, 0)
@@ -0,0 +1,160 @@
+from machine import Pin
+from telemetry import telemetry
+import time
+import uasyncio
+
+
+# button events returned by Debouncer.next_event()
+PRESS = 1
+RELEASE = 2
+LONG_PRESS = 3
+REPEAT = 4
+
+
+class Debouncer:
+    """
+    Event-loop friendly button debouncer.
+
+    The IRQ handler only timestamps the edge with ticks_ms() and wakes the waiting task.
+    The task then sleeps (without blocking the event loop) until the pin has been quiet
+    for stable_ms since the last edge, and reports the settled state.
+    """
+
+    def __init__(
+        self,
+        pin: Pin,
+        stable_ms: int = 50,
+        long_press_ms: int = 0,
+        repeat_ms: int = 0,
+        pressed_value: int = 0,
+        ):
+        """
+        Args:
+            pin: input pin the button is on
+            stable_ms: time the pin must be unchanged for before a press/release counts
+            long_press_ms: if set, a LONG_PRESS event follows PRESS once held this long
+            repeat_ms: if set, REPEAT events follow PRESS at this interval while held
+            pressed_value: pin value when the button is pressed (0 for a pulled-up button)
+        """
+
+        self.pin = pin
+        self.stable_ms = stable_ms
+        self.long_press_ms = long_press_ms
+        self.repeat_ms = repeat_ms
+        self.pressed_value = pressed_value
+
+        # written by the IRQ handler
+        self.edge_event = uasyncio.Event()
+        self.edge_ms = time.ticks_ms()
+
+        # debounced state
+        self.pressed = False
+        self.press_ms = 0
+        self.long_press_sent = False
+        self.next_repeat_ms = 0
+
+        self.pin.irq(trigger=Pin.IRQ_FALLING | Pin.IRQ_RISING, handler=self.button_irq)
+
+
+    def button_irq(self, pin):
+        self.edge_ms = time.ticks_ms()
+        self.edge_event.set()
+
+
+    async def wait_for_edge(self, timeout_ms: int = None) -> bool:
+        """
+        Returns:
+            True if an edge occurred, False if timeout_ms passed first.
+        """
+
+        if timeout_ms is None:
+            # the first wait means a button is being listened to
+            telemetry.mark("buttons_ready")
+            await self.edge_event.wait()
+            return True
+
+        if timeout_ms <= 0:
+            return self.edge_event.is_set()
+
+        try:
+            await uasyncio.wait_for_ms(self.edge_event.wait(), timeout_ms)
+            return True
+        except uasyncio.TimeoutError:
+            return False
+
+
+    async def settle(self) -> int:
+        """
+        Sleep until the pin has been unchanged for stable_ms since the last edge.
+
+        Returns:
+            the settled pin value
+        """
+
+        while True:
+            wait = self.stable_ms - time.ticks_diff(time.ticks_ms(), self.edge_ms)
+            if wait <= 0:
+                break
+            await uasyncio.sleep_ms(wait)
+
+        # edges so far are accounted for
+        self.edge_event.clear()
+        return self.pin.value()
+
+
+    def next_deadline(self):
+        """
+        ms until the next LONG_PRESS or REPEAT event is due while held, or None.
+        """
+
+        now = time.ticks_ms()
+        deadline = None
+
+        if self.long_press_ms and not self.long_press_sent:
+            deadline = time.ticks_diff(time.ticks_add(self.press_ms, self.long_press_ms), now)
+
+        if self.repeat_ms:
+            repeat = time.ticks_diff(self.next_repeat_ms, now)
+            if deadline is None or repeat < deadline:
+                deadline = repeat
+
+        return deadline
+
+
+    async def next_event(self) -> int:
+        """
+        Wait for the next debounced button event.
+
+        Returns:
+            PRESS, RELEASE, LONG_PRESS or REPEAT
+        """
+
+        while True:
+
+            if not self.pressed:
+                await self.wait_for_edge()
+                if await self.settle() == self.pressed_value:
+                    self.pressed = True
+                    self.press_ms = time.ticks_ms()
+                    self.long_press_sent = False
+                    self.next_repeat_ms = time.ticks_add(self.press_ms, self.repeat_ms)
+                    return PRESS
+                continue
+
+            deadline = self.next_deadline()
+
+            if await self.wait_for_edge(deadline):
+                if await self.settle() != self.pressed_value:
+                    self.pressed = False
+                    return RELEASE
+                continue
+
+            # still held, and a timed event is due
+            if self.long_press_ms and not self.long_press_sent:
+                if time.ticks_diff(time.ticks_ms(), time.ticks_add(self.press_ms, self.long_press_ms)) >= 0:
+                    self.long_press_sent = True
+                    return LONG_PRESS
+
+            if self.repeat_ms:
+                self.next_repeat_ms = time.ticks_add(self.next_repeat_ms, self.repeat_ms)
+                return REPEAT
@@ -0,0 +1,101 @@
+"""
+CPython stand-ins for the MicroPython modules used by the lamp, so the real
+modules (leds.py, server.py, brightness_control.py, logging.py, ...) can be
+imported and run on a host machine.
+
+Usage, from the repository root:
+
+    import host
+    host.install()
+
+    import leds
+
+install() registers the stand-ins under their MicroPython names (machine,
+neopixel, rp2, network, ntptime, uasyncio), adds the MicroPython-only
+functions to time and gc, and makes `import logging` resolve to this
+repository's logging.py rather than the standard library's.
+"""
+
+import os
+import sys
+
+from host.clock import Clock
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the clock shared by every stand-in. Replaced by install(clock=...).
+clock = Clock()
+
+_installed = False
+
+
+def _import_stdlib_first():
+    # asyncio imports the standard library's logging module, which this repository's
+    # logging.py shadows whenever the repository root is on sys.path.
+    # Import it with the repository hidden, so the standard library copy is the one bound.
+    hidden = ("", ".", REPO_ROOT)
+    saved = list(sys.path)
+    sys.path[:] = [p for p in sys.path if os.path.abspath(p or ".") not in hidden and p not in hidden]
+    try:
+        if sys.modules.get("logging") is not None and not hasattr(sys.modules["logging"], "getLogger"):
+            del sys.modules["logging"]
+        import asyncio  # noqa: F401
+        import logging  # noqa: F401
+    finally:
+        sys.path[:] = saved
+
+
+def _load_repo_logging():
+    import importlib.util
+    
+    spec = importlib.util.spec_from_file_location("logging", os.path.join(REPO_ROOT, "logging.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["logging"] = module
+    spec.loader.exec_module(module)
+
+
+def install(clock: Clock = None):
+    """
+    Register the stand-in modules. Must be called before importing any of the lamp's modules.
+
+    Args:
+        clock: clock driving ticks_ms(), the RTC and the recorded frame times.
+            Defaults to a real-time clock starting at the current wall time.
+    """
+    
+    global _installed
+    
+    if clock is not None:
+        set_clock(clock)
+    
+    if _installed:
+        return
+    
+    _import_stdlib_first()
+    
+    from host import machine, neopixel, network, ntptime, rp2, uasyncio
+    from host import micropython_time
+    
+    sys.modules["machine"] = machine
+    sys.modules["neopixel"] = neopixel
+    sys.modules["network"] = network
+    sys.modules["ntptime"] = ntptime
+    sys.modules["rp2"] = rp2
+    sys.modules["uasyncio"] = uasyncio
+    micropython_time.patch()
+    
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    _load_repo_logging()
+    
+    _installed = True
+
+
+def set_clock(new_clock: Clock):
+    """
+    Swap the clock used by every stand-in.
+    """
+    
+    global clock
+    clock = new_clock
@@ -0,0 +1,58 @@
+import time
+
+
+class Clock:
+    """
+    Time source for the host stand-ins.
+
+    monotonic() drives ticks_ms()/ticks_us(); epoch() drives the RTC.
+    A real clock follows time.monotonic(). A virtual clock only moves when advance() is called.
+    """
+    
+    def __init__(self, virtual: bool = False, start_epoch: float = None):
+        """
+        Args:
+            virtual: if True, time stands still until advance() is called
+            start_epoch: wall time (seconds since 1970, UTC) at the clock's start.
+                Defaults to the current time.
+        """
+        
+        self.virtual = virtual
+        self._virtual_seconds = 0.0
+        self._real_start = time.monotonic()
+        
+        if start_epoch is None:
+            start_epoch = time.time()
+        self._epoch_offset = start_epoch
+    
+    
+    def monotonic(self) -> float:
+        """
+        Seconds since the clock started.
+        """
+        if self.virtual:
+            return self._virtual_seconds
+        return time.monotonic() - self._real_start
+    
+    
+    def advance(self, seconds: float):
+        """
+        Move a virtual clock forward.
+        """
+        if not self.virtual:
+            raise RuntimeError("Only a virtual clock can be advanced")
+        self._virtual_seconds += seconds
+    
+    
+    def epoch(self) -> float:
+        """
+        Current wall time, in seconds since 1970 (UTC).
+        """
+        return self._epoch_offset + self.monotonic()
+    
+    
+    def set_epoch(self, epoch: float):
+        """
+        Set the wall time, e.g. from the RTC or an NTP sync, without affecting monotonic().
+        """
+        self._epoch_offset = epoch - self.monotonic()
@@ -0,0 +1,110 @@
+"""
+Decode binary lamp logs (log.bin, see log_format.py) to CSV, optionally filtered.
+
+Files are read in the order given and records are sorted by time, so rotated files can be
+passed in any order. Times are in the Pico's RTC time zone.
+
+From the repository root:
+    python -m host.logtool log.bin.2 log.bin.1 log.bin
+    python -m host.logtool log.bin --since 2026-01-01T00:00:00 --until 2026-01-02T00:00:00
+    python -m host.logtool log.bin --event memory,exception --output memory.csv
+"""
+
+import argparse
+import calendar
+import csv
+import sys
+import time
+
+import log_format
+
+
+def parse_time(s: str) -> int:
+    return calendar.timegm(time.strptime(s, "%Y-%m-%dT%H:%M:%S"))
+
+
+def parse_events(s: str) -> set:
+    """
+    Comma separated event names or codes, e.g. "memory,exception" or "1,2".
+    """
+
+    codes = {name: code for code, name in log_format.EVENT_NAMES.items()}
+    events = set()
+    for event in s.split(","):
+        event = event.strip().lower()
+        if event.isdigit():
+            events.add(int(event))
+        elif event in codes:
+            events.add(codes[event])
+        else:
+            raise argparse.ArgumentTypeError(
+                f"unknown event {event!r}, expected one of " + ", ".join(codes)
+                )
+    return events
+
+
+def read_records(paths: list) -> list:
+    """
+    Returns:
+        every record in the files, as (epoch, event, value, text), sorted by time
+    """
+
+    records = []
+    for path in paths:
+        with open(path, "rb") as f:
+            records.extend(log_format.unpack_records(f.read()))
+    records.sort(key=lambda record: record[0])
+    return records
+
+
+def query(records: list, since: int = None, until: int = None, events: set = None):
+    """
+    Yields:
+        the records from since (inclusive) to until (exclusive), of the given event codes
+    """
+
+    for record in records:
+        epoch, event = record[0], record[1]
+        if since is not None and epoch < since:
+            continue
+        if until is not None and epoch >= until:
+            continue
+        if events is not None and event not in events:
+            continue
+        yield record
+
+
+def write_csv(records, f):
+
+    writer = csv.writer(f)
+    writer.writerow(["time", "event", "value", "message"])
+    for epoch, event, value, text in records:
+        writer.writerow([
+            time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(epoch)),
+            log_format.EVENT_NAMES.get(event, str(event)),
+            value,
+            log_format.describe(event, value, text),
+            ])
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="binary log files")
+    parser.add_argument("--since", type=parse_time, help="YYYY-MM-DDTHH:MM:SS, inclusive")
+    parser.add_argument("--until", type=parse_time, help="YYYY-MM-DDTHH:MM:SS, exclusive")
+    parser.add_argument("--event", type=parse_events, help="comma separated: " + ", ".join(log_format.EVENT_NAMES.values()))
+    parser.add_argument("--output", help="CSV file to write, rather than stdout")
+    args = parser.parse_args()
+
+    records = query(read_records(args.paths), args.since, args.until, args.event)
+
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            write_csv(records, f)
+    else:
+        write_csv(records, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
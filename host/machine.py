@@ -0,0 +1,115 @@
+"""
+Stand-in for MicroPython's machine module: Pin (with simulated IRQs) and RTC.
+"""
+
+import time
+
+import host
+
+
+class Pin:
+    
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+    
+    # every Pin created, by id, so a test can find e.g. the button on pin 12
+    pins = {}
+    
+    def __init__(self, id, mode: int = -1, pull: int = -1, value: int = None):
+        self.id = id
+        self.mode = mode
+        self.pull = pull
+        self.handler = None
+        self.trigger = 0
+        # pulled-up inputs idle high
+        if value is None:
+            value = 1 if pull == Pin.PULL_UP else 0
+        self._value = value
+        Pin.pins[id] = self
+    
+    
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._value = int(bool(value))
+    
+    
+    def on(self):
+        self.value(1)
+    
+    
+    def off(self):
+        self.value(0)
+    
+    
+    def toggle(self):
+        self.value(not self._value)
+    
+    
+    def irq(self, handler=None, trigger: int = IRQ_FALLING | IRQ_RISING, hard: bool = False):
+        self.handler = handler
+        self.trigger = trigger
+    
+    
+    def inject(self, value: int):
+        """
+        Simulate the pin being driven externally, e.g. a button press (0 on a pulled-up pin).
+        Calls the IRQ handler if the edge matches its trigger.
+        """
+        
+        previous = self._value
+        self._value = int(bool(value))
+        
+        if self.handler is None or previous == self._value:
+            return
+        if self._value == 0 and self.trigger & Pin.IRQ_FALLING:
+            self.handler(self)
+        elif self._value == 1 and self.trigger & Pin.IRQ_RISING:
+            self.handler(self)
+    
+    
+    def __repr__(self):
+        return f"Pin({self.id!r})"
+
+
+class RTC:
+    """
+    Real time clock backed by host.clock.
+    datetime tuples are (year, month, day, weekday, hours, minutes, seconds, subseconds).
+    """
+    
+    def datetime(self, datetime: tuple = None):
+        
+        if datetime is not None:
+            year, month, day, _, hours, minutes, seconds = datetime[:7]
+            epoch = _timegm((year, month, day, hours, minutes, seconds))
+            host.clock.set_epoch(epoch)
+            return
+        
+        epoch = host.clock.epoch()
+        t = time.gmtime(epoch)
+        subseconds = int((epoch % 1) * 1000000)
+        return (t.tm_year, t.tm_mon, t.tm_mday, t.tm_wday, t.tm_hour, t.tm_min, t.tm_sec, subseconds)
+
+
+def _timegm(t: tuple) -> int:
+    import calendar
+    
+    return calendar.timegm(t)
+
+
+def freq():
+    return 150000000
+
+
+def reset():
+    raise SystemExit("machine.reset()")
+
+
+def unique_id() -> bytes:
+    return b"host"
@@ -0,0 +1,78 @@
+"""
+MicroPython's additions to the time module, backed by the host clock.
+"""
+
+import gc
+import time
+
+import host
+
+
+# MicroPython's ticks wrap around at this period on the RP2
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALFPERIOD = TICKS_PERIOD // 2
+
+# Pico 2 W heap size, used to report gc.mem_free()
+HEAP_SIZE = 480 * 1024
+
+
+# A virtual clock sums float timer delays, so e.g. 336 ms can come out as 335.99999 ms.
+# Without this allowance, a timer set for a tick would fire a tick early.
+_ROUNDING = 1e-6
+
+
+def ticks_ms() -> int:
+    return int(host.clock.monotonic() * 1000 + _ROUNDING) & TICKS_MAX
+
+
+def ticks_us() -> int:
+    return int(host.clock.monotonic() * 1000000 + _ROUNDING) & TICKS_MAX
+
+
+def ticks_cpu() -> int:
+    return ticks_us()
+
+
+def ticks_add(ticks: int, delta: int) -> int:
+    return (ticks + delta) & TICKS_MAX
+
+
+def ticks_diff(ticks1: int, ticks2: int) -> int:
+    return ((ticks1 - ticks2 + TICKS_HALFPERIOD) & TICKS_MAX) - TICKS_HALFPERIOD
+
+
+def sleep_ms(ms: int):
+    time.sleep(ms / 1000)
+
+
+def sleep_us(us: int):
+    time.sleep(us / 1000000)
+
+
+def mem_alloc() -> int:
+    import tracemalloc
+    
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return 0
+
+
+def mem_free() -> int:
+    return max(0, HEAP_SIZE - mem_alloc())
+
+
+def patch():
+    """
+    Add the MicroPython-only functions to the time and gc modules.
+    """
+    
+    time.ticks_ms = ticks_ms
+    time.ticks_us = ticks_us
+    time.ticks_cpu = ticks_cpu
+    time.ticks_add = ticks_add
+    time.ticks_diff = ticks_diff
+    time.sleep_ms = sleep_ms
+    time.sleep_us = sleep_us
+    gc.mem_alloc = mem_alloc
+    gc.mem_free = mem_free
@@ -0,0 +1,69 @@
+"""
+Stand-in for MicroPython's neopixel module, recording every frame written.
+"""
+
+import time
+
+
+class NeoPixel:
+    
+    ORDER = (1, 0, 2, 3)
+    
+    def __init__(self, pin, n: int, bpp: int = 3, timing: int = 1, max_frames: int = 10000):
+        """
+        Args:
+            max_frames: most recent frames kept in self.frames. 0 keeps none, only counting writes.
+        """
+        
+        self.pin = pin
+        self.n = n
+        self.bpp = bpp
+        self.timing = timing
+        self.buf = bytearray(n * bpp)
+        
+        self.max_frames = max_frames
+        # (ticks_ms, bytes) per write, oldest first
+        self.frames = []
+        self.write_count = 0
+    
+    
+    def __len__(self):
+        return self.n
+    
+    
+    def __setitem__(self, index: int, val):
+        offset = index * self.bpp
+        for i in range(self.bpp):
+            self.buf[offset + self.ORDER[i]] = val[i]
+    
+    
+    def __getitem__(self, index: int):
+        offset = index * self.bpp
+        return tuple(self.buf[offset + self.ORDER[i]] for i in range(self.bpp))
+    
+    
+    def fill(self, val):
+        for i in range(self.n):
+            self[i] = val
+    
+    
+    def write(self):
+        self.write_count += 1
+        if self.max_frames:
+            self.frames.append((time.ticks_ms(), bytes(self.buf)))
+            if len(self.frames) > self.max_frames:
+                del self.frames[0]
+    
+    
+    def pixels(self, frame: bytes = None) -> list:
+        """
+        A frame (default: the current buffer) as a list of RGB/RGBW tuples.
+        """
+        
+        if frame is None:
+            frame = self.buf
+        bpp = self.bpp
+        return [
+            tuple(frame[i * bpp + self.ORDER[j]] for j in range(bpp))
+            for i in range(self.n)
+            ]
@@ -0,0 +1,72 @@
+"""
+Stand-in for MicroPython's network module. WLAN connects instantly, or after connect_ms.
+"""
+
+import time
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_WRONG_PASSWORD = -3
+STAT_NO_AP_FOUND = -2
+STAT_CONNECT_FAIL = -1
+STAT_GOT_IP = 3
+
+
+class WLAN:
+    
+    # set to False to simulate an unreachable access point, or a dropped link
+    available = True
+    # time an association takes, following host.clock
+    connect_ms = 0
+    ifconfig_addresses = ("127.0.0.1", "255.0.0.0", "127.0.0.1", "127.0.0.1")
+    
+    def __init__(self, interface: int = STA_IF):
+        self.interface = interface
+        self._active = False
+        self._connected = False
+        self._connect_time = 0
+        self.ssid = None
+    
+    
+    def active(self, is_active: bool = None):
+        if is_active is None:
+            return self._active
+        self._active = bool(is_active)
+        if not self._active:
+            self._connected = False
+    
+    
+    def connect(self, ssid: str = None, key: str = None):
+        self.ssid = ssid
+        self._connected = self._active
+        self._connect_time = time.ticks_ms()
+    
+    
+    def disconnect(self):
+        self._connected = False
+    
+    
+    def isconnected(self) -> bool:
+        if not (self._connected and WLAN.available):
+            return False
+        return time.ticks_diff(time.ticks_ms(), self._connect_time) >= WLAN.connect_ms
+    
+    
+    def status(self, param: str = None):
+        if param == "rssi":
+            return -50
+        if self.isconnected():
+            return STAT_GOT_IP
+        return STAT_CONNECT_FAIL if self._active else STAT_IDLE
+    
+    
+    def ifconfig(self, config: tuple = None):
+        if config is not None:
+            WLAN.ifconfig_addresses = tuple(config)
+            return
+        if not self.isconnected():
+            return ("0.0.0.0", "0.0.0.0", "0.0.0.0", "0.0.0.0")
+        return WLAN.ifconfig_addresses
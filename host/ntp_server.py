@@ -0,0 +1,101 @@
+"""
+Local NTP server stand-in, for exercising ntp.py on the host without the pool servers.
+
+Answers SNTP requests with the host's wall clock, shifted by --offset-ms and running
+--drift-ppm fast, so the client's offset and drift estimates can be checked against
+known values.
+
+From the repository root:
+    python -m host.ntp_server --port 12300 --offset-ms 1500 --drift-ppm 40
+
+or from a script:
+    server = ntp_server.start(port=0, drift_ppm=40)
+    client = NTPClient(servers=("127.0.0.1",), port=server.port)
+"""
+
+import argparse
+import socketserver
+import struct
+import threading
+import time
+
+# seconds from the NTP epoch (1900) to 1970
+NTP_DELTA = 2208988800
+
+
+class NTPServer(socketserver.UDPServer):
+
+    def __init__(self, port: int = 12300, offset_ms: float = 0, drift_ppm: float = 0):
+        """
+        Args:
+            port: UDP port on 127.0.0.1, or 0 for any free port
+            offset_ms: served time minus the host's wall clock, at startup
+            drift_ppm: how fast the served time runs relative to the host's wall clock
+        """
+
+        super().__init__(("127.0.0.1", port), NTPHandler)
+        self.port = self.server_address[1]
+        self.offset_ms = offset_ms
+        self.drift_ppm = drift_ppm
+        # set to False to simulate an unreachable server
+        self.available = True
+        self.requests = 0
+        self._start = time.time()
+
+
+    def now(self) -> float:
+        """
+        Served time, in seconds since 1970.
+        """
+
+        real = time.time()
+        return real + self.offset_ms / 1000 + (real - self._start) * self.drift_ppm / 1e6
+
+
+class NTPHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+
+        data, sock = self.request
+        self.server.requests += 1
+        if not self.server.available or len(data) < 48:
+            return
+
+        now = self.server.now() + NTP_DELTA
+        seconds = int(now)
+        fraction = int((now - seconds) * 2**32)
+
+        reply = bytearray(48)
+        reply[0] = 0x1C  # no leap warning, version 3, server mode
+        reply[1] = 2  # stratum
+        reply[24:32] = data[40:48]  # originate time: the client's transmit time
+        struct.pack_into("!IIII", reply, 32, seconds, fraction, seconds, fraction)  # receive, transmit
+        sock.sendto(reply, self.client_address)
+
+
+def start(port: int = 0, offset_ms: float = 0, drift_ppm: float = 0) -> NTPServer:
+    """
+    Serve on a background thread, e.g. alongside host.virtual or a test script.
+    Stop it with shutdown().
+    """
+
+    server = NTPServer(port, offset_ms, drift_ppm)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=12300, help="UDP port on 127.0.0.1")
+    parser.add_argument("--offset-ms", type=float, default=0, help="served time minus the host's clock")
+    parser.add_argument("--drift-ppm", type=float, default=0, help="served time runs this much fast")
+    args = parser.parse_args()
+
+    server = NTPServer(args.port, args.offset_ms, args.drift_ppm)
+    print(f"Serving NTP on 127.0.0.1:{server.port}, offset {args.offset_ms} ms, drift {args.drift_ppm} ppm")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+Stand-in for MicroPython's ntptime module. settime() sets the RTC from the host's wall clock.
+"""
+
+import time as _time
+
+
+# NTP server, as on MicroPython
+host = "pool.ntp.org"
+timeout = 1
+
+# set to False to simulate an unreachable NTP server
+available = True
+
+
+def time() -> int:
+    if not available:
+        raise OSError("ETIMEDOUT")
+    return int(_time.time())
+
+
+def settime():
+    import host as _host
+    
+    _host.clock.set_epoch(time())
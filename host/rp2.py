@@ -0,0 +1,12 @@
+"""
+Stand-in for MicroPython's rp2 module.
+"""
+
+_country = "XX"
+
+
+def country(code: str = None):
+    global _country
+    if code is None:
+        return _country
+    _country = code
@@ -0,0 +1,152 @@
+"""
+Fast-forward the sunrise string through full alarm cycles in virtual time.
+
+Runs turn_on_sunrise_mode -> scheduler.wait -> alarm_mode -> fadeout_leds against a
+virtual clock, and reports when each alarm went off (UTC and local time), frame counts,
+wakeups and the output timeline.
+
+--alarm may be repeated, optionally with the days it's on (see scheduler.days_to_mask).
+
+From the repository root:
+    python -m host.simulate --start 2026-01-01T22:00:00 --alarm 06:35 --hours 24
+    python -m host.simulate --start 2026-03-27T12:00:00 --alarm 07:00@weekdays --alarm 00:05@sat,sun --hours 96
+    python -m host.simulate --timeline timeline.csv
+"""
+
+import host
+from host.clock import Clock
+
+# installed before anything imports asyncio or the lamp's modules
+clock = Clock(virtual=True)
+host.install(clock)
+
+import argparse  # noqa: E402
+import calendar  # noqa: E402
+import contextlib  # noqa: E402
+import json  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+
+import uasyncio  # noqa: E402
+
+from host import virtual  # noqa: E402
+
+
+def parse_start(start: str) -> int:
+    return calendar.timegm(time.strptime(start, "%Y-%m-%dT%H:%M:%S"))
+
+
+def parse_alarm(alarm: str) -> dict:
+    """
+    "HH:MM" or "HH:MM@days", as scheduler.Alarm.from_dict() settings.
+    """
+
+    time_str, _, days = alarm.partition("@")
+    settings = {"time": time_str}
+    if days:
+        settings["days"] = days
+    return settings
+
+
+async def run_cycle(controller, renderer, seconds: float):
+
+    render_task = uasyncio.create_task(renderer.run())
+
+    controller.request_mode("sunrise_alarm")
+
+    await uasyncio.sleep(seconds)
+
+    for task in (controller.current_control_task, render_task):
+        task.cancel()
+        try:
+            await task
+        except uasyncio.CancelledError:
+            pass
+
+
+def timeline(controller, start_ticks: int, start_epoch: float) -> list:
+    """
+    Every frame written, as (seconds since start, RTC time, frame bytes as hex).
+    """
+
+    rows = []
+    for ticks, frame in controller.neopix.frames:
+        seconds = time.ticks_diff(ticks, start_ticks) / 1000
+        rtc = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start_epoch + seconds))
+        rows.append((round(seconds, 3), rtc, frame.hex()))
+    return rows
+
+
+def simulate(start_epoch: int, alarms: list, hours: float, frame_rate: int) -> dict:
+
+    clock.set_epoch(start_epoch)
+    start_ticks = time.ticks_ms()
+
+    from leds import sunrise_led
+    from renderer import renderer
+    from scheduler import Alarm, scheduler
+
+    renderer.set_frame_rate(frame_rate)
+    sunrise_led.neopix.max_frames = 1000000
+    sunrise_led.handle_server_alarms_update([Alarm.from_dict(alarm) for alarm in alarms])
+
+    # record each alarm as it goes off
+    alarms_started = []
+    alarm_mode = sunrise_led.alarm_mode
+
+    async def recorded_alarm_mode(alarm):
+        epoch = int(clock.epoch())
+        alarms_started.append({
+            "alarm": "%02d:%02d" % alarm.time,
+            "utc": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(epoch)),
+            "local": time.strftime("%Y-%m-%dT%H:%M:%S %a", time.gmtime(epoch + scheduler.local_offset_s(epoch))),
+        })
+        await alarm_mode(alarm)
+
+    sunrise_led.alarm_mode = recorded_alarm_mode
+
+    real_start = time.monotonic()
+    # keep the lamp's own prints off stdout, which carries the report
+    with contextlib.redirect_stdout(sys.stderr):
+        _, loop = virtual.run(run_cycle(sunrise_led, renderer, hours * 3600), clock)
+    real_seconds = time.monotonic() - real_start
+
+    return {
+        "start": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(start_epoch)),
+        "alarms": [alarm.to_dict() for alarm in scheduler.alarms],
+        "alarms_started": alarms_started,
+        "virtual_seconds": hours * 3600,
+        "real_seconds": round(real_seconds, 3),
+        "frame_rate": frame_rate,
+        "frames_written": sunrise_led.neopix.write_count,
+        "frame_counts": sunrise_led.frame_stats(),
+        "renderer_ticks": renderer.tick_count,
+        "loop_wakeups": loop.wakeups,
+        "timeline": timeline(sunrise_led, start_ticks, start_epoch),
+    }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", default="2026-01-01T22:00:00", help="RTC time at the start, UTC")
+    parser.add_argument("--alarm", action="append", type=parse_alarm, help="alarm time, HH:MM[@days], local time (default 06:35)")
+    parser.add_argument("--hours", type=float, default=24, help="virtual hours to simulate")
+    parser.add_argument("--frame-rate", type=int, default=40, help="renderer frame rate")
+    parser.add_argument("--timeline", help="write the frame timeline to this CSV file, rather than in the report")
+    args = parser.parse_args()
+
+    report = simulate(parse_start(args.start), args.alarm or [parse_alarm("06:35")], args.hours, args.frame_rate)
+
+    if args.timeline:
+        with open(args.timeline, "w") as f:
+            f.write("seconds,rtc,frame\n")
+            for row in report.pop("timeline"):
+                f.write("%s,%s,%s\n" % row)
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
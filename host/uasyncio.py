@@ -0,0 +1,15 @@
+"""
+Stand-in for MicroPython's uasyncio: asyncio, plus the MicroPython-only helpers.
+"""
+
+import asyncio
+from asyncio import *  # noqa: F401,F403
+from asyncio import CancelledError, TimeoutError  # noqa: F401
+
+
+async def sleep_ms(ms: int):
+    await asyncio.sleep(ms / 1000)
+
+
+async def wait_for_ms(awaitable, timeout: int):
+    return await asyncio.wait_for(awaitable, timeout / 1000)
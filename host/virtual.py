@@ -0,0 +1,81 @@
+"""
+Virtual-time asyncio event loop.
+
+Whenever every task is asleep, the loop jumps host.clock straight to the next timer
+instead of waiting for it, so hours of the lamp's schedule run in seconds.
+"""
+
+import asyncio
+import selectors
+
+import host
+
+
+class VirtualSelector(selectors.DefaultSelector):
+    
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+        # times the loop went to sleep and was woken by a timer
+        self.wakeups = 0
+    
+    
+    def select(self, timeout=None):
+        # real I/O (e.g. the loop's self-pipe) is still serviced, without blocking
+        events = super().select(0)
+        if events:
+            return events
+        
+        if timeout is None:
+            raise RuntimeError("Virtual time simulation deadlocked: no timers scheduled and nothing to wake a task")
+        
+        if timeout > 0:
+            self.clock.advance(timeout)
+            self.wakeups += 1
+        
+        return []
+
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+    
+    def __init__(self, clock=None):
+        """
+        Args:
+            clock: a virtual host.clock.Clock. Defaults to host.clock.
+        """
+        
+        if clock is None:
+            clock = host.clock
+        if not clock.virtual:
+            raise ValueError("VirtualEventLoop needs a virtual Clock")
+        
+        self.clock = clock
+        self.selector = VirtualSelector(clock)
+        super().__init__(selector=self.selector)
+    
+    
+    def time(self) -> float:
+        return self.clock.monotonic()
+    
+    
+    @property
+    def wakeups(self) -> int:
+        return self.selector.wakeups
+
+
+def run(main, clock=None):
+    """
+    Like asyncio.run(), on a VirtualEventLoop.
+
+    Returns:
+        (result of main, the loop used - e.g. for its wakeups count)
+    """
+    
+    loop = VirtualEventLoop(clock)
+    asyncio.set_event_loop(loop)
+    try:
+        result = loop.run_until_complete(main)
+        return result, loop
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
@@ -0,0 +1,288 @@
+"""
+Incremental HTTP/1.1 request parser for the lamp's server.
+
+Requests are read as they arrive (headers split across TCP segments are fine),
+the body is read according to Content-Length, and memory per request is capped.
+"""
+
+
+class RequestError(Exception):
+    """
+    A request that can't be served. status is the HTTP status line to reply with.
+    """
+
+    def __init__(self, status: bytes, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def decode(data: bytes, part: str) -> str:
+    """
+    Decode part of a request as UTF-8.
+
+    Raises:
+        RequestError: 400, if it isn't valid UTF-8
+    """
+
+    try:
+        return data.decode()
+    except UnicodeError:
+        raise RequestError(b"400 Bad Request", part + " is not valid UTF-8")
+
+
+def url_decode(s: str) -> str:
+    """
+    Decode an application/x-www-form-urlencoded value, e.g. "07%3A15" -> "07:15".
+
+    Raises:
+        RequestError: 400, if the escapes don't decode to UTF-8 (e.g. "%FF")
+    """
+
+    s = s.replace("+", " ")
+    if "%" not in s:
+        return s
+
+    parts = s.split("%")
+    decoded = bytearray(parts[0].encode())
+    for part in parts[1:]:
+        try:
+            if len(part) < 2:
+                raise ValueError
+            decoded.append(int(part[:2], 16))
+            decoded.extend(part[2:].encode())
+        except ValueError:
+            # not an escape - keep it as it was
+            decoded.extend(b"%" + part.encode())
+
+    return decode(bytes(decoded), "URL-encoded value")
+
+
+def parse_query(s: str) -> dict:
+    """
+    Parse "a=1&b=x%20y" into {"a": "1", "b": "x y"}. Later duplicates win.
+    """
+
+    fields = {}
+    for pair in s.split("&"):
+        if not pair:
+            continue
+        name, _, value = pair.partition("=")
+        fields[url_decode(name)] = url_decode(value)
+    return fields
+
+
+def parse_range(value: str, size: int):
+    """
+    Parse a single byte range Range header, e.g. "bytes=0-99", "bytes=100-" or "bytes=-500",
+    for a resource of size bytes.
+
+    Returns:
+        (first, last) byte positions, inclusive, or None if the header should be ignored
+        (malformed, or several ranges) and the whole resource served
+
+    Raises:
+        ValueError: if the range is valid but lies outside the resource (416)
+    """
+
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            first = int(first)
+            last = int(last) if last else size - 1
+        else:
+            # suffix range: the last N bytes
+            suffix = int(last)
+            if suffix <= 0:
+                return None
+            first = max(0, size - suffix)
+            last = size - 1
+    except ValueError:
+        return None
+
+    if first >= size:
+        raise ValueError("range starts beyond the end")
+    if last < first:
+        return None
+    return first, min(last, size - 1)
+
+
+class Request:
+
+    def __init__(self, method: str, target: str, version: str, headers: dict, body: bytes):
+        """
+        Args:
+            method: e.g. "GET"
+            target: request target, e.g. "/api/state?x=1"
+            version: e.g. "HTTP/1.1"
+            headers: header values by lowercase name
+            body: request body
+        """
+
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+        path, _, query = target.partition("?")
+        self.path = path
+        self.query = parse_query(query)
+
+
+    def form(self) -> dict:
+        """
+        URL-decoded form fields, by name.
+
+        Raises:
+            RequestError: 400, if the body isn't valid UTF-8
+        """
+        return parse_query(decode(self.body, "form body"))
+
+
+class RequestReader:
+    """
+    Reads successive requests from one connection.
+
+    Bytes read beyond the end of one request are kept for the next, so requests on a
+    kept-alive connection can arrive in any segmentation.
+    """
+
+    def __init__(
+        self,
+        reader,
+        max_header_bytes: int = 2048,
+        max_body_bytes: int = 2048,
+        max_headers: int = 32,
+        ):
+        """
+        Args:
+            reader: uasyncio stream to read from
+            max_header_bytes: largest request line plus headers accepted
+            max_body_bytes: largest body accepted
+            max_headers: most header lines accepted
+        """
+
+        self.reader = reader
+        self.max_header_bytes = max_header_bytes
+        self.max_body_bytes = max_body_bytes
+        self.max_headers = max_headers
+        self.buffer = b""
+        # bytes of the current request's line and headers read so far
+        self.header_bytes = 0
+
+
+    async def read_more(self, limit: int) -> bool:
+        """
+        Read up to limit more bytes into the buffer.
+
+        Returns:
+            False if the connection was closed.
+        """
+
+        chunk = await self.reader.read(limit)
+        if not chunk:
+            return False
+        self.buffer += chunk
+        return True
+
+
+    async def readline(self) -> bytes:
+        """
+        Next header line, without its line ending.
+        Returns None if the connection closes before any of the line arrives.
+        """
+
+        while True:
+            end = self.buffer.find(b"\n")
+            if end >= 0:
+                line = self.buffer[:end]
+                self.buffer = self.buffer[end + 1:]
+                self.header_bytes += end + 1
+                if self.header_bytes > self.max_header_bytes:
+                    raise RequestError(b"431 Request Header Fields Too Large", "request headers too large")
+                if line.endswith(b"\r"):
+                    line = line[:-1]
+                return line
+
+            if self.header_bytes + len(self.buffer) >= self.max_header_bytes:
+                raise RequestError(b"431 Request Header Fields Too Large", "request headers too large")
+
+            if not await self.read_more(self.max_header_bytes - self.header_bytes - len(self.buffer)):
+                if self.buffer or self.header_bytes:
+                    raise RequestError(b"400 Bad Request", "incomplete request")
+                return None
+
+
+    async def read_request(self) -> Request:
+        """
+        Read the next request.
+
+        Returns:
+            the Request, or None if the client closed the connection between requests
+
+        Raises:
+            RequestError: for malformed, oversized or unsupported requests
+        """
+
+        self.header_bytes = 0
+
+        # request line - tolerate blank lines between kept-alive requests (e.g. a CRLF
+        # after a body), and a close after them
+        line = await self.readline()
+        while line == b"":
+            self.header_bytes = 0
+            line = await self.readline()
+        if line is None:
+            return None
+
+        request_line = decode(line, "request line").split()
+        if len(request_line) != 3 or not request_line[2].startswith("HTTP/"):
+            raise RequestError(b"400 Bad Request", "malformed request line")
+        method, target, version = request_line
+
+        # headers, until a blank line
+        headers = {}
+        header_lines = 0
+        while True:
+            line = await self.readline()
+            if line is None:
+                raise RequestError(b"400 Bad Request", "incomplete request")
+            if line == b"":
+                break
+            # count lines, not names - repeated headers are merged into one entry
+            header_lines += 1
+            if header_lines > self.max_headers:
+                raise RequestError(b"431 Request Header Fields Too Large", "too many headers")
+            name, sep, value = decode(line, "header").partition(":")
+            if not sep:
+                raise RequestError(b"400 Bad Request", "malformed header")
+            headers[name.strip().lower()] = value.strip()
+
+        if "transfer-encoding" in headers:
+            raise RequestError(b"501 Not Implemented", "chunked bodies are not supported")
+
+        # body, by Content-Length
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise RequestError(b"400 Bad Request", "invalid Content-Length")
+        if length < 0:
+            raise RequestError(b"400 Bad Request", "invalid Content-Length")
+        if length > self.max_body_bytes:
+            raise RequestError(b"413 Payload Too Large", "request body too large")
+
+        while len(self.buffer) < length:
+            if not await self.read_more(length - len(self.buffer)):
+                raise RequestError(b"400 Bad Request", "incomplete body")
+
+        body = self.buffer[:length]
+        self.buffer = self.buffer[length:]
+
+        return Request(method, target, version, headers, body)
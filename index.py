@@ -1,39 +1,9 @@
-def webpage(
-    brightness: int,
-    alarm_time: tuple[int, int],
-    sunrise_led_mode: str,
-    main_led_mode: str
-    ):
-    """
-    brightness: int, expecting 0-100
-    alarm_time: tuple,
-    sunrise_led_mode: str,
-    main_led_mode: str
-    """
-    
-    # convert alarm_time from tuple[int, int] to tuple[str, str]
-    alarm_time_str = []
-    for t in alarm_time:
-        # add leading zero if required
-        if t < 10:
-            t = f"0{str(t)}"
-        else:
-            t = str(t)
-        alarm_time_str.append(t)
-        
-    hour = alarm_time_str[0]
-    minute = alarm_time_str[1]
-    
-    if sunrise_led_mode == "sunrise_alarm":
-        sunrise_led_mode = "Alarm"
-    else:
-        # lowercase to Title
-        sunrise_led_mode = f"{sunrise_led_mode[0].upper()}{sunrise_led_mode[1:]}"
-    
-    main_led_mode = f"{main_led_mode[0].upper()}{main_led_mode[1:]}"
+import profiling
 
-    # Build HTML
-    html = f"""
+
+# The page is stored as constant byte chunks, split at import time around "@@field@@" markers.
+# Only the fields are rendered per request, and the result is cached until the state changes.
+_PAGE = b"""
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -42,41 +12,59 @@ def webpage(
         <title>Time Input Form</title>
         <style>
         
-            body {{
+            body {
               background: #555;
-            }}
+            }
 
-            .content {{
+            .content {
               max-width: 500px;
               margin: auto;
               background: white;
               padding: 10px;
-            }}
+            }
         
-            .pill-button-group {{
+            .pill-button-group {
                 display: flex;
                 gap: 10px;
                 margin-top: 10px;
                 margin-bottom: 10px;
-            }}
-            .pill-button {{
+            }
+            .pill-button {
                 padding: 10px 20px;
                 border: none;
                 border-radius: 20px;
                 background-color: lightgray;
                 cursor: pointer;
-            }}
-            .pill-button.selected {{
+            }
+            .pill-button.selected {
                 background-color: blue;
                 color: white;
-            }}
+            }
         </style>
         <script>
-            function selectPill(group, button) {{
+            function selectPill(group, button) {
                 document.querySelectorAll('.' + group + ' .pill-button').forEach(btn => btn.classList.remove('selected'));
                 button.classList.add('selected');
                 document.getElementById(group + '-selected').value = button.textContent;
-            }}
+            }
+            
+            // keep the form in sync with changes made elsewhere (buttons, other phones)
+            function selectMode(group, mode) {
+                const label = mode === 'sunrise_alarm' ? 'Alarm' : mode[0].toUpperCase() + mode.slice(1);
+                document.querySelectorAll('.' + group + ' .pill-button').forEach(btn => {
+                    if (btn.textContent === label) selectPill(group, btn);
+                });
+            }
+            
+            if (window.EventSource) {
+                new EventSource('/events').onmessage = function (e) {
+                    const state = JSON.parse(e.data);
+                    if ('brightness' in state) document.getElementById('percentage').value = state.brightness;
+                    if ('alarm_time' in state) document.getElementById('time').value = state.alarm_time;
+                    if ('sunrise_led' in state) selectMode('group1', state.sunrise_led);
+                    if ('main_led' in state) selectMode('group2', state.main_led);
+                };
+            }
         </script>
     </head>
     <body class="content">
@@ -85,32 +73,32 @@ def webpage(
         <form action="/" method="POST">
             <div>
                 <label for="percentage">Brightness (%):</label>
-                <input type="number" id="percentage" name="percentage" min="0" max="100" step="1" value={brightness} required>
+                <input type="number" id="percentage" name="percentage" min="0" max="100" step="1" value=@@brightness@@ required>
             </div>
             
             <br>
 
             <div>
                 <label for="time">Alarm time:</label>
-                <input type="time" id="time" name="time" value="{hour}:{minute}" required>
+                <input type="time" id="time" name="time" value="@@alarm_time@@" required>
             </div>
               
             <h4>Sunrise LEDs</h4>
             <div class="pill-button-group group1">
-                <button type="button" class="pill-button {'selected' if sunrise_led_mode == 'Off' else ''}" onclick="selectPill('group1', this)">Off</button>
-                <button type="button" class="pill-button {'selected' if sunrise_led_mode == 'White' else ''}" onclick="selectPill('group1', this)">White</button>
-                <button type="button" class="pill-button {'selected' if sunrise_led_mode == 'Rainbow' else ''}" onclick="selectPill('group1', this)">Rainbow</button>
-                <button type="button" class="pill-button {'selected' if sunrise_led_mode == 'Alarm' else ''}" onclick="selectPill('group1', this)">Alarm</button>
+                <button type="button" class="pill-button @@sunrise_off@@" onclick="selectPill('group1', this)">Off</button>
+                <button type="button" class="pill-button @@sunrise_white@@" onclick="selectPill('group1', this)">White</button>
+                <button type="button" class="pill-button @@sunrise_rainbow@@" onclick="selectPill('group1', this)">Rainbow</button>
+                <button type="button" class="pill-button @@sunrise_alarm@@" onclick="selectPill('group1', this)">Alarm</button>
             </div>
-            <input type="hidden" id="group1-selected" name="sunrise_led" value="{sunrise_led_mode}" />
+            <input type="hidden" id="group1-selected" name="sunrise_led" value="@@sunrise_led_mode@@" />
 
             <h4>Main LEDs</h4>
             <div class="pill-button-group group2">
-                <button type="button" class="pill-button {'selected' if main_led_mode == 'Off' else ''}" onclick="selectPill('group2', this)">Off</button>
-                <button type="button" class="pill-button {'selected' if main_led_mode == 'White' else ''}" onclick="selectPill('group2', this)">White</button>
-                <button type="button" class="pill-button {'selected' if main_led_mode == 'Rainbow' else ''}" onclick="selectPill('group2', this)">Rainbow</button>
+                <button type="button" class="pill-button @@main_off@@" onclick="selectPill('group2', this)">Off</button>
+                <button type="button" class="pill-button @@main_white@@" onclick="selectPill('group2', this)">White</button>
+                <button type="button" class="pill-button @@main_rainbow@@" onclick="selectPill('group2', this)">Rainbow</button>
             </div>
-            <input type="hidden" id="group2-selected" name="main_led" value="{main_led_mode}" />
+            <input type="hidden" id="group2-selected" name="main_led" value="@@main_led_mode@@" />
             
             <br>            
             <button type="submit">Set</button>
@@ -121,4 +109,102 @@ def webpage(
     </html>
     """
 
-    return str(html)
+# even indices: static chunks; odd indices: field names
+_PAGE_PARTS = _PAGE.split(b"@@")
+del _PAGE
+
+# last rendered page: state tuple, chunk list and total length in bytes
+_cache_state = None
+_cache_chunks = None
+_cache_length = 0
+
+
+def _mode_title(mode: str) -> str:
+    """
+    Convert an LEDController mode to the label used by the page's buttons.
+    """
+    
+    if mode == "sunrise_alarm":
+        return "Alarm"
+    # lowercase to Title
+    return f"{mode[0].upper()}{mode[1:]}"
+
+
+def _field_values(
+    brightness: int,
+    alarm_time: tuple[int, int],
+    sunrise_led_mode: str,
+    main_led_mode: str
+    ) -> dict:
+    
+    # convert alarm_time from tuple[int, int] to "hh:mm", adding leading zeros if required
+    # (left blank when there are no alarms)
+    if alarm_time is None:
+        alarm_time_str = b""
+    else:
+        alarm_time_str = b"%02d:%02d" % tuple(alarm_time)
+    
+    sunrise_led_mode = _mode_title(sunrise_led_mode)
+    main_led_mode = _mode_title(main_led_mode)
+    
+    fields = {
+        b"brightness": str(brightness).encode(),
+        b"alarm_time": alarm_time_str,
+        b"sunrise_led_mode": sunrise_led_mode.encode(),
+        b"main_led_mode": main_led_mode.encode(),
+        }
+    
+    for group, mode, options in (
+        (b"sunrise_", sunrise_led_mode, ("Off", "White", "Rainbow", "Alarm")),
+        (b"main_", main_led_mode, ("Off", "White", "Rainbow")),
+        ):
+        for option in options:
+            fields[group + option.lower().encode()] = b"selected" if mode == option else b""
+    
+    return fields
+
+
+@profiling.timed("index.webpage_chunks")
+def webpage_chunks(
+    brightness: int,
+    alarm_time: tuple[int, int],
+    sunrise_led_mode: str,
+    main_led_mode: str
+    ) -> tuple[list, int]:
+    """
+    The page as a list of byte chunks, ready to be streamed to a client.
+
+    The chunks are cached by state, so repeat requests with unchanged state render nothing.
+
+    Args:
+        brightness: int, expecting 0-100
+        alarm_time: tuple, or None if there are no alarms
+        sunrise_led_mode: str,
+        main_led_mode: str
+
+    Returns:
+        (list of bytes chunks, total length in bytes)
+    """
+    
+    global _cache_state, _cache_chunks, _cache_length
+    
+    state = (brightness, alarm_time and tuple(alarm_time), sunrise_led_mode, main_led_mode)
+    if state == _cache_state:
+        return _cache_chunks, _cache_length
+    
+    fields = _field_values(brightness, alarm_time, sunrise_led_mode, main_led_mode)
+    
+    chunks = []
+    length = 0
+    for i, part in enumerate(_PAGE_PARTS):
+        if i % 2:
+            part = fields[part]
+        if part:
+            chunks.append(part)
+            length += len(part)
+    
+    _cache_state = state
+    _cache_chunks = chunks
+    _cache_length = length
+    
+    return chunks, length
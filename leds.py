@@ -1,7 +1,14 @@
 from brightness_control import brightness_control
+import colour
+import debounce
 import neopixel
+import profiling
 import time
 from machine import Pin, RTC
+from renderer import renderer
+from scheduler import Alarm, scheduler
+from state_events import state_events
+from telemetry import telemetry
 import uasyncio
 
 
@@ -14,29 +21,51 @@ class LEDController:
         number_of_leds: int,
         led_function,  # "normal" or "sunrise"
         led_type,  # "rgb" or "rgbw"
-        alarm_time: tuple = (6, 35),
+        rainbow_spread: float = 0.0,
+        name: str = "led",
         ):
         """
         
+        Args:
+            name: identifies the string in published state changes, e.g. "sunrise_led"
+            rainbow_spread: fraction of the rainbow cycle shown around the ring at once.
+                0 lights every LED the same colour; 1 shows the whole rainbow around the ring.
         """
 
+        self.name = name
+        # telemetry name for the mode button task's wakeups
+        self.button_task_name = name + "_button"
         self.led_function = led_function
         self.led_type = led_type
 
         # LED attributes
         self.number_of_leds = number_of_leds
+        self.bpp = 4 if led_type == "rgbw" else 3
         
         self.neopix = neopixel.NeoPixel(
             Pin(leds_pin),
             number_of_leds,
-            bpp=4 if led_type == "rgbw" else 3,
+            bpp=self.bpp,
             )
+        
+        # Preallocated single pixel, held in the NeoPixel's wire (GRB/GRBW) byte order.
+        # Reused for every solid-colour frame so that rendering does not allocate.
+        self.pixel_pattern = bytearray(self.bpp)
+        
+        # Frame scheduling - see renderer.Renderer
+        self.frame_source = None
+        self.next_frame_time = None
+        self.dirty = False
+        renderer.register(self)
+        
+        # Last frame sent to the LEDs, so identical frames can be skipped
+        self.last_frame = bytearray(len(self.neopix.buf))
+        self.last_frame_valid = False
 
         # Toggle control button attributes
         self.mode_button = Pin(mode_button_pin, Pin.IN, Pin.PULL_UP)
-        self.button_event = uasyncio.Event()
-        self.last_press_time = time.ticks_ms()  # Initialise with current time
-        self.mode_button.irq(trigger=Pin.IRQ_FALLING, handler=self.button_irq)
+        # pin needs to be stable for a continuous 50ms
+        self.mode_button_debouncer = debounce.Debouncer(self.mode_button, stable_ms=50)
 
         if led_function == "sunrise":
         
@@ -60,68 +89,151 @@ class LEDController:
         # Initialise mode - it will take the first item from self.led_options
         self.mode = next(self.led_cycle_gen)
         
+        # Frames [written, skipped as unchanged], per mode
+        self.frame_counts = {}
+        for option in self.led_options:
+            self.frame_counts[option] = [0, 0]
+        
         self.current_control_task = None
+        # mode change waiting for the renderer's next tick; see request_mode()
+        self.pending_mode = None
+        self.restart_pending = False
         
-        # alarm settings
-        self.alarm_time = alarm_time
+        # rainbow table entries between neighbouring LEDs
+        rainbow_entries = len(colour.RAINBOW_TABLE) // 3
+        self.rainbow_led_offset = int(rainbow_spread * rainbow_entries / number_of_leds)
 
      
-    def button_irq(self, pin):
-        self.button_event.set()
-
+    @property
+    def mode(self):
+        return self._mode
+    
+    
+    @mode.setter
+    def mode(self, mode: str):
+        self._mode = mode
+        state_events.publish(self.name, mode)
+        
+        
+    @property
+    def alarm_time(self):
+        """
+        The first alarm's time, (hour, minute), or None if there are no alarms.
+        The sunrise mode follows every alarm in the scheduler.
+        """
+        if not scheduler.alarms:
+            return None
+        return scheduler.alarms[0].time
+    
+    
+    @property
+    def requested_mode(self):
+        """
+        The mode the controller is in, or is about to switch to.
+        """
+        if self.pending_mode is not None:
+            return self.pending_mode
+        return self.mode
+    
     
     async def handle_button(self):
         while True:
-            await self.button_event.wait()
+            event = await self.mode_button_debouncer.next_event()
+            telemetry.wake(self.button_task_name)
+            if event != debounce.PRESS:
+                continue
             
-            # Debouncing - wait for pin to change value
-            # it needs to be stable for a continuous 50ms
-            cur_value = self.mode_button.value()
-            active = 0
-            while active < 50:
-                if self.mode_button.value() != cur_value:
-                    active += 1
-                else:
-                    active = 0
-                time.sleep(0.001)
-            
-            # Cancel the current LED task before switching modes
-            if self.current_control_task:
-                self.current_control_task.cancel()
-                try:
-                    # Ensure it's properly awaited before continuing
-                    await self.current_control_task
-                except uasyncio.CancelledError:
-                    pass  # Task was cancelled
-                
-            self.mode = next(self.led_cycle_gen)
-            self.current_control_task = uasyncio.create_task(self.control_led())
-            self.button_event.clear()  # Reset event flag for next press
+            # a press always (re)starts the next mode in the cycle
+            self.request_mode(next(self.led_cycle_gen), restart=True)
             
             
-    async def handle_server_mode_control(self, mode):
+    def request_mode(self, mode: str, restart: bool = False):
         """
+        Queue a mode change, applied by the renderer at its next tick (see apply_pending()).
+        Returns straight away, so callers such as the server never wait on LED task teardown.
+
+        Requests made before then are coalesced - only the latest is applied. Requesting the
+        mode already running leaves its task alone, unless restart is set.
+
+        Args:
+            mode: one of self.led_options
+            restart: restart the mode's task even if the mode is unchanged
         """
         
-        self.mode = mode
+        self.pending_mode = mode
+        self.restart_pending = self.restart_pending or restart
+        renderer.request_frame()
+        
+        
+    def apply_pending(self):
+        """
+        Apply the latest requested mode, if any. Called by the renderer at the start of each tick.
+        """
+        
+        mode = self.pending_mode
+        if mode is None:
+            return
+        restart = self.restart_pending
+        self.pending_mode = None
+        self.restart_pending = False
+        
+        if mode == self.mode and not restart and self.current_control_task is not None:
+            return  # already running
         
-        # Cancel the current LED task before switching modes
+        # Cancel the current LED task before switching modes.
+        # It isn't awaited: a cancelled task only tidies up frame sources it set itself (see fade()),
+        # so the new task can start straight away.
         if self.current_control_task:
             self.current_control_task.cancel()
-            try:
-                # Ensure it's properly awaited before continuing
-                await self.current_control_task
-            except uasyncio.CancelledError:
-                pass  # Task was cancelled
         
+        # the old mode's frame source and unsent frame go with it - otherwise this tick would
+        # still render and show one, counted under the new mode. The new mode's first frame
+        # is always written.
+        self.frame_source = None
+        self.next_frame_time = None
+        self.dirty = False
+        self.last_frame_valid = False
+        
+        self.mode = mode
         self.current_control_task = uasyncio.create_task(self.control_led())
         
         
     def handle_server_alarm_time_update(self, time):
         """
-        time: tuple (hour[int], minute[int])
+        Change the first alarm's time, keeping its other settings, or add an alarm if there are none.
+
+        Args:
+            time: tuple (hour[int], minute[int])
         """
-        self.alarm_time = time
+        
+        alarms = list(scheduler.alarms)
+        if alarms:
+            first = alarms[0].to_dict()
+            first["time"] = "%02d:%02d" % tuple(time)
+            alarms[0] = Alarm.from_dict(first)
+        else:
+            alarms.append(Alarm(time[0], time[1]))
+        self.handle_server_alarms_update(alarms)
+        
+        
+    def handle_server_alarms_update(self, alarms: list):
+        """
+        Replace the scheduler's alarms.
+
+        Args:
+            alarms: list of scheduler.Alarm
+        """
+        
+        changed = [a.to_dict() for a in alarms] != [a.to_dict() for a in scheduler.alarms]
+        # the sunrise mode's scheduler.wait() wakes, and picks up the change
+        scheduler.set_alarms(alarms)
+        if self.alarm_time is not None:
+            state_events.publish("alarm_time", "%02d:%02d" % self.alarm_time)
+        state_events.publish("alarms", [a.to_dict() for a in alarms])
+        
+        # restart a running sunrise mode, so it shows the next alarm time
+        if changed and self.requested_mode == "sunrise_alarm":
+            self.request_mode("sunrise_alarm", restart=True)
 
 
     def cycle(self, iterable):
@@ -145,16 +257,17 @@ class LEDController:
             self.turn_off()
             
         elif self.mode == "white":
-            await self.turn_on()
+            self.turn_on()
             
         elif self.mode == "rainbow":
-            await self.turn_on_rainbow()
+            self.turn_on_rainbow()
             
         elif self.mode == "sunrise_alarm":
             self.turn_off()
             await self.turn_on_sunrise_mode()
                 
                 
+    @profiling.timed("leds.adjust_for_rgbw")
     def adjust_for_rgbw(self, col: list, off=False):
         """
         Adjust RGB input to RGBW, if the LEDs are of RGBW type.
@@ -176,182 +289,302 @@ class LEDController:
         return col
         
                 
-    def adjust_brightness(self, col: list):
+    @profiling.timed("leds.adjust_brightness")
+    def adjust_brightness(self, col, lut: bytearray = None):
         """
         Adjusts the LED brightness according to the live current brightness setting.
+        Values are replaced in place via a lookup table, so no floats are involved.
 
         Args:
-            col: list of RGB or RGBW values
+            col: list or bytearray of RGB or RGBW values, modified in place
+            lut: brightness lookup table. Defaults to the current brightness setting's table.
         """
         
-        return [c * brightness_control.brightness for c in col]
+        if lut is None:
+            lut = brightness_control.lut()
+        
+        for i in range(len(col)):
+            col[i] = lut[int(col[i])]
+        
+        return col
     
     
-    def write_all_leds(self, col: list):
+    def set_frame_source(self, frame_source):
         """
-        Writes the same RGB/RGBW data to all LEDs in the string.
+        Hands the string's rendering to the shared frame scheduler.
 
         Args:
-            col: desired RGB/RGBW values for all LEDs.
+            frame_source: callable(now_ms) rendering a frame into the NeoPixel buffer,
+                returning ms until its next frame is wanted, or None if static. None stops rendering.
+        """
+        
+        self.frame_source = frame_source
+        # render on the next tick
+        self.next_frame_time = time.ticks_ms()
+        renderer.request_frame()
+        
+        
+    def mark_dirty(self):
+        """
+        Flag the NeoPixel buffer as changed, so the scheduler writes it on its next tick.
+        """
+        
+        self.dirty = True
+        renderer.request_frame()
+        
+        
+    @profiling.timed("leds.show")
+    def show(self):
         """
+        Send the NeoPixel buffer to the LEDs. Called by the frame scheduler.
 
-        col = [int(c) for c in col]  # ensure all integers
-        col = tuple(col)  # list to tuple
-        for i in range(self.number_of_leds):
-            self.neopix[i] = col
+        The write (and its bit-banged transfer) is skipped when the frame is byte-identical
+        to the last one sent.
+        """
+        
+        self.dirty = False
+        counts = self.frame_counts.get(self.mode)
+        if counts is None:
+            counts = self.frame_counts[self.mode] = [0, 0]
+        buf = self.neopix.buf
+        
+        if self.last_frame_valid and buf == self.last_frame:
+            counts[1] += 1
+            return
+        
         self.neopix.write()
+        self.last_frame[:] = buf
+        self.last_frame_valid = True
+        counts[0] += 1
+        
+        
+    def frame_stats(self) -> dict:
+        """
+        Frames written and skipped (as unchanged) so far, per mode.
+        """
+        
+        stats = {}
+        for mode in self.frame_counts:
+            written, skipped = self.frame_counts[mode]
+            stats[mode] = {"written": written, "skipped": skipped}
+        return stats
+        
+        
+    def prometheus_lines(self):
+        """
+        Yields:
+            frames written and skipped per mode, as lamp_frames_total samples
+            (the HELP and TYPE lines come from frame_count_lines())
+        """
+        
+        for mode in self.frame_counts:
+            written, skipped = self.frame_counts[mode]
+            yield f'lamp_frames_total{{string="{self.name}",mode="{mode}",result="written"}} {written}\n'
+            yield f'lamp_frames_total{{string="{self.name}",mode="{mode}",result="skipped"}} {skipped}\n'
+        
+        
+    @profiling.timed("leds.write_all_leds")
+    def write_all_leds(self, col: list, lut: bytearray = None):
+        """
+        Sets the same RGB/RGBW data for all LEDs in the string, to be written on the next frame.
+
+        Args:
+            col: desired RGB/RGBW values for all LEDs.
+            lut: optional brightness lookup table, applied once to the pixel pattern.
+        """
+
+        self.set_pixel_pattern(col)
+        if lut is not None:
+            self.adjust_brightness(self.pixel_pattern, lut)
+        self.fill_from_pattern()
+        self.mark_dirty()
+        
+        
+    def set_pixel_pattern(self, col):
+        """
+        Stores a single pixel colour in the preallocated pattern, in wire byte order.
+
+        The GRB/GRBW reordering is applied here, once per colour, rather than once per pixel.
+
+        Args:
+            col: RGB/RGBW values, in any order-able sequence of numbers.
+        """
+        
+        order = self.neopix.ORDER
+        pattern = self.pixel_pattern
+        for i in range(self.bpp):
+            pattern[order[i]] = int(col[i])
+            
+            
+    def fill_from_pattern(self):
+        """
+        Copies the pixel pattern into every pixel of the NeoPixel byte buffer, in one pass.
+        Does not allocate, so can be called every frame without creating garbage.
+        """
+        
+        buf = self.neopix.buf
+        pattern = self.pixel_pattern
+        bpp = self.bpp
+        for offset in range(0, len(buf), bpp):
+            for i in range(bpp):
+                buf[offset + i] = pattern[i]
                 
                 
     def turn_off(self):
         """
         Turn off all LEDs.
         """
+        self.frame_source = None
         col = [0, 0, 0]
         col = self.adjust_for_rgbw(col, off=True)
         self.write_all_leds(col)
         
         
-    async def turn_on(self, rgb: tuple=None):
+    def turn_on(self, rgb: tuple=None):
         """
         Turn on all LEDs in the string to a steady colour. Defaults to white.
 
+        The frame is static, so it is only re-rendered when the brightness changes.
+
         Args:
             rgb: the desired rgb colour
         """
         
-        while True:
+        if rgb:
+            col = list(rgb)
+        else:
+            # default to white
+            col = [255, 255, 255]
+        col = self.adjust_for_rgbw(col)
         
-            if not rgb:
-                # default to white
-                col = [255, 255, 255]
-                
-            col = self.adjust_for_rgbw(col)
-            col = self.adjust_brightness(col)
-            self.write_all_leds(col)
-            
-            await uasyncio.sleep(0.025)
+        def render_steady(now):
+            self.write_all_leds(col, brightness_control.lut())
+            return None
         
+        self.set_frame_source(profiling.wrap("leds.render_steady", render_steady))
         
-    def interpolate_points_gen(
-        self,
-        vertices: list[int],
-        minor_time_steps: int
-        ):
-        """
-        TODO - docstring
-        """
-        
-        # initialize generator & step forward
-        vertices_generator = self.cycle(vertices)
-        next(vertices_generator)
-        
-        # v0 = start value; v1 = end value
-        for v0 in vertices:
-            # reset minor_time_step counter
-            minor_time_step = 0
-            v1 = next(vertices_generator)
-            # calculate linear slope
-            m = (v1 - v0) / minor_time_steps
-            while minor_time_step < minor_time_steps:
-                # calculate interpolated vertex
-                vx = v0 + (m * minor_time_step)
-                minor_time_step += 1
-                yield vx
-            
         
-    def rainbow_gen(
-        self,
-        refresh_rate: float,
-        cycle_period: float,
-        ):
-        """
-        TODO - docstring
+    @profiling.timed("leds.write_table_leds")
+    def write_table_leds(self, table: bytearray, index: int, led_offset: int, lut: bytearray):
         """
-        
-        # define rgb colours at 100% brightness
-        RED = (255, 0, 0)
-        YELLOW = (255, 150, 0)
-        GREEN = (0, 255, 0)
-        CYAN = (0, 255, 255)
-        BLUE = (0, 0, 255)
-        PURPLE = (180, 0, 255)
-        
-        discrete_colour_cycle = [
-            RED,
-            YELLOW,
-            GREEN,
-            CYAN,
-            BLUE,
-            PURPLE
-            ]
-        
-        len_colours = len(discrete_colour_cycle)
-        total_time_steps = cycle_period / refresh_rate
-        # minor_time_steps: count of time steps within a single colour change
-        # e.g. from RED to YELLOW
-        # add one to len_colours to account for "last" to "first" transition
-        minor_time_steps = int(total_time_steps / (len_colours + 1))
-
-        # Now, take discrete list, and make long list.
-        # Preferably as a generator object.
-        # Return the generator object.
-
-        discrete_colour_cycle_gen = self.cycle(discrete_colour_cycle)
-        
-        # this creates what can be pictured, for each element that is R, G, and B,
-        # a set of "vertices" on a "value-time" graph
-        rgb_vertices = [[], [], []]
-        # for i in range(len_colours) + 1):
-        for i in range(len_colours):
-            colour = next(discrete_colour_cycle_gen)
-            for j in range(len(rgb_vertices)):
-                rgb_vertices[j].append(colour[j])
-                
-        # create a generator each for R G and B
-        rgb_gen = []
-        for vertices in rgb_vertices:
-            rgb_gen.append(
-                self.interpolate_points_gen(
-                    vertices,
-                    minor_time_steps
-                    )
+        Sets colours from a packed RGB table to the LEDs, in one pass over the NeoPixel buffer.
+
+        Args:
+            table: packed RGB bytes, e.g. colour.RAINBOW_TABLE
+            index: table entry shown on the first LED
+            led_offset: table entries between neighbouring LEDs. 0 lights all LEDs the same colour.
+            lut: brightness lookup table
+        """
+        
+        n_entries = len(table) // 3
+        
+        if led_offset == 0:
+            e = (index % n_entries) * 3
+            pattern = self.pixel_pattern
+            order = self.neopix.ORDER
+            pattern[order[0]] = lut[table[e]]
+            pattern[order[1]] = lut[table[e + 1]]
+            pattern[order[2]] = lut[table[e + 2]]
+            if self.bpp == 4:
+                pattern[order[3]] = lut[255]
+            self.fill_from_pattern()
+            self.mark_dirty()
+            return
+        
+        buf = self.neopix.buf
+        order = self.neopix.ORDER
+        bpp = self.bpp
+        r_i, g_i, b_i = order[0], order[1], order[2]
+        w = lut[255]
+        
+        offset = 0
+        for led in range(self.number_of_leds):
+            e = ((index + led * led_offset) % n_entries) * 3
+            buf[offset + r_i] = lut[table[e]]
+            buf[offset + g_i] = lut[table[e + 1]]
+            buf[offset + b_i] = lut[table[e + 2]]
+            if bpp == 4:
+                buf[offset + order[3]] = w
+            offset += bpp
+        self.mark_dirty()
+        
+        
+    def turn_on_rainbow(self):
+        """
+        Cycle all LEDs through the rainbow, at the frame scheduler's frame rate.
+
+        Colours come from the precomputed colour.RAINBOW_TABLE, indexed by a fixed-point phase
+        counter, so each frame is a constant-time table lookup.
+        """
+        
+        cycle_period_ms = 5000  # a full cycle, RED back to RED
+        
+        table = colour.RAINBOW_TABLE
+        phase_end = (len(table) // 3) << colour.PHASE_SHIFT
+        # phase advance per ms, in fixed-point table entries
+        phase_per_ms = phase_end // cycle_period_ms
+        self.rainbow_phase = 0
+        self.rainbow_phase_time = time.ticks_ms()
+        
+        def render_rainbow(now):
+            elapsed = time.ticks_diff(now, self.rainbow_phase_time)
+            self.rainbow_phase_time = now
+            self.rainbow_phase = (self.rainbow_phase + elapsed * phase_per_ms) % phase_end
+            self.write_table_leds(
+                table,
+                self.rainbow_phase >> colour.PHASE_SHIFT,
+                self.rainbow_led_offset,
+                brightness_control.lut(),
                 )
+            # next frame as soon as the scheduler allows
+            return 0
         
-        return rgb_gen
-    
-        
-    async def turn_on_rainbow(self):
-        """
-        TODO - docstring
-        """
-        
-        refresh_rate = 0.05  # seconds
-        cycle_period = 5  # seconds from RED to PURPLE
-                
-        rgb_gens = self.rainbow_gen(refresh_rate, cycle_period)
-        
-        while True:
+        self.set_frame_source(profiling.wrap("leds.render_rainbow", render_rainbow))
             
-            try:            
-                col = [
-                    next(rgb_gens[0]),
-                    next(rgb_gens[1]),
-                    next(rgb_gens[2]),
-                    ]
-            except StopIteration:
-                rgb_gens = self.rainbow_gen(refresh_rate, cycle_period)
-                col = [
-                    next(rgb_gens[0]),
-                    next(rgb_gens[1]),
-                    next(rgb_gens[2]),
-                    ]
-                
-            col = self.adjust_for_rgbw(col)
-            col = self.adjust_brightness(col)
-            self.write_all_leds(col)
-            await uasyncio.sleep(refresh_rate)
             
+    async def fade(self, render_level, start_level: int, end_level: int, fade_duration_ms: int):
+        """
+        Step linearly between two integer levels, driven by the frame scheduler.
+
+        The level is computed from elapsed ticks_ms() rather than by counting sleeps, so the fade
+        finishes on time regardless of render cost. A frame is only requested when the next
+        level step is due, e.g. a one hour fade over 255 levels renders 256 frames.
+
+        Args:
+            render_level: callable(level) rendering the frame for a level into the NeoPixel buffer
+            start_level: level at the start of the fade
+            end_level: level at the end of the fade
+            fade_duration_ms: duration of the fade (milliseconds)
+        """
+        
+        done = uasyncio.Event()
+        start_time = time.ticks_ms()
+        steps = abs(end_level - start_level)
+        direction = 1 if end_level >= start_level else -1
+        
+        def render_fade(now):
+            elapsed = time.ticks_diff(now, start_time)
+            if elapsed >= fade_duration_ms or steps == 0:
+                render_level(end_level)
+                done.set()
+                return None
+            
+            step = (elapsed * steps) // fade_duration_ms
+            render_level(start_level + direction * step)
             
+            # first ms at which (elapsed * steps) // fade_duration_ms reaches step + 1
+            next_step_time = ((step + 1) * fade_duration_ms + steps - 1) // steps
+            return next_step_time - elapsed
+        
+        render_fade = profiling.wrap("leds.render_fade", render_fade)
+        self.set_frame_source(render_fade)
+        try:
+            await done.wait()
+        finally:
+            if self.frame_source is render_fade:
+                self.frame_source = None
+        
+        
     async def fadeout_leds(self, fade_duration: float = 1):
         """
         Gradually fade out the LEDs to "off"
@@ -360,24 +593,20 @@ class LEDController:
             fade_duration: time taken to fade to off (seconds)
         """
         
-        time_resolution = 0.01
+        # get the starting state, already in wire byte order
+        start_frame = bytes(self.neopix.buf)
+        buf = self.neopix.buf
+        
+        # one level per 8-bit step of the brightest channel, so every frame is a visible change
+        start_level = max(start_frame) if start_frame else 0
         
-        # get the starting state
-        start_rgb = []
-        for i in range(self.number_of_leds):
-            start_rgb.append(self.neopix[i])
+        def render_level(level):
+            for i in range(len(buf)):
+                buf[i] = (start_frame[i] * level) // start_level
+            self.mark_dirty()
         
-        # loop through time steps, write fade
-        t = 0
-        while t < fade_duration:
-            t_ratio = t / fade_duration
-            for i in range(self.number_of_leds):
-                rgb_t = [int(c * (1 - t_ratio)) for c in start_rgb[i]]
-                rgb_t = tuple(rgb_t)
-                self.neopix[i] = rgb_t
-            self.neopix.write()
-            await uasyncio.sleep(time_resolution)
-            t += time_resolution
+        if start_level:
+            await self.fade(render_level, start_level, 0, int(fade_duration * 1000))
         
         # ensure off at end
         self.turn_off()            
@@ -406,7 +635,6 @@ class LEDController:
         # adjust rgb input
         col = self.adjust_for_rgbw(rgb)
         col = self.adjust_brightness(col)
-        col = [int(c) for c in col]  # ensure all integers
         col = tuple(col)  # list to tuple
         
         # TODO - change this to work with variable number of LEDs on ring
@@ -422,7 +650,7 @@ class LEDController:
         # increment on LEDs up to the "clock face value"
         for i in range(value + 1):
             self.neopix[i] = col
-            self.neopix.write()
+            self.mark_dirty()
             await uasyncio.sleep(0.1)
         
         # hold the final "clock face value" for readability
@@ -446,57 +674,33 @@ class LEDController:
         await self.flash_clock(alarm_time[1], "minute", [0, 0, 255])
         
         
-    def get_seconds_to_alarm(self, alarm_time: tuple, start_fadein_offset: int):
-        # get current hour and minute
-        time_now = RTC().datetime()[4:6]
-        
-        diff_minutes = alarm_time[1] - time_now[1]
-        diff_hours = 24 - time_now[0] + alarm_time[0]
-                
-        if diff_hours == 24:
-            if diff_minutes > 0:
-                diff_hours = 0
-        else:
-            diff_hours = diff_hours % 24
-
-        alarm_countown_seconds = (3600 * diff_hours) + (60 * diff_minutes)
-        alarm_countown_seconds = alarm_countown_seconds - start_fadein_offset
-        # ensure countdown cannot be negative
-        alarm_countown_seconds = max(0, alarm_countown_seconds)
-        
-        return alarm_countown_seconds
-    
-    
-    async def alarm_mode(self):
+    async def alarm_mode(self, alarm: Alarm):
         """
         Gradually increase LED brightness, then gradually fade-out.
+
+        Args:
+            alarm: the alarm going off, for its fade durations
         """
         
         print("Alarm on at", RTC().datetime())
         
         # all in seconds
-        time_resolution = 0.1
         # fade in from 0 to the desired end brightness over this many seconds
-        fadein_duration = 20 * 60
-        # fade out over the duration of an hour
-        fadeout_duration = 3600
-        
-        time_steps = int(fadein_duration / time_resolution)
+        fadein_duration = alarm.fade_in_s
+        # then fade out over this many seconds
+        fadeout_duration = alarm.fade_out_s
         
         # ensure the brightness is at least 75%, as a very low brightness could be currently set.
-        max_brightness = min(self.brightness, 0.75)
+        max_level = colour.brightness_to_level(max(brightness_control.brightness, 0.75))
         
-        colour = (255, 255, 102)  # light yellow
+        col = self.adjust_for_rgbw((255, 255, 102))  # light yellow
+        
+        def render_level(level):
+            # shares the lookup table cache with the normal brightness setting
+            self.write_all_leds(col, colour.brightness_lut(level, brightness_control.gamma))
         
         # fade in
-        step = 0
-        while step < time_steps:
-            brightness = (step / time_steps) * max_brightness
-            col = self.adjust_for_rgbw(colour)
-            col = [c * brightness for c in col]
-            self.write_all_leds(col)            
-            step += 1
-            await uasyncio.sleep(time_resolution)
+        await self.fade(render_level, 0, max_level, fadein_duration * 1000)
             
         # fade out
         await self.fadeout_leds(fade_duration=fadeout_duration)
@@ -508,35 +712,23 @@ class LEDController:
         Handle LED when sunrise mode is selected.
 
         1. Turn off LEDs (assuming they may already be lit)
-        2. Feedback the current alarm time
-        3. Calculate time to wait, and sleep for desired amount of time
-        4. Execute the sunrise wake-up coroutine
+        2. Feedback the next alarm time
+        3. Sleep until the scheduler's next alarm is due
+        4. Execute the sunrise wake-up coroutine, then wait for the following alarm
         """
         
         self.turn_off()
-        # the timer periodically recalculates the remaining seconds,
-        # since the microcontroller's RTC gets updated periodically in the background.
-        # this ensures the remaining seconds to the desired alarm time remains accurate.
-        timer_refresh_period = 3600
-        # offset time - the lights will start coming on this many seconds before the alarm time.
-        start_offset_seconds = 10 * 60
         
-        # Display the alarm time
-        await self.flash_alarm_time_indicator(self.alarm_time)
+        # Display the next alarm time
+        upcoming = scheduler.next_alarm()
+        if upcoming is not None:
+            await self.flash_alarm_time_indicator(upcoming[1].time)
         
         while True:
-            # calculate seconds to alarm (offset seconds subtracted)
-            seconds_remaining = self.get_seconds_to_alarm(self.alarm_time, start_offset_seconds)                
-            print(f"Sleeping for {seconds_remaining} seconds")
-            if seconds_remaining > (timer_refresh_period + start_offset_seconds):
-                await uasyncio.sleep(timer_refresh_period)
-            else:
-                # sleep for the last batch of seconds
-                await uasyncio.sleep(seconds_remaining)
-                # start sunrise wake-up
-                await self.alarm_mode()
-                # finally, return back to top of while loop
-                # if no IRQs triggered, alarm will come on again the next day.
+            # the scheduler wakes exactly when the lights should start coming on,
+            # and keeps track of RTC syncs and alarm changes
+            alarm = await scheduler.wait()
+            await self.alarm_mode(alarm)
 
 
 sunrise_led = LEDController(
@@ -545,6 +737,7 @@ sunrise_led = LEDController(
         number_of_leds=12,
         led_function="sunrise",
         led_type = "rgbw",
+        name="sunrise_led",
     )
 
 main_led = LEDController(
@@ -553,4 +746,17 @@ main_led = LEDController(
         number_of_leds=12, 
         led_function="normal",
         led_type = "rgb",
-    )
\ No newline at end of file
+        name="main_led",
+    )
+
+
+def frame_count_lines():
+    """
+    Yields:
+        both strings' frame counts in Prometheus text format, for the server's /metrics
+    """
+    
+    yield "# HELP lamp_frames_total Frames written to each string, or skipped as unchanged, per mode\n"
+    yield "# TYPE lamp_frames_total counter\n"
+    yield from sunrise_led.prometheus_lines()
+    yield from main_led.prometheus_lines()
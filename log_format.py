@@ -0,0 +1,70 @@
+"""
+Binary log record format, shared by the lamp's logger and the host-side decoder (host/logtool.py).
+
+Each record is a fixed 10 byte little-endian header followed by an optional UTF-8 text:
+- epoch: uint32, seconds since 1970-01-01 in the RTC's time zone
+- event: uint8, one of the EVENT_ codes below
+- text length: uint8, bytes of text following the header
+- value: int32, the event's numeric payload, e.g. free memory in kB
+"""
+
+import struct
+
+
+EVENT_MESSAGE = 0  # free text
+EVENT_MEMORY = 1  # value: free memory (kB)
+EVENT_EXCEPTION = 2  # text: the exception
+EVENT_DROPPED = 3  # value: records lost to a full log buffer
+
+EVENT_NAMES = {
+    EVENT_MESSAGE: "message",
+    EVENT_MEMORY: "memory",
+    EVENT_EXCEPTION: "exception",
+    EVENT_DROPPED: "dropped",
+}
+
+HEADER = "<IBBi"
+HEADER_SIZE = struct.calcsize(HEADER)
+MAX_TEXT_BYTES = 255
+
+
+def describe(event: int, value: int, text: str) -> str:
+    """
+    The record as a text log message, e.g. "210 kB" for a memory record.
+    """
+
+    if event == EVENT_MEMORY:
+        return f"{value} kB"
+    if event == EVENT_DROPPED:
+        return f"{value} log records dropped"
+    return text
+
+
+def pack_record(epoch: int, event: int, value: int = 0, text: str = "") -> bytes:
+    """
+    Returns:
+        the encoded record. Text is truncated to MAX_TEXT_BYTES.
+    """
+
+    encoded = text.encode()[:MAX_TEXT_BYTES]
+    return struct.pack(HEADER, epoch, event, len(encoded), value) + encoded
+
+
+def unpack_records(data: bytes):
+    """
+    Decode records from the contents of a binary log file.
+    A truncated record at the end (e.g. from a power cut mid-write) is ignored.
+
+    Yields:
+        (epoch, event, value, text)
+    """
+
+    offset = 0
+    while offset + HEADER_SIZE <= len(data):
+        epoch, event, length, value = struct.unpack_from(HEADER, data, offset)
+        offset += HEADER_SIZE
+        if offset + length > len(data):
+            break
+        text = bytes(data[offset:offset + length]).decode("utf-8", "replace") if length else ""
+        offset += length
+        yield epoch, event, value, text
@@ -1,61 +1,303 @@
+from dates import datetime_to_epoch
 import gc
+import log_format
+import os
+from telemetry import telemetry
 import uasyncio
 
 
-def get_memory(server):
+def get_memory(server) -> int:
+    """
+    Returns:
+        free memory (kB), after a garbage collection
+    """
 
     gc.collect()
     mem_free = round(gc.mem_free() / 1000)
     print(str(mem_free), "kB")
-    return f"{str(mem_free)} kB"
+    return mem_free
         
 
 def format_time_str(datetime):
     
-    t_dict = {
-        "d": datetime[2],
-        "M": datetime[1],
-        "yyyy": datetime[0],
-        "h": datetime[4],
-        "m":datetime[5],
-        "s": datetime[6],
-        }
-    
-    t = {}
-    
-    for key in t_dict:
-        val_str = str(t_dict[key])
-        if key == "yyyy":
-            t[key] = val_str[-2:]
+    # dd/mm/yy hh:mm:ss
+    return "%02d/%02d/%02d %02d:%02d:%02d" % (
+        datetime[2],
+        datetime[1],
+        datetime[0] % 100,
+        datetime[4],
+        datetime[5],
+        datetime[6],
+        )
+
+
+class LogBuffer:
+    """
+    Log records held in a RAM ring buffer and written to flash in batches.
+
+    A batch is written once flush_records records are waiting, or flush_interval_ms after
+    the first of them, whichever comes first. The log file is rotated by size: when a batch
+    would take it past max_file_bytes, log.csv becomes log.csv.1, log.csv.1 becomes
+    log.csv.2 and so on, keeping at most max_files files.
+
+    Records are text lines ("dd/mm/yy hh:mm:ss message"), or with binary set, compact
+    log_format records in log.bin, decoded on a computer with host/logtool.py.
+    """
+
+    def __init__(
+        self,
+        path: str = None,
+        binary: bool = False,
+        capacity: int = 32,
+        flush_records: int = 16,
+        flush_interval_ms: int = 60000,
+        max_file_bytes: int = 16384,
+        max_files: int = 3,
+        ):
+        """
+        Args:
+            path: current log file, by default log.csv (or log.bin if binary);
+                rotated files get a .1, .2, ... suffix
+            binary: write log_format records rather than text lines
+            capacity: records held in RAM. If full, the oldest record is overwritten (and counted).
+            flush_records: records waiting that trigger a flush
+            flush_interval_ms: longest a record waits before being flushed
+            max_file_bytes: size the current log file is rotated at
+            max_files: log files kept, including the current one
+        """
+        
+        if path is None:
+            path = "log.bin" if binary else "log.csv"
+        self.path = path
+        self.binary = binary
+        self.flush_records = flush_records
+        self.flush_interval_ms = flush_interval_ms
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        
+        # ring buffer of encoded records; head is the oldest waiting record
+        self.records = [None] * capacity
+        self.head = 0
+        self.count = 0
+        # records overwritten since the last flush, and the time of the latest
+        self.dropped = 0
+        self.dropped_datetime = None
+        
+        self.flush_event = uasyncio.Event()
+        
+        
+    def encode(self, datetime, event: int, value: int, text: str):
+        
+        if self.binary:
+            return log_format.pack_record(datetime_to_epoch(datetime), event, value, text)
+        return f"{format_time_str(datetime)} {log_format.describe(event, value, text)}\n"
+        
+        
+    def append(self, datetime, event: int, value: int = 0, text: str = ""):
+        """
+        Queue a record.
+
+        Args:
+            datetime: RTC().datetime() tuple the record is timestamped with
+            event: one of the log_format.EVENT_ codes
+            value: numeric payload, e.g. free memory (kB)
+            text: message text
+        """
+        
+        capacity = len(self.records)
+        if self.count == capacity:
+            # full - overwrite the oldest
+            self.records[self.head] = None
+            self.head = (self.head + 1) % capacity
+            self.count -= 1
+            self.dropped += 1
+            self.dropped_datetime = datetime
+        
+        self.records[(self.head + self.count) % capacity] = self.encode(datetime, event, value, text)
+        self.count += 1
+        
+        if self.count >= self.flush_records:
+            self.flush_event.set()
+        
+        
+    def file_size(self, path: str) -> int:
+        try:
+            return os.stat(path)[6]
+        except OSError:
+            return 0  # doesn't exist yet
+        
+        
+    def file_exists(self, path: str) -> bool:
+        try:
+            os.stat(path)
+            return True
+        except OSError:
+            return False
+        
+        
+    def rotate(self):
+        
+        # drop the oldest file, then shift the rest up one
+        if self.max_files > 1:
+            oldest = f"{self.path}.{self.max_files - 1}"
         else:
-            if len(val_str) == 1:
-                # add leading 0
-                t[key] = f"0{val_str}"
-            else:
-                t[key] = val_str
-    
-    # return dd/mm/yy h:m:s
-    return f"{t['d']}/{t['M']}/{t['yyyy']} {t['h']}:{t['m']}:{t['s']}"
+            oldest = self.path
+        try:
+            os.remove(oldest)
+        except OSError:
+            pass  # not there yet
         
+        for i in range(self.max_files - 1, 0, -1):
+            newer = self.path if i == 1 else f"{self.path}.{i - 1}"
+            try:
+                os.rename(newer, f"{self.path}.{i}")
+            except OSError:
+                pass  # not there yet
         
-def write_to_log(server, message: str = ""):
-    
-    file = open("log.csv", "a")
+        
+    def file_path(self, index: int) -> str:
+        """
+        Path of a log file: 0 is the current file, 1 the most recently rotated, and so on.
+        """
+        return self.path if index == 0 else f"{self.path}.{index}"
+        
+        
+    async def tail_offset(self, path: str, records: int, chunk_bytes: int = 512) -> int:
+        """
+        Byte offset in a log file where its last records records start.
+        The file is scanned a chunk at a time, yielding to the event loop between chunks.
+        """
+        
+        size = self.file_size(path)
+        if records <= 0:
+            return size
+        
+        with open(path, "rb") as f:
+            
+            if self.binary:
+                # records are variable length, so walk the headers from the start,
+                # keeping the offsets of the last few
+                offsets = [0] * records
+                count = 0
+                offset = 0
+                while offset + log_format.HEADER_SIZE <= size:
+                    offsets[count % records] = offset
+                    count += 1
+                    f.seek(offset)
+                    header = f.read(log_format.HEADER_SIZE)
+                    offset += log_format.HEADER_SIZE + header[5]  # text length
+                    if count % 64 == 0:
+                        await uasyncio.sleep_ms(0)
+                return offsets[count % records] if count >= records else 0
+            
+            # text - count line endings back from the end, ignoring the file's final one
+            end = size - 1
+            while end > 0:
+                start = max(0, end - chunk_bytes)
+                f.seek(start)
+                chunk = f.read(end - start)
+                i = len(chunk)
+                while True:
+                    i = chunk.rfind(b"\n", 0, i)
+                    if i < 0:
+                        break
+                    records -= 1
+                    if records == 0:
+                        return start + i + 1
+                end = start
+                await uasyncio.sleep_ms(0)
+            return 0
+        
+        
+    def flush(self):
+        """
+        Write every waiting record to flash, in a single open/write/close.
+        """
+        
+        self.flush_event.clear()
+        if not self.count:
+            return
+        
+        capacity = len(self.records)
+        records = []
+        if self.dropped:
+            records.append(self.encode(self.dropped_datetime, log_format.EVENT_DROPPED, self.dropped, ""))
+            self.dropped = 0
+        for i in range(self.count):
+            index = (self.head + i) % capacity
+            records.append(self.records[index])
+            self.records[index] = None
+        self.head = 0
+        self.count = 0
+        
+        batch = (b"" if self.binary else "").join(records)
+        if self.file_size(self.path) + len(batch) > self.max_file_bytes:
+            self.rotate()
+        
+        with open(self.path, "ab" if self.binary else "a") as f:
+            f.write(batch)
+        
+        
+    async def run(self):
+        """
+        Flush batches for the lifetime of the program.
+        """
+        
+        while True:
+            await self.flush_event.wait()
+            if self.count < self.flush_records:
+                # first record of a batch - give the rest of it time to arrive
+                try:
+                    await uasyncio.wait_for_ms(self.wait_for_full(), self.flush_interval_ms)
+                except uasyncio.TimeoutError:
+                    pass
+            telemetry.wake("log_flush")
+            self.flush()
+        
+        
+    async def wait_for_full(self):
+        while self.count < self.flush_records:
+            self.flush_event.clear()
+            await self.flush_event.wait()
+
+
+# set binary=True for compact log.bin records (see log_format.py)
+log_buffer = LogBuffer(binary=False)
+        
+        
+def log_event(server, event: int, value: int = 0, text: str = "", flush: bool = False):
+    """
+    Queue a timestamped record for the log file.
+
+    Args:
+        server: HTTPServer, whose RTC timestamps the record
+        event: one of the log_format.EVENT_ codes
+        value: numeric payload, e.g. free memory (kB)
+        text: message text
+        flush: write it (and anything else waiting) to flash straight away, e.g. for exceptions
+    """
     
-    t = server.rtc.datetime()
-    t_str = format_time_str(t)
+    log_buffer.append(server.rtc.datetime(), event, value, text)
+    if flush:
+        log_buffer.flush()
+    else:
+        # start the batch's flush_interval_ms countdown
+        log_buffer.flush_event.set()
+        
+        
+def write_to_log(server, message: str = "", flush: bool = False):
+    """
+    Queue a timestamped text message for the log file.
+    """
     
     if not message:
         message = "Hello there!"
     
-    write_str = f"{t_str} {message}\n"
-    file.write(write_str)
-    file.close()
+    log_event(server, log_format.EVENT_MESSAGE, text=str(message), flush=flush)
         
         
 async def write_memory_to_log(server):
     
     while True:
-        memory_str = get_memory(server)
-        write_to_log(server, message=memory_str)        
+        log_event(server, log_format.EVENT_MEMORY, value=get_memory(server))
         await uasyncio.sleep(30 * 60)
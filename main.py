@@ -1,7 +1,12 @@
 from leds import sunrise_led, main_led
 from brightness_control import brightness_control
 from server import HTTPServer
+from renderer import renderer
+from settings import settings
+from telemetry import telemetry
+import log_format
 import logging
+import machine
 import uasyncio
 import json
 import os
@@ -12,7 +17,8 @@ async def log_exceptions(awaitable, s):
         return await awaitable
     except Exception as e:
         print(e)
-        logging.write_to_log(s, e)
+        # flush straight away - the program may be about to stop
+        logging.log_event(s, log_format.EVENT_EXCEPTION, text=str(e), flush=True)
 
 
 def get_wifi_credentials() -> tuple[str, str]:
@@ -33,25 +39,51 @@ def get_wifi_credentials() -> tuple[str, str]:
     return ssid, password
         
 
+async def log_startup_times(server):
+    """
+    Log how long after boot the buttons, Wi-Fi and server became available.
+    """
+    
+    await server.wifi.connected.wait()
+    milestones = ", ".join(f"{name} {ms} ms" for name, ms in telemetry.marks.items())
+    print("Startup:", milestones)
+    logging.write_to_log(server, "startup " + milestones)
+
+
 async def main():
     
     led = machine.Pin('LED', machine.Pin.OUT)
     led.value(True)
     
     print("Running main")
+    
+    # saved brightness, modes and alarms, in place before the first frame
+    settings.restore()
 
     ssid, password = get_wifi_credentials()
     server = HTTPServer(ssid, password)
 
-    uasyncio.create_task(log_exceptions(server.start_server(), server))
-    uasyncio.create_task(log_exceptions(server.auto_update_time(), server))
-    uasyncio.create_task(log_exceptions(logging.write_memory_to_log(server), server))
+    # buttons first, so they respond from boot; Wi-Fi connects in the background
     uasyncio.create_task(log_exceptions(brightness_control.handle_button(), server))
     uasyncio.create_task(log_exceptions(sunrise_led.handle_button(), server))
     uasyncio.create_task(log_exceptions(main_led.handle_button(), server))
+    uasyncio.create_task(log_exceptions(server.wifi.run(), server))
+    uasyncio.create_task(log_exceptions(server.start_server(), server))
+    uasyncio.create_task(log_exceptions(server.auto_update_time(), server))
+    uasyncio.create_task(log_exceptions(server.ntp.correct_drift(), server))
+    uasyncio.create_task(log_exceptions(logging.log_buffer.run(), server))
+    uasyncio.create_task(log_exceptions(telemetry.run(), server))
+    uasyncio.create_task(log_exceptions(settings.run(), server))
+    uasyncio.create_task(log_exceptions(logging.write_memory_to_log(server), server))
+    uasyncio.create_task(log_exceptions(log_startup_times(server), server))
+    
+    # the frame scheduler drives both LED strings for the lifetime of the program.
+    # A failing mode is dropped by it and logged here, rather than stopping the lamp.
+    def log_render_error(controller, e):
+        logging.log_event(server, log_format.EVENT_EXCEPTION, text=f"{controller.name}: {e}", flush=True)
     
-    while True:
-        await uasyncio.sleep(0.01)
+    renderer.on_error.append(log_render_error)
+    await log_exceptions(renderer.run(), server)
 
 
 if __name__ == "__main__":
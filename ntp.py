@@ -0,0 +1,292 @@
+"""
+Asynchronous NTP client, keeping the RTC in time between syncs.
+
+Queries go over a non-blocking UDP socket that is polled between event loop sleeps, so
+rendering carries on during the round trip. Servers are tried in order until one answers.
+
+Between syncs, the clock is modelled from ticks_ms() plus the estimated drift of the
+Pico's crystal. Each sync compares the model with NTP time to refine the drift estimate,
+and the RTC is re-set from the model whenever the accumulated correction reaches a second.
+The sync interval doubles while the model stays accurate, and halves when it doesn't.
+"""
+
+import machine
+import socket
+import struct
+import time
+import uasyncio
+from dates import datetime_to_epoch, epoch_to_datetime
+from telemetry import telemetry
+
+
+# seconds from the NTP epoch (1900) to 1970
+NTP_DELTA = 2208988800
+
+
+class NTPClient:
+
+    def __init__(
+        self,
+        servers: tuple = ("1.europe.pool.ntp.org", "2.europe.pool.ntp.org", "pool.ntp.org"),
+        port: int = 123,
+        timeout_ms: int = 2000,
+        min_interval_s: int = 900,
+        max_interval_s: int = 86400,
+        target_error_ms: int = 250,
+        ):
+        """
+        Args:
+            servers: NTP servers, tried in order
+            port: NTP port
+            timeout_ms: time allowed for each server to answer
+            min_interval_s: shortest (and first) interval between syncs
+            max_interval_s: longest interval between syncs
+            target_error_ms: clock error the sync interval adapts to stay within
+        """
+
+        self.servers = servers
+        self.port = port
+        self.timeout_ms = timeout_ms
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max_interval_s
+        self.target_error_ms = target_error_ms
+        # drift is only estimated over at least this long, for a usable resolution
+        self.min_drift_window_ms = 60000
+        # drift correction is re-evaluated this often
+        self.correction_interval_ms = 60000
+
+        self.rtc = machine.RTC()
+        self.interval_s = min_interval_s
+        # callables(), called each time the RTC is set
+        self.on_set = []
+
+        # clock model: NTP time (ms since 1970) at model_ticks, advanced by ticks_ms() and drift.
+        # ms since 1970 are kept as integers - MicroPython floats are single precision.
+        self.synced = False
+        self.model_epoch_ms = 0
+        self.model_ticks = 0
+        # crystal drift, as a fraction (e.g. 2e-5 means ticks run 20 ppm slow)
+        self.drift = 0.0
+        # drift correction under a ms, carried to the next advance
+        self.correction_fraction = 0.0
+        # ms of drift correction accrued since the RTC was last set
+        self.correction_due_ms = 0
+        self.since_sync_ms = 0
+
+        # stats
+        self.last_server = None
+        self.last_offset_ms = 0
+        self.last_rtt_ms = 0
+        self.syncs = 0
+        self.failures = 0
+
+
+    def request_packet(self) -> bytearray:
+        packet = bytearray(48)
+        packet[0] = 0x1B  # no leap warning, version 3, client mode
+        return packet
+
+
+    async def query(self, server: str):
+        """
+        Ask one server for the time.
+
+        Returns:
+            (NTP time in ms since 1970, ticks_ms() it corresponds to), or None on a timeout,
+            bad reply or network error
+        """
+
+        try:
+            address = socket.getaddrinfo(server, self.port)[0][-1]
+        except OSError as e:
+            print("NTP: can't resolve", server, e)
+            return None
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setblocking(False)
+            sent = time.ticks_ms()
+            sock.sendto(self.request_packet(), address)
+
+            while True:
+                try:
+                    reply = sock.recv(48)
+                    break
+                except OSError:
+                    pass  # nothing yet
+                if time.ticks_diff(time.ticks_ms(), sent) >= self.timeout_ms:
+                    print("NTP: no reply from", server)
+                    return None
+                await uasyncio.sleep_ms(10)
+
+            received = time.ticks_ms()
+        except OSError as e:
+            print("NTP: error querying", server, e)
+            return None
+        finally:
+            sock.close()
+
+        # server mode, a non-zero stratum (0 is a "kiss of death") and a transmit time
+        if len(reply) < 48 or reply[0] & 0x07 != 4 or reply[1] == 0:
+            print("NTP: bad reply from", server)
+            return None
+        seconds, fraction = struct.unpack("!II", reply[40:48])
+        if seconds == 0:
+            return None
+
+        # the reply was sent half a round trip ago
+        self.last_rtt_ms = time.ticks_diff(received, sent)
+        epoch_ms = (seconds - NTP_DELTA) * 1000 + ((fraction * 1000) >> 32) + self.last_rtt_ms // 2
+        return epoch_ms, received
+
+
+    def advance_model(self, now_ticks: int):
+        """
+        Move the clock model on to now_ticks, accruing drift correction.
+        """
+
+        elapsed = time.ticks_diff(now_ticks, self.model_ticks)
+        correction = self.drift * elapsed + self.correction_fraction
+        whole = int(correction)
+        self.correction_fraction = correction - whole
+        self.model_epoch_ms += elapsed + whole
+        self.model_ticks = now_ticks
+        self.correction_due_ms += whole
+        self.since_sync_ms += elapsed
+
+
+    def model_now_ms(self) -> int:
+        elapsed = time.ticks_diff(time.ticks_ms(), self.model_ticks)
+        return self.model_epoch_ms + elapsed + int(self.drift * elapsed + self.correction_fraction)
+
+
+    def apply_sync(self, epoch_ms: int, ticks: int):
+        """
+        Refine the drift estimate and sync interval from an NTP time, then re-anchor the model to it.
+        """
+
+        if self.synced:
+            self.advance_model(ticks)
+            offset = epoch_ms - self.model_epoch_ms
+            self.last_offset_ms = offset
+
+            if self.since_sync_ms >= self.min_drift_window_ms:
+                self.drift += offset / self.since_sync_ms
+                # a crystal is within a few hundred ppm - anything more is a bad reply
+                self.drift = max(-0.0005, min(0.0005, self.drift))
+
+                if abs(offset) < self.target_error_ms / 2:
+                    self.interval_s = min(2 * self.interval_s, self.max_interval_s)
+                elif abs(offset) > self.target_error_ms:
+                    self.interval_s = max(self.interval_s // 2, self.min_interval_s)
+
+        self.model_epoch_ms = epoch_ms
+        self.model_ticks = ticks
+        self.correction_fraction = 0.0
+        self.since_sync_ms = 0
+        self.synced = True
+
+
+    async def set_rtc(self):
+        """
+        Set the RTC from the clock model, on a second boundary (the RTC has whole seconds).
+        """
+
+        await uasyncio.sleep_ms(1000 - self.model_now_ms() % 1000)
+        self.rtc.datetime(epoch_to_datetime((self.model_now_ms() + 500) // 1000))
+        self.correction_due_ms = 0
+        for callback in self.on_set:
+            callback()
+
+
+    async def sync(self) -> bool:
+        """
+        Sync the RTC to the first server that answers.
+
+        Returns:
+            True if a server answered
+        """
+
+        telemetry.wake("ntp")
+        for server in self.servers:
+            result = await self.query(server)
+            if result is None:
+                continue
+
+            before = datetime_to_epoch(self.rtc.datetime())
+            self.apply_sync(*result)
+            await self.set_rtc()
+            self.last_server = server
+            self.syncs += 1
+            print(
+                f"NTP: synced to {server}, RTC was {before - result[0] // 1000:+d} s out, "
+                f"drift {self.drift * 1e6:.1f} ppm, next sync in {self.interval_s} s"
+                )
+            return True
+
+        self.failures += 1
+        return False
+
+
+    async def run(self, connected: uasyncio.Event, sync_now: uasyncio.Event):
+        """
+        Sync every interval_s while connected, and straight away when sync_now is set.
+        Failed syncs are retried after a minute, doubling up to interval_s.
+        """
+
+        retry_s = 60
+        while True:
+            await connected.wait()
+            sync_now.clear()
+
+            if await self.sync():
+                retry_s = 60
+                wait_s = self.interval_s
+            else:
+                wait_s = retry_s
+                retry_s = min(2 * retry_s, self.interval_s)
+
+            try:
+                await uasyncio.wait_for_ms(sync_now.wait(), wait_s * 1000)
+            except uasyncio.TimeoutError:
+                pass
+
+
+    async def correct_drift(self):
+        """
+        Between syncs, re-set the RTC whenever the estimated drift has accrued a second.
+        """
+
+        while True:
+            await uasyncio.sleep_ms(self.correction_interval_ms)
+            if not self.synced:
+                continue
+            self.advance_model(time.ticks_ms())
+            if abs(self.correction_due_ms) >= 1000:
+                await self.set_rtc()
+
+
+    def prometheus_lines(self):
+        """
+        Yields:
+            sync statistics in Prometheus text format, for the server's /metrics
+        """
+
+        yield "# HELP lamp_ntp_syncs_total Successful NTP syncs\n"
+        yield "# TYPE lamp_ntp_syncs_total counter\n"
+        yield f"lamp_ntp_syncs_total {self.syncs}\n"
+        yield "# HELP lamp_ntp_failures_total NTP syncs where no server answered\n"
+        yield "# TYPE lamp_ntp_failures_total counter\n"
+        yield f"lamp_ntp_failures_total {self.failures}\n"
+        yield "# HELP lamp_ntp_offset_seconds Clock model error found by the last sync\n"
+        yield "# TYPE lamp_ntp_offset_seconds gauge\n"
+        yield f"lamp_ntp_offset_seconds {self.last_offset_ms / 1000}\n"
+        yield "# HELP lamp_ntp_rtt_seconds Round trip time of the last NTP query\n"
+        yield "# TYPE lamp_ntp_rtt_seconds gauge\n"
+        yield f"lamp_ntp_rtt_seconds {self.last_rtt_ms / 1000}\n"
+        yield "# HELP lamp_ntp_drift_ppm Estimated drift of the clock crystal\n"
+        yield "# TYPE lamp_ntp_drift_ppm gauge\n"
+        yield f"lamp_ntp_drift_ppm {self.drift * 1e6}\n"
+        yield "# HELP lamp_ntp_interval_seconds Current interval between syncs\n"
+        yield "# TYPE lamp_ntp_interval_seconds gauge\n"
+        yield f"lamp_ntp_interval_seconds {self.interval_s}\n"
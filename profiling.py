@@ -0,0 +1,123 @@
+"""
+Opt-in profiling of hot paths, timed with ticks_us().
+
+Set ENABLED = True to profile. Functions are wrapped when their module is imported, so with
+ENABLED = False the decorators return the function unchanged and cost nothing at runtime.
+
+    @profiling.timed("leds.write_all_leds")
+    def write_all_leds(self, col): ...
+
+    @profiling.timed_async("server.handle_request")
+    async def handle_request(self, request, writer): ...
+
+Results are served at /profile, or written to the log with log_summary().
+"""
+
+import time
+from telemetry import Histogram
+
+
+ENABLED = False
+
+# bucket bounds (microseconds)
+BOUNDS_US = (10, 50, 100, 500, 1000, 5000, 10000, 50000)
+
+# Histogram per profiled name
+histograms = {}
+
+
+def histogram(name: str) -> Histogram:
+    if name not in histograms:
+        histograms[name] = Histogram(BOUNDS_US)
+    return histograms[name]
+
+
+def timed(name: str):
+    """
+    Decorator timing each call of a function.
+    """
+
+    def decorator(f):
+        if not ENABLED:
+            return f
+
+        h = histogram(name)
+
+        def wrapper(*args, **kwargs):
+            start = time.ticks_us()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                h.observe(time.ticks_diff(time.ticks_us(), start))
+
+        return wrapper
+
+    return decorator
+
+
+def timed_async(name: str):
+    """
+    Decorator timing each call of a coroutine function, from start to finish
+    (including time spent waiting).
+    """
+
+    def decorator(f):
+        if not ENABLED:
+            return f
+
+        h = histogram(name)
+
+        async def wrapper(*args, **kwargs):
+            start = time.ticks_us()
+            try:
+                return await f(*args, **kwargs)
+            finally:
+                h.observe(time.ticks_diff(time.ticks_us(), start))
+
+        return wrapper
+
+    return decorator
+
+
+def wrap(name: str, f):
+    """
+    Time calls of a function created at runtime, e.g. a frame source closure.
+    """
+    return timed(name)(f)
+
+
+def reset():
+    for h in histograms.values():
+        h.reset()
+
+
+def summary_lines():
+    """
+    Yields:
+        one line per profiled name, slowest total first: name, calls, total, mean and max
+        time, and the call count per bucket
+    """
+
+    if not ENABLED:
+        yield "profiling disabled - set ENABLED = True in profiling.py\n"
+        return
+
+    yield "name calls total_ms mean_us max_us buckets(<=" + ",".join(str(b) for b in BOUNDS_US) + ",+Inf us)\n"
+    names = sorted(histograms, key=lambda name: -histograms[name].sum_us)
+    for name in names:
+        h = histograms[name]
+        mean_us = h.sum_us // h.count if h.count else 0
+        buckets = ",".join(str(c) for c in h.counts)
+        yield f"{name} {h.count} {h.sum_us / 1000:.1f} {mean_us} {h.max_us} {buckets}\n"
+
+
+def log_summary(server):
+    """
+    Write the summary to the log file.
+    """
+
+    import logging
+
+    for line in summary_lines():
+        logging.write_to_log(server, "profile " + line.rstrip())
+    logging.log_buffer.flush()
@@ -0,0 +1,156 @@
+from telemetry import telemetry
+import time
+import uasyncio
+
+
+class Renderer:
+    """
+    Single frame scheduler shared by every LED string.
+
+    Each registered controller exposes:
+    - frame_source: None, or a callable(now_ms) that renders the next frame into the
+      controller's NeoPixel buffer. It returns the milliseconds until it next wants a frame,
+      or None if the frame is static (only redrawn when the brightness changes).
+    - dirty: True when the buffer holds a frame that has not been sent to the LEDs yet.
+    - show(): sends the buffer to the LEDs.
+    - apply_pending(): applies queued setting changes (e.g. a mode switch), once per tick
+      before rendering, so a burst of changes is applied as its latest value.
+
+    Strings are only written when dirty, and when nothing is animating the scheduler
+    sleeps until a controller requests a frame.
+
+    A frame source that raises is dropped (its string keeps its last frame), so one failing
+    mode doesn't stop the renderer, and the lamp with it.
+    """
+
+    def __init__(self, frame_rate: int = 40):
+
+        self.controllers = []
+        self.wake_event = uasyncio.Event()
+        self.redraw_pending = False
+        # scheduler ticks so far, i.e. wakeups of the render loop
+        self.tick_count = 0
+        # frame sources dropped for raising
+        self.source_errors = 0
+        # callables(controller, exception), called when a frame source raises, e.g. to log it
+        self.on_error = []
+        self.set_frame_rate(frame_rate)
+
+
+    def set_frame_rate(self, frame_rate: int):
+        """
+        Args:
+            frame_rate: maximum frames per second, across all strings
+        """
+        self.frame_ms = 1000 // frame_rate
+
+
+    def register(self, controller):
+        self.controllers.append(controller)
+
+
+    def request_frame(self):
+        """
+        Wake the scheduler, e.g. after a frame source changes or a buffer is marked dirty.
+        """
+        self.wake_event.set()
+
+
+    def request_redraw(self):
+        """
+        Re-render every frame source on the next tick, including static ones.
+        Used when a setting they depend on (e.g. brightness) changes.
+        """
+        self.redraw_pending = True
+        self.wake_event.set()
+
+
+    def drop_source(self, controller, e: Exception):
+        """
+        Stop rendering a controller's frame source that raised e.
+        """
+
+        print("Frame source failed:", e)
+        controller.frame_source = None
+        self.source_errors += 1
+        for callback in self.on_error:
+            callback(controller, e)
+
+
+    def render_frame(self, now: int):
+        """
+        Renders and writes one tick's worth of frames.
+
+        Args:
+            now: time.ticks_ms() at the start of the tick
+
+        Returns:
+            ms from now until the earliest frame wanted by any controller, or None if all are static.
+        """
+
+        self.tick_count += 1
+        redraw = self.redraw_pending
+        self.redraw_pending = False
+        next_delay = None
+
+        for controller in self.controllers:
+
+            controller.apply_pending()
+
+            source = controller.frame_source
+            if source is not None:
+                due = controller.next_frame_time
+                if redraw or (due is not None and time.ticks_diff(now, due) >= 0):
+                    try:
+                        delay = source(now)
+                    except Exception as e:
+                        self.drop_source(controller, e)
+                        source = None
+                        delay = None
+                    if delay is None:
+                        controller.next_frame_time = None
+                    else:
+                        controller.next_frame_time = time.ticks_add(now, delay)
+
+            if controller.dirty:
+                controller.show()
+
+            if source is not None and controller.next_frame_time is not None:
+                delay = time.ticks_diff(controller.next_frame_time, now)
+                if next_delay is None or delay < next_delay:
+                    next_delay = delay
+
+        return next_delay
+
+
+    async def run(self):
+
+        while True:
+
+            now = time.ticks_ms()
+            start_us = time.ticks_us()
+            next_delay = self.render_frame(now)
+            # requests made while rendering (e.g. frame sources marking their buffer dirty)
+            # were served by this tick, so only later ones wake the next
+            self.wake_event.clear()
+            telemetry.record_frame(time.ticks_diff(time.ticks_us(), start_us))
+            telemetry.wake("renderer")
+
+            if next_delay is None:
+                # nothing animating - sleep until a controller asks for a frame
+                await self.wake_event.wait()
+                continue
+
+            wait = max(next_delay, self.frame_ms) - time.ticks_diff(time.ticks_ms(), now)
+
+            if wait > self.frame_ms:
+                # long wait (e.g. a slow fade) - stay responsive to new frame requests
+                try:
+                    await uasyncio.wait_for_ms(self.wake_event.wait(), wait)
+                except uasyncio.TimeoutError:
+                    pass
+            else:
+                await uasyncio.sleep_ms(max(0, wait))
+
+
+renderer = Renderer(frame_rate=40)
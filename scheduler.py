@@ -0,0 +1,335 @@
+"""
+Alarm scheduler: any number of alarms, each on a set of weekdays with its own fade durations.
+
+Upcoming alarms are kept in a priority queue (a heap) ordered by when their lights start
+coming on, and wait() sleeps exactly until the first of them. The queue is only rebuilt
+when the alarms change or the RTC is re-set (see reschedule()).
+
+Alarm times are local time. The RTC keeps UTC, as set over NTP, so local time is UTC plus
+utc_offset_s, plus an hour during European summer time (from 01:00 UTC on the last Sunday
+in March until 01:00 UTC on the last Sunday in October).
+"""
+
+import heapq
+import uasyncio
+from machine import RTC
+from dates import datetime_to_epoch, epoch_to_datetime
+from telemetry import telemetry
+
+
+DAY_NAMES = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+# weekday masks: bit 0 is Monday, as RTC().datetime() weekdays
+WEEKDAYS = 0x1F
+WEEKEND = 0x60
+EVERY_DAY = 0x7F
+
+
+def days_to_mask(days) -> int:
+    """
+    Weekday mask from a mask, "weekdays", "weekend", "daily", or day names, e.g. "mon,wed,fri".
+
+    Raises:
+        ValueError: for an unknown day name, an invalid mask, or anything else
+    """
+
+    if isinstance(days, bool) or not isinstance(days, (int, str)):
+        raise ValueError("days must be day names or a mask")
+    if isinstance(days, int):
+        if not 0 <= days <= EVERY_DAY:
+            raise ValueError("days mask must be 0-127")
+        return days
+
+    days = days.strip().lower()
+    if days == "weekdays":
+        return WEEKDAYS
+    if days == "weekend":
+        return WEEKEND
+    if days == "daily":
+        return EVERY_DAY
+
+    mask = 0
+    for name in days.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in DAY_NAMES:
+            raise ValueError("days must be day names, e.g. mon,wed,fri")
+        mask |= 1 << DAY_NAMES.index(name)
+    return mask
+
+
+def mask_to_days(mask: int) -> str:
+    return ",".join(DAY_NAMES[day] for day in range(7) if mask & (1 << day))
+
+
+class Alarm:
+
+    def __init__(
+        self,
+        hour: int,
+        minute: int,
+        days: int = EVERY_DAY,
+        fade_in_s: int = 20 * 60,
+        fade_out_s: int = 3600,
+        lead_s: int = 10 * 60,
+        enabled: bool = True,
+        ):
+        """
+        Args:
+            hour: alarm time hour, local time
+            minute: alarm time minute
+            days: weekday mask (see days_to_mask())
+            fade_in_s: time the lights take to reach full brightness
+            fade_out_s: time the lights then take to fade out
+            lead_s: the lights start coming on this many seconds before the alarm time
+            enabled: a disabled alarm is kept, but never goes off
+
+        Raises:
+            ValueError: if any setting is invalid
+        """
+
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            raise ValueError("alarm time must be HH:MM")
+        if not (0 <= fade_in_s <= 4 * 3600 and 0 <= fade_out_s <= 4 * 3600 and 0 <= lead_s <= 4 * 3600):
+            raise ValueError("fade and lead times must be 0-14400 seconds")
+
+        self.hour = hour
+        self.minute = minute
+        self.days = days_to_mask(days)
+        self.fade_in_s = fade_in_s
+        self.fade_out_s = fade_out_s
+        self.lead_s = lead_s
+        self.enabled = enabled
+
+
+    @property
+    def time(self) -> tuple:
+        return (self.hour, self.minute)
+
+
+    def to_dict(self) -> dict:
+        return {
+            "time": "%02d:%02d" % self.time,
+            "days": mask_to_days(self.days),
+            "fade_in_s": self.fade_in_s,
+            "fade_out_s": self.fade_out_s,
+            "lead_s": self.lead_s,
+            "enabled": self.enabled,
+            }
+
+
+    @classmethod
+    def from_dict(cls, settings: dict):
+        """
+        Alarm from a dict as returned by to_dict(). Only "time" is required.
+
+        Raises:
+            ValueError: if any setting is missing or invalid
+        """
+
+        if not isinstance(settings, dict) or "time" not in settings:
+            raise ValueError("each alarm needs a time, e.g. {\"time\": \"06:35\"}")
+        parts = str(settings["time"]).split(":")
+        if len(parts) != 2:
+            raise ValueError("alarm time must be HH:MM")
+        hour, minute = int(parts[0]), int(parts[1])
+        defaults = cls(hour, minute)
+
+        # values come from JSON - check their types rather than converting them, so e.g.
+        # "false" isn't taken as true, or 1.5 seconds as 1
+        for name in ("fade_in_s", "fade_out_s", "lead_s"):
+            value = settings.get(name, 0)
+            if isinstance(value, bool) or not isinstance(value, int):
+                raise ValueError(name + " must be a whole number of seconds")
+        enabled = settings.get("enabled", True)
+        if not isinstance(enabled, bool):
+            raise ValueError("enabled must be true or false")
+
+        return cls(
+            hour,
+            minute,
+            days=settings.get("days", defaults.days),
+            fade_in_s=settings.get("fade_in_s", defaults.fade_in_s),
+            fade_out_s=settings.get("fade_out_s", defaults.fade_out_s),
+            lead_s=settings.get("lead_s", defaults.lead_s),
+            enabled=enabled,
+            )
+
+
+class Scheduler:
+
+    def __init__(self, alarms: list = None, utc_offset_s: int = 0, dst: bool = True, max_sleep_ms: int = 86400000):
+        """
+        Args:
+            alarms: initial alarms
+            utc_offset_s: local standard time minus UTC
+            dst: observe European summer time
+            max_sleep_ms: longest single sleep (uasyncio sleeps are limited to a few days)
+        """
+
+        self.utc_offset_s = utc_offset_s
+        self.dst = dst
+        self.max_sleep_ms = max_sleep_ms
+
+        self.rtc = RTC()
+        # optional ms-resolution time source with .synced and .model_now_ms(), e.g. the NTP client;
+        # otherwise the RTC's whole seconds are used
+        self.clock = None
+
+        self.alarms = []
+        # heap of (lights on time in seconds since 1970 UTC, index into self.alarms)
+        self.queue = []
+        # set whenever the queue is rebuilt, to wake wait()
+        self.changed = uasyncio.Event()
+
+        self.set_alarms(alarms or [])
+
+
+    def now_ms(self) -> int:
+        """
+        Current UTC time, in ms since 1970.
+        """
+
+        if self.clock is not None and self.clock.synced:
+            return self.clock.model_now_ms()
+        return datetime_to_epoch(self.rtc.datetime()) * 1000
+
+
+    def summer_time(self, epoch: int) -> tuple:
+        """
+        Start and end of European summer time in the year of epoch, in seconds since 1970 UTC.
+        """
+
+        year = epoch_to_datetime(epoch)[0]
+        bounds = []
+        for month in (3, 10):
+            # the last Sunday (weekday 6) of the month, at 01:00 UTC
+            last_day = datetime_to_epoch((year, month, 31, 0, 1, 0, 0, 0))
+            weekday = epoch_to_datetime(last_day)[3]
+            bounds.append(last_day - ((weekday + 1) % 7) * 86400)
+        return bounds[0], bounds[1]
+
+
+    def local_offset_s(self, epoch: int) -> int:
+        """
+        Local time minus UTC at epoch (seconds since 1970 UTC).
+        """
+
+        if self.dst:
+            start, end = self.summer_time(epoch)
+            if start <= epoch < end:
+                return self.utc_offset_s + 3600
+        return self.utc_offset_s
+
+
+    def local_to_utc(self, local: int) -> int:
+        """
+        UTC time (seconds since 1970) for a local time (also counted from 1970).
+
+        A local time that occurs twice, as the clocks go back, is taken the first time.
+        One that is skipped, as the clocks go forward, moves forward with them, e.g. 01:30
+        becomes 02:30.
+        """
+
+        offsets = (self.utc_offset_s + 3600, self.utc_offset_s) if self.dst else (self.utc_offset_s,)
+        for offset in offsets:
+            utc = local - offset
+            if self.local_offset_s(utc) == offset:
+                return utc
+        return local - self.utc_offset_s
+
+
+    def next_start(self, alarm: Alarm, after: int):
+        """
+        Returns:
+            the next time after `after` that alarm's lights start coming on, in seconds since
+            1970 UTC, or None if it never goes off
+        """
+
+        if not (alarm.enabled and alarm.days):
+            return None
+
+        # the alarm time is on or after the local date of `after`, and within a week of it
+        today = (after + self.local_offset_s(after)) // 86400
+        for day in range(today, today + 9):
+            if not alarm.days & (1 << ((day + 3) % 7)):  # 1970-01-01 was a Thursday
+                continue
+            start = self.local_to_utc(day * 86400 + alarm.hour * 3600 + alarm.minute * 60) - alarm.lead_s
+            if start > after:
+                return start
+        return None
+
+
+    def reschedule(self):
+        """
+        Rebuild the queue from the current time. Called when the alarms change, and when
+        the RTC is re-set.
+        """
+
+        now = self.now_ms() // 1000
+        queue = []
+        for index in range(len(self.alarms)):
+            start = self.next_start(self.alarms[index], now)
+            if start is not None:
+                queue.append((start, index))
+        heapq.heapify(queue)
+        self.queue = queue
+        self.changed.set()
+
+
+    def set_alarms(self, alarms: list):
+        self.alarms = list(alarms)
+        self.reschedule()
+
+
+    def next_alarm(self):
+        """
+        Returns:
+            (lights on time in seconds since 1970 UTC, Alarm) for the next alarm, or None
+        """
+
+        if not self.queue:
+            return None
+        start, index = self.queue[0]
+        return start, self.alarms[index]
+
+
+    async def wait(self) -> Alarm:
+        """
+        Sleep until the next alarm's lights should start coming on.
+
+        An alarm found more than its fade-in time late (e.g. it was due while another alarm
+        was running) is skipped.
+
+        Returns:
+            the alarm
+        """
+
+        while True:
+            telemetry.wake("scheduler")
+            self.changed.clear()
+
+            if not self.queue:
+                await self.changed.wait()
+                continue
+
+            start, index = self.queue[0]
+            delay_ms = start * 1000 - self.now_ms()
+            if delay_ms > 0:
+                try:
+                    await uasyncio.wait_for_ms(self.changed.wait(), min(delay_ms, self.max_sleep_ms))
+                except uasyncio.TimeoutError:
+                    pass
+                continue
+
+            # due: queue the alarm's next occurrence in its place
+            alarm = self.alarms[index]
+            heapq.heappop(self.queue)
+            heapq.heappush(self.queue, (self.next_start(alarm, start), index))
+            if -delay_ms < (alarm.lead_s + alarm.fade_in_s) * 1000:
+                return alarm
+            print("Skipping missed alarm at", "%02d:%02d" % alarm.time)
+
+
+scheduler = Scheduler([Alarm(6, 35)])
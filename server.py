@@ -1,13 +1,20 @@
-import network
-import ntptime
-from time import sleep
+import json
+import time
 import machine
 import rp2
 import sys
 import uasyncio
-from index import webpage
+from index import webpage_chunks
+from http_request import RequestReader, RequestError, parse_range
+import logging
+import profiling
+from state_events import state_events
+from telemetry import telemetry
 from brightness_control import brightness_control
-from leds import sunrise_led, main_led
+from leds import sunrise_led, main_led, frame_count_lines
+from ntp import NTPClient
+from scheduler import Alarm, scheduler
+from wifi import WiFiManager
 
 
 class HTTPServer:
@@ -20,124 +27,537 @@ class HTTPServer:
         
         self.rtc = machine.RTC()
         
-        self.ip = self.connect()
+        # /events: idle streams get a keep-alive comment this often, and a client
+        # that can't take an event within the send timeout is dropped
+        self.events_keepalive_ms = 15000
+        self.events_send_timeout_ms = 2000
         
+        # connection handling: beyond max_clients, new connections get an immediate 503.
+        # a client has request_timeout_ms to send each request, including between kept-alive requests,
+        # and to take each part of a response.
+        self.port = 80
+        self.keep_alive = True
+        self.max_clients = 8
+        self.request_timeout_ms = 5000
+        self.active_clients = 0
+        self.rejected_clients = 0
         
-    def update_time(self):
+        # /log: files are streamed through a buffer of this many bytes; ?tail= is capped at max_log_tail
+        self.log_chunk_bytes = 512
+        self.max_log_tail = 1000
         
-        ntptime.host = "1.europe.pool.ntp.org"
-        print()
-
-        try:
-            print("RTC pre-synchronization", self.rtc.datetime())
-            
-            ntptime.settime()
-            print("RTC post-synchronization ", self.rtc.datetime())
-        
-        except Exception as e:
-          print("Error syncing time", e)
+        # connects in the background - see main.py
+        self.ip = None
+        self.time_sync_event = uasyncio.Event()
+        self.wifi = WiFiManager(ssid, password, status_led=self.pico_led)
+        self.wifi.on_connect.append(self.handle_wifi_connected)
+        self.ntp = NTPClient()
+        # alarms are timed from the NTP clock model, and rescheduled whenever the RTC is set
+        scheduler.clock = self.ntp
+        self.ntp.on_set.append(scheduler.reschedule)
+        self.max_alarms = 8
         
         
     async def auto_update_time(self):
+        """
+        Sync the clock while connected, at an interval adapted to the measured drift,
+        and whenever the Wi-Fi link (re)connects.
+        """
         
-        while True:
-            self.update_time()
-            await uasyncio.sleep(60 * 60)
+        await self.ntp.run(self.wifi.connected, self.time_sync_event)
         
         
     async def start_server(self):
         print("Starting server...")
-        server = await uasyncio.start_server(self.serve_client, "0.0.0.0", 80)
+        server = await uasyncio.start_server(self.serve_client, "0.0.0.0", self.port)
+        telemetry.mark("server_listening")
+
+
+    def handle_wifi_connected(self, ip: str):
+        """
+        Called by the Wi-Fi manager each time the link comes up.
+        """
+        
+        self.ip = ip
+        print(f"Serving on http://{ip}:{self.port}/")
+        # sync the clock now, rather than at the next scheduled sync
+        self.time_sync_event.set()
+        
+        
+    def get_state(self) -> dict:
+        """
+        Current settings, as served by the JSON API.
+        """
+        
+        alarm_time = sunrise_led.alarm_time
+        return {
+            "brightness": round(100 * brightness_control.brightness),
+            "alarm_time": None if alarm_time is None else "%02d:%02d" % alarm_time,
+            "alarms": [alarm.to_dict() for alarm in scheduler.alarms],
+            "sunrise_led": sunrise_led.requested_mode,
+            "main_led": main_led.requested_mode,
+            }
+        
+        
+    def apply_settings(
+        self,
+        brightness: int = None,
+        alarm_time: tuple = None,
+        sunrise_led_mode: str = None,
+        main_led_mode: str = None,
+        alarms: list = None,
+        ):
+        """
+        Apply any combination of settings. Settings left as None are unchanged.
+        All settings are validated before any are applied.
+
+        Mode changes are queued for the renderer's next tick rather than awaited, so this
+        returns straight away; a mode that is already running is left alone.
 
+        Args:
+            brightness: int, 0-100
+            alarm_time: tuple (hour[int], minute[int])
+            sunrise_led_mode: sunrise LED mode; "alarm" is accepted for "sunrise_alarm"
+            main_led_mode: main LED mode
+            alarms: list of scheduler.Alarm, replacing every alarm. alarm_time, if also given,
+                is then applied to the first.
 
-    def connect(self):
-        #Connect to WLAN
-        wlan = network.WLAN(network.STA_IF)
-        wlan.active(True)
+        Raises:
+            ValueError: if any setting is invalid
+        """
+        
+        if brightness is not None and not 0 <= brightness <= 100:
+            raise ValueError("brightness must be 0-100")
+        
+        if alarm_time is not None:
+            if not (0 <= alarm_time[0] < 24 and 0 <= alarm_time[1] < 60):
+                raise ValueError("alarm_time must be HH:MM")
+        
+        if alarms is not None and len(alarms) > self.max_alarms:
+            raise ValueError(f"at most {self.max_alarms} alarms")
+        
+        if sunrise_led_mode is not None:
+            sunrise_led_mode = sunrise_led_mode.lower()
+            if sunrise_led_mode == "alarm":
+                sunrise_led_mode = "sunrise_alarm"
+            if sunrise_led_mode not in sunrise_led.led_options:
+                raise ValueError("sunrise_led must be one of " + ", ".join(sunrise_led.led_options))
+        
+        if main_led_mode is not None:
+            main_led_mode = main_led_mode.lower()
+            if main_led_mode not in main_led.led_options:
+                raise ValueError("main_led must be one of " + ", ".join(main_led.led_options))
+        
+        # process brightness; convert % to decimal
+        if brightness is not None:
+            brightness_control.brightness = brightness / 100
+        
+        # update the alarms first, so a (re)started sunrise mode shows the new time
+        if alarms is not None:
+            sunrise_led.handle_server_alarms_update(alarms)
+        
+        if alarm_time is not None:
+            sunrise_led.handle_server_alarm_time_update(tuple(alarm_time))
+        
+        if sunrise_led_mode is not None:
+            sunrise_led.request_mode(sunrise_led_mode)
+        
+        if main_led_mode is not None:
+            main_led.request_mode(main_led_mode)
+    
+    
+    def write_headers(
+        self,
+        writer,
+        status: bytes,
+        content_type: bytes,
+        length: int,
+        keep_alive: bool = False,
+        headers: bytes = b"",
+        ):
+        """
+        Args:
+            length: body length, or None for a body ended by closing the connection
+            headers: any further header lines, each ending in CRLF
+        """
+        
+        writer.write(b"HTTP/1.1 " + status + b"\r\n")
+        writer.write(b"Content-Type: " + content_type + b"\r\n")
+        if length is None:
+            keep_alive = False
+        else:
+            writer.write(b"Content-Length: %d\r\n" % length)
+        writer.write(headers)
+        if keep_alive:
+            writer.write(b"Connection: keep-alive\r\n\r\n")
+        else:
+            writer.write(b"Connection: close\r\n\r\n")
+    
+    
+    async def drain(self, writer):
+        """
+        Wait for written data to be sent, for up to request_timeout_ms - a client that stops
+        reading would otherwise hold its connection slot forever.
+
+        Raises:
+            uasyncio.TimeoutError: if the client doesn't take the data in time
+        """
+        
+        await uasyncio.wait_for_ms(writer.drain(), self.request_timeout_ms)
+    
+    
+    async def send_response(self, writer, status: bytes, content_type: bytes, body: bytes, keep_alive: bool = False):
+        
+        self.write_headers(writer, status, content_type, len(body), keep_alive)
+        writer.write(body)
+        await self.drain(writer)
+    
+    
+    async def serve_api_state(self, request, writer, keep_alive: bool = False):
+        """
+        GET /api/state: the current settings, as compact JSON.
+        PATCH /api/state: apply a partial JSON update, e.g. {"brightness": 40} or {"main_led": "white"},
+            then respond as for GET.
+        """
+        
+        if request.method == "PATCH":
+            try:
+                update = json.loads(request.body.decode())
+                if not isinstance(update, dict):
+                    raise ValueError("expected a JSON object")
+                
+                alarm_time = update.get("alarm_time")
+                if isinstance(alarm_time, str):
+                    alarm_time = [int(t) for t in alarm_time.split(":")]
+                if alarm_time is not None and len(alarm_time) != 2:
+                    raise ValueError("alarm_time must be HH:MM")
+                
+                alarms = update.get("alarms")
+                if alarms is not None:
+                    if not isinstance(alarms, list):
+                        raise ValueError("alarms must be a list")
+                    alarms = [Alarm.from_dict(alarm) for alarm in alarms]
+                
+                brightness = update.get("brightness")
+                if brightness is not None:
+                    brightness = int(brightness)
+                
+                self.apply_settings(
+                    brightness=brightness,
+                    alarm_time=alarm_time,
+                    sunrise_led_mode=update.get("sunrise_led"),
+                    main_led_mode=update.get("main_led"),
+                    alarms=alarms,
+                    )
+            except (ValueError, TypeError, AttributeError) as e:
+                error = json.dumps({"error": str(e)}, separators=(",", ":"))
+                await self.send_response(writer, b"400 Bad Request", b"application/json", error.encode(), keep_alive)
+                return
+        
+        elif request.method != "GET":
+            await self.send_response(writer, b"405 Method Not Allowed", b"application/json", b'{"error":"use GET or PATCH"}', keep_alive)
+            return
+        
+        state = json.dumps(self.get_state(), separators=(",", ":"))
+        await self.send_response(writer, b"200 OK", b"application/json", state.encode(), keep_alive)
+    
+    
+    async def serve_log(self, request, writer, keep_alive: bool = False):
+        """
+        GET /log: download a log file, streamed a chunk at a time.
+
+        - ?file=N picks a rotated file (log.csv.N); by default the current one
+        - ?tail=N serves only the last N lines (records, for a binary log)
+        - a single byte Range header is honoured (206), so a log can be followed by
+          requesting "bytes=<bytes so far>-" - 416 means nothing new yet
+        """
+        
+        if request.method != "GET":
+            await self.send_response(writer, b"405 Method Not Allowed", b"text/plain", b"use GET", keep_alive)
+            return
+        
+        try:
+            index = int(request.query.get("file", 0))
+            tail = request.query.get("tail")
+            if tail is not None:
+                tail = int(tail)
+                if not 0 < tail <= self.max_log_tail:
+                    raise ValueError
+        except ValueError:
+            message = "file must be a number, tail 1-%d" % self.max_log_tail
+            await self.send_response(writer, b"400 Bad Request", b"text/plain", message.encode(), keep_alive)
+            return
+        
+        log_buffer = logging.log_buffer
+        if index == 0:
+            # include anything still waiting in RAM
+            log_buffer.flush()
+        path = log_buffer.file_path(index)
         
-        print("In connect()")
+        if not 0 <= index < log_buffer.max_files or not log_buffer.file_exists(path):
+            await self.send_response(writer, b"404 Not Found", b"text/plain", b"no such log file", keep_alive)
+            return
         
-        print("wlan.connect() complete")
-        print(wlan.isconnected())
+        size = log_buffer.file_size(path)
+        content_type = b"application/octet-stream" if log_buffer.binary else b"text/csv"
+        status = b"200 OK"
+        headers = b"Accept-Ranges: bytes\r\n"
+        first, last = 0, size - 1
         
-        wlan.connect(self.ssid, self.password)
+        if tail is not None:
+            first = await log_buffer.tail_offset(path, tail, self.log_chunk_bytes)
         
-        timeout = 100  # 10 seconds
+        elif "range" in request.headers:
+            try:
+                byte_range = parse_range(request.headers["range"], size)
+            except ValueError:
+                headers += b"Content-Range: bytes */%d\r\n" % size
+                self.write_headers(writer, b"416 Range Not Satisfiable", b"text/plain", 0, keep_alive, headers)
+                await self.drain(writer)
+                return
+            if byte_range is not None:
+                first, last = byte_range
+                status = b"206 Partial Content"
+                headers += b"Content-Range: bytes %d-%d/%d\r\n" % (first, last, size)
         
-        while not wlan.isconnected() and timeout > 0:
-            print('Waiting for connection...')
-            self.pico_led.toggle()
-            sleep(0.25)
-            timeout -= 1
+        self.write_headers(writer, status, content_type, last + 1 - first, keep_alive, headers)
+        
+        # stream through one fixed buffer, draining each chunk, so the LEDs keep rendering
+        buf = bytearray(self.log_chunk_bytes)
+        view = memoryview(buf)
+        remaining = last + 1 - first
+        with open(path, "rb") as f:
+            f.seek(first)
+            while remaining > 0:
+                n = f.readinto(view[:min(remaining, len(buf))])
+                if not n:
+                    break  # file shrank (e.g. rotated) - the client sees a short body
+                writer.write(view[:n])
+                await self.drain(writer)
+                remaining -= n
+        
+        if remaining:
+            raise OSError("log file changed while being sent")
+        
+        
+    async def serve_metrics(self, request, writer):
+        """
+        GET /metrics: telemetry in Prometheus text format.
+        ?history=1 includes every buffered sample, with timestamps.
+
+        The body is generated as it is sent, so its length isn't known - the connection is
+        closed at the end of it.
+        """
+        
+        history = request.query.get("history") == "1"
+        self.write_headers(writer, b"200 OK", b"text/plain; version=0.0.4", None)
+        
+        lines = 0
+        for source in (telemetry.prometheus_lines(history), frame_count_lines(), self.ntp.prometheus_lines()):
+            for line in source:
+                writer.write(line.encode())
+                lines += 1
+                if lines % 16 == 0:
+                    await self.drain(writer)
+        await self.drain(writer)
+        
+        
+    async def serve_profile(self, request, writer, keep_alive: bool = False):
+        """
+        GET /profile: profiling summary, as plain text (see profiling.py).
+        ?log=1 also writes it to the log, and ?reset=1 then clears it.
+        """
+        
+        body = "".join(profiling.summary_lines()).encode()
+        if request.query.get("log") == "1":
+            profiling.log_summary(self)
+        if request.query.get("reset") == "1":
+            profiling.reset()
+        await self.send_response(writer, b"200 OK", b"text/plain", body, keep_alive)
+        
+        
+    async def serve_events(self, request, writer):
+        """
+        GET /events: a Server-Sent Events stream of state changes.
+
+        The first event carries the whole state (as GET /api/state); later events only carry
+        the fields that changed, e.g. {"brightness":42}.
+        """
+        
+        subscriber = state_events.subscribe()
+        if subscriber is None:
+            await self.send_response(writer, b"503 Service Unavailable", b"text/plain", b"too many event subscribers")
+            return
+        
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\n")
+            writer.write(b"Content-Type: text/event-stream\r\n")
+            writer.write(b"Cache-Control: no-cache\r\n")
+            writer.write(b"Connection: keep-alive\r\n\r\n")
             
-        if not wlan.isconnected():
-            print("Failed to connect to Wi-Fi")
-            return None  # Return None if connection fails
+            changes = self.get_state()
+            while True:
+                if changes:
+                    writer.write(b"data: " + json.dumps(changes, separators=(",", ":")).encode() + b"\n\n")
+                else:
+                    writer.write(b": keep-alive\n\n")
+                await uasyncio.wait_for_ms(writer.drain(), self.events_send_timeout_ms)
+                
+                try:
+                    await uasyncio.wait_for_ms(subscriber.event.wait(), self.events_keepalive_ms)
+                except uasyncio.TimeoutError:
+                    pass
+                
+                if subscriber.dropped:
+                    print("Dropping slow event subscriber")
+                    break
+                changes = subscriber.take()
+        
+        except (OSError, uasyncio.TimeoutError):
+            pass  # client disconnected, or too slow to take an event
+        
+        finally:
+            state_events.unsubscribe(subscriber)
         
-        print("setting IP")
-        ip = wlan.ifconfig()[0]
-        print(f'Connected on {ip}')
         
-        self.pico_led.value(False)
+    def wants_keep_alive(self, request) -> bool:
+        """
+        HTTP/1.1 keeps connections open unless the client asks to close; HTTP/1.0 only if asked.
+        """
         
-        return ip
+        if not self.keep_alive:
+            return False
+        connection = request.headers.get("connection", "").lower()
+        if request.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
     
+    
+    @profiling.timed_async("server.handle_request")
+    async def handle_request(self, request, writer) -> bool:
+        """
+        Route one request to its handler.
 
+        Returns:
+            True if the connection can be kept open for another request
+        """
+        
+        keep_alive = self.wants_keep_alive(request)
+        
+        if request.path == "/events":
+            # long-lived - not a request to time
+            await self.serve_events(request, writer)
+            return False
+        
+        start_us = time.ticks_us()
+        
+        if request.path == "/api/state":
+            await self.serve_api_state(request, writer, keep_alive)
+        elif request.path == "/log":
+            await self.serve_log(request, writer, keep_alive)
+        elif request.path == "/metrics":
+            await self.serve_metrics(request, writer)
+            keep_alive = False
+        elif request.path == "/profile":
+            await self.serve_profile(request, writer, keep_alive)
+        else:
+            await self.serve_page(request, writer, keep_alive)
+        
+        telemetry.record_request(time.ticks_diff(time.ticks_us(), start_us))
+        return keep_alive
+    
+    
     async def serve_client(self, reader, writer):
         #Start a web server
 
-        request = await reader.read(1024)
-        request = request.decode('utf-8')  # Decode bytes to string
+        if self.active_clients >= self.max_clients:
+            # reject straight away, rather than queueing behind the clients being served
+            self.rejected_clients += 1
+            try:
+                await self.send_response(writer, b"503 Service Unavailable", b"text/plain", b"server busy")
+            except (OSError, uasyncio.TimeoutError):
+                pass
+            writer.close()
+            await writer.wait_closed()
+            return
         
-        if request[:4] == "POST":
-
-            request_args = request.split()[-1]
-            arguments = []
-            for a in request_args.split("&"):
-                arguments.append(a.split("=")[1])
-            
-            print("Request arguments:", arguments)
-            
-            brightness, alarm_time, sunrise_led_mode, main_led_mode = arguments
-            # brightness, alarm_time, sunrise_led_mode = arguments
-            
-            # process brightness; convert % str to decimal
-            brightness_control.brightness = int(brightness) / 100
-            
-            # process & handle LED mode arguments
-            sunrise_led_mode = sunrise_led_mode.lower()
-            main_led_mode = main_led_mode.lower()
+        self.active_clients += 1
+        request_reader = RequestReader(reader)
+        
+        try:
+            try:
+                while True:
+                    try:
+                        request = await uasyncio.wait_for_ms(request_reader.read_request(), self.request_timeout_ms)
+                    except uasyncio.TimeoutError:
+                        if request_reader.buffer or request_reader.header_bytes:
+                            await self.send_response(writer, b"408 Request Timeout", b"text/plain", b"request timeout")
+                        break  # idle, or too slow to send a request
+                    
+                    if request is None:
+                        break  # client closed the connection
+                    
+                    if not await self.handle_request(request, writer):
+                        break
             
-            if sunrise_led_mode == "alarm":
-                sunrise_led_mode = "sunrise_alarm"
+            except RequestError as e:
+                print("Bad request:", e.message)
+                await self.send_response(writer, e.status, b"text/plain", e.message.encode())
+        
+        except (OSError, uasyncio.TimeoutError):
+            pass  # connection reset by the client, or it stopped reading the response
+        
+        finally:
+            self.active_clients -= 1
+
+            # Close the connection
+            writer.close()
+            await writer.wait_closed()
+        
+        
+    async def serve_page(self, request, writer, keep_alive: bool = False):
+        """
+        The HTML control page. A POST from its form carries all four settings.
+        """
+        
+        if request.method == "POST":
+
+            try:
+                form = request.form()
+                print("Request arguments:", form)
                 
-            await sunrise_led.handle_server_mode_control(sunrise_led_mode)
-            await main_led.handle_server_mode_control(main_led_mode)
-            
-            # process time
-            alarm_hour = int(alarm_time.split("%3A")[0])
-            alarm_minute = int(alarm_time.split("%3A")[1])
-            alarm_time_tuple = (alarm_hour, alarm_minute)
-            sunrise_led.handle_server_alarm_time_update(alarm_time_tuple)
+                brightness = form.get("percentage")
+                if brightness is not None:
+                    brightness = int(brightness)
+                
+                # process time
+                alarm_time = form.get("time")
+                if alarm_time is not None:
+                    alarm_hour, alarm_minute = alarm_time.split(":")
+                    alarm_time = (int(alarm_hour), int(alarm_minute))
+                
+                self.apply_settings(
+                    brightness=brightness,
+                    alarm_time=alarm_time,
+                    sunrise_led_mode=form.get("sunrise_led"),
+                    main_led_mode=form.get("main_led"),
+                    )
+            except (ValueError, RequestError) as e:
+                await self.send_response(writer, b"400 Bad Request", b"text/plain", str(e).encode(), keep_alive)
+                return
             print()
             
-        # Generate the HTML response
-        response = webpage(
-            int(100 * brightness_control.brightness),
+        # Generate the HTML response - cached until the state changes
+        chunks, length = webpage_chunks(
+            round(100 * brightness_control.brightness),
             sunrise_led.alarm_time,
-            sunrise_led.mode,
-            main_led.mode
+            sunrise_led.requested_mode,
+            main_led.requested_mode
             )
 
         # Send HTTP response
-        writer.write("HTTP/1.1 200 OK\r\n")
-        writer.write("Content-Type: text/html\r\n")
-        writer.write("Connection: close\r\n\r\n")
-        writer.write(response)
-        await writer.drain()  # Ensure all data is sent
-
-        # Close the connection
-        writer.close()
-        await writer.wait_closed()
-
-
+        self.write_headers(writer, b"200 OK", b"text/html", length, keep_alive)
+        # stream the page a chunk at a time, rather than buffering all of it
+        for chunk in chunks:
+            writer.write(chunk)
+            await self.drain(writer)  # Ensure all data is sent
@@ -0,0 +1,180 @@
+"""
+Persistent settings: the brightness, LED modes and alarms are saved to flash, and restored at boot.
+
+Every change is published through state_events, which tells the store. Writes are debounced:
+the file is written once the settings have been unchanged for delay_ms (or max_delay_ms after
+the first unsaved change), so holding the brightness button or a burst of requests costs one
+flash write. Each write goes to a temporary file that is then renamed over the settings file,
+so a power cut mid-write leaves the previous settings intact.
+"""
+
+import json
+import os
+import time
+import uasyncio
+from brightness_control import brightness_control
+from leds import sunrise_led, main_led
+from scheduler import Alarm, scheduler
+from state_events import state_events
+from telemetry import telemetry
+
+
+# published state_events keys that are saved
+KEYS = ("brightness", "sunrise_led", "main_led", "alarms")
+
+
+class Settings:
+
+    def __init__(self, path: str = "settings.json", delay_ms: int = 2000, max_delay_ms: int = 30000):
+        """
+        Args:
+            path: settings file
+            delay_ms: write once the settings have been unchanged this long
+            max_delay_ms: longest a change waits to be written, while changes keep coming
+        """
+
+        self.path = path
+        self.delay_ms = delay_ms
+        self.max_delay_ms = max_delay_ms
+
+        # ticks_ms() of the first and latest unsaved changes
+        self.first_change = None
+        self.last_change = None
+        self.changed = uasyncio.Event()
+        # contents of the settings file, so unchanged settings aren't rewritten
+        self.saved = None
+
+        self.writes = 0
+        self.skipped_writes = 0
+
+        state_events.listeners.append(self.handle_change)
+
+
+    def handle_change(self, key: str, value):
+        if key not in KEYS:
+            return
+        now = time.ticks_ms()
+        if self.first_change is None:
+            self.first_change = now
+        self.last_change = now
+        self.changed.set()
+
+
+    def snapshot(self) -> dict:
+        """
+        The current settings, as saved.
+        """
+
+        return {
+            "brightness": round(100 * brightness_control.brightness),
+            "sunrise_led": sunrise_led.requested_mode,
+            "main_led": main_led.requested_mode,
+            "alarms": [alarm.to_dict() for alarm in scheduler.alarms],
+            }
+
+
+    def load(self) -> dict:
+        """
+        Returns:
+            the saved settings, or None if there are none (or they can't be read)
+        """
+
+        try:
+            with open(self.path) as f:
+                self.saved = f.read()
+            saved = json.loads(self.saved)
+            if not isinstance(saved, dict):
+                raise ValueError("expected a JSON object")
+            return saved
+        except OSError:
+            return None  # first boot
+        except ValueError as e:
+            print("Ignoring unreadable settings:", e)
+            return None
+
+
+    def restore(self):
+        """
+        Apply the saved settings. Called at boot, before the renderer starts, so the first frame
+        is already at the saved brightness and mode. Settings that are missing or invalid are
+        left at their defaults.
+        """
+
+        saved = self.load()
+        if saved is None:
+            return
+
+        # alarms before the sunrise mode, so it shows the right alarm time
+        try:
+            alarms = [Alarm.from_dict(alarm) for alarm in saved["alarms"]]
+            sunrise_led.handle_server_alarms_update(alarms)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            print("Not restoring alarms:", e)
+
+        try:
+            brightness_control.brightness = min(max(int(saved["brightness"]), 0), 100) / 100
+        except (KeyError, TypeError, ValueError) as e:
+            print("Not restoring brightness:", e)
+
+        # mode changes are applied at the renderer's first tick
+        for controller in (sunrise_led, main_led):
+            mode = saved.get(controller.name)
+            if mode in controller.led_options:
+                controller.request_mode(mode)
+
+        print("Restored settings", self.snapshot())
+
+        # restoring publishes every setting - there's nothing new to write unless it differs
+        self.changed.clear()
+        self.first_change = None
+        self.last_change = None
+
+
+    def save(self):
+        """
+        Write the settings, if they differ from the file: to a temporary file, then renamed over it.
+        """
+
+        contents = json.dumps(self.snapshot())
+        if contents == self.saved:
+            self.skipped_writes += 1
+            return
+
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            f.write(contents)
+        os.rename(temp_path, self.path)
+        self.saved = contents
+        self.writes += 1
+
+
+    async def run(self):
+        """
+        Write changes as they settle, for the lifetime of the program.
+        """
+
+        while True:
+            await self.changed.wait()
+
+            # wait for the changes to settle
+            while True:
+                now = time.ticks_ms()
+                quiet_ms = self.delay_ms - time.ticks_diff(now, self.last_change)
+                overdue_ms = self.max_delay_ms - time.ticks_diff(now, self.first_change)
+                wait_ms = min(quiet_ms, overdue_ms)
+                if wait_ms <= 0:
+                    break
+                await uasyncio.sleep_ms(wait_ms)
+
+            telemetry.wake("settings")
+            self.changed.clear()
+            self.first_change = None
+            self.last_change = None
+            try:
+                self.save()
+            except OSError as e:
+                # e.g. the flash is full - try again at the next change
+                print("Error saving settings", e)
+
+
+settings = Settings()
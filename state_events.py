@@ -0,0 +1,103 @@
+import time
+import uasyncio
+
+
+class Subscriber:
+    """
+    One client following state changes. Changes are coalesced per key,
+    so a burst of brightness updates is delivered as its latest value.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.pending_since = None
+        self.event = uasyncio.Event()
+        self.dropped = False
+
+
+    def push(self, key: str, value):
+        if not self.pending:
+            self.pending_since = time.ticks_ms()
+        self.pending[key] = value
+        self.event.set()
+
+
+    def take(self) -> dict:
+        """
+        Returns the changes since the last take(), clearing them.
+        """
+
+        pending = self.pending
+        self.pending = {}
+        self.pending_since = None
+        self.event.clear()
+        return pending
+
+
+    def drop(self):
+        self.dropped = True
+        self.event.set()
+
+
+class StateEvents:
+    """
+    Publishes changes to the lamp's settings (LED modes, brightness, alarm time)
+    to a bounded number of subscribers, e.g. the server's /events stream.
+    """
+
+    def __init__(self, max_subscribers: int = 4, max_lag_ms: int = 5000):
+        """
+        Args:
+            max_subscribers: most subscribers at once
+            max_lag_ms: a subscriber whose changes have been pending this long is dropped
+        """
+
+        self.max_subscribers = max_subscribers
+        self.max_lag_ms = max_lag_ms
+        self.subscribers = []
+        # last published value, per key
+        self.state = {}
+        # callables(key, value), called for every change, e.g. to save settings
+        self.listeners = []
+
+
+    def publish(self, key: str, value):
+        """
+        Record a setting's new value and queue it for every subscriber. Unchanged values are ignored.
+        """
+
+        if key in self.state and self.state[key] == value:
+            return
+        self.state[key] = value
+
+        for listener in self.listeners:
+            listener(key, value)
+
+        now = time.ticks_ms()
+        for subscriber in self.subscribers:
+            if subscriber.pending_since is not None and time.ticks_diff(now, subscriber.pending_since) > self.max_lag_ms:
+                # not keeping up - drop it rather than let it hold memory
+                subscriber.drop()
+            else:
+                subscriber.push(key, value)
+
+
+    def subscribe(self) -> Subscriber:
+        """
+        Returns:
+            a new Subscriber, or None if max_subscribers are already subscribed
+        """
+
+        if len(self.subscribers) >= self.max_subscribers:
+            return None
+        subscriber = Subscriber()
+        self.subscribers.append(subscriber)
+        return subscriber
+
+
+    def unsubscribe(self, subscriber: Subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+
+
+state_events = StateEvents()
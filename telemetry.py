@@ -0,0 +1,279 @@
+"""
+Low-overhead runtime telemetry, exposed by the server at /metrics in Prometheus text format.
+
+Hot paths only update counters and histogram buckets. Heap figures are sampled every
+sample_interval_ms into a fixed array-backed ring buffer, without a gc.collect() -
+a timed collection only runs every gc_every samples.
+"""
+
+from array import array
+import gc
+import time
+import uasyncio
+
+
+class Histogram:
+    """
+    Cumulative histogram of microsecond durations, with fixed bucket bounds.
+    """
+
+    def __init__(self, bounds_us: tuple):
+        """
+        Args:
+            bounds_us: ascending bucket upper bounds (microseconds)
+        """
+
+        self.bounds_us = bounds_us
+        # one count per bound, plus +Inf
+        self.counts = array("I", [0] * (len(bounds_us) + 1))
+        self.count = 0
+        self.sum_us = 0
+        self.max_us = 0
+        # largest duration since the last telemetry sample
+        self.window_max_us = 0
+
+
+    def reset(self):
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.count = 0
+        self.sum_us = 0
+        self.max_us = 0
+        self.window_max_us = 0
+
+
+    def observe(self, us: int):
+
+        i = 0
+        for bound in self.bounds_us:
+            if us <= bound:
+                break
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum_us += us
+        if us > self.window_max_us:
+            self.window_max_us = us
+            if us > self.max_us:
+                self.max_us = us
+
+
+    def take_window_max(self) -> int:
+        us = self.window_max_us
+        self.window_max_us = 0
+        return us
+
+
+    def prometheus_lines(self, name: str, help_text: str):
+        """
+        Yields:
+            the histogram in Prometheus text format, in seconds
+        """
+
+        yield f"# HELP {name} {help_text}\n"
+        yield f"# TYPE {name} histogram\n"
+        cumulative = 0
+        for i in range(len(self.bounds_us)):
+            cumulative += self.counts[i]
+            yield f'{name}_bucket{{le="{self.bounds_us[i] / 1000000}"}} {cumulative}\n'
+        yield f'{name}_bucket{{le="+Inf"}} {self.count}\n'
+        yield f"{name}_sum {self.sum_us / 1000000}\n"
+        yield f"{name}_count {self.count}\n"
+
+
+# fields of each ring buffer sample
+SAMPLE_FIELDS = (
+    "time",  # time.time() (seconds)
+    "heap_free",  # gc.mem_free() (bytes)
+    "heap_allocated",  # gc.mem_alloc() (bytes)
+    "frame_render_max_us",  # slowest frame since the previous sample
+    "http_request_max_us",  # slowest request since the previous sample
+)
+
+
+class Telemetry:
+
+    def __init__(self, sample_interval_ms: int = 10000, capacity: int = 360, gc_every: int = 30):
+        """
+        Args:
+            sample_interval_ms: time between samples
+            capacity: samples kept, e.g. 360 at 10 s is the last hour
+            gc_every: run (and time) a gc.collect() every this many samples
+        """
+
+        self.sample_interval_ms = sample_interval_ms
+        self.capacity = capacity
+        self.gc_every = gc_every
+
+        # ring buffer of samples, SAMPLE_FIELDS per sample, allocated once
+        self.samples = array("I", [0] * (capacity * len(SAMPLE_FIELDS)))
+        self.head = 0  # next sample to write
+        self.count = 0
+        self.sample_count = 0
+
+        # timed collections
+        self.gc_collections = 0
+        self.gc_us_total = 0
+        self.gc_last_us = 0
+        self.heap_free_after_gc = 0
+        # automatic collections, inferred from the allocated heap shrinking between samples
+        self.gc_detected = 0
+
+        # wakeups per task, by name
+        self.wakeups = {}
+        # startup milestones: ticks_ms() (i.e. ms since boot) when each was first reached
+        self.marks = {}
+
+        self.frame_render = Histogram((250, 500, 1000, 2000, 5000, 10000, 25000))
+        self.http_request = Histogram((5000, 10000, 25000, 50000, 100000, 250000, 1000000))
+
+        self.start_time = time.time()
+
+
+    def wake(self, task: str):
+        """
+        Count a wakeup of a long-running task.
+        """
+        self.wakeups[task] = self.wakeups.get(task, 0) + 1
+
+
+    def mark(self, milestone: str):
+        """
+        Record the first time a startup milestone is reached, e.g. "buttons_ready".
+        """
+        if milestone not in self.marks:
+            self.marks[milestone] = time.ticks_ms()
+
+
+    def record_frame(self, us: int):
+        self.frame_render.observe(us)
+
+
+    def record_request(self, us: int):
+        self.http_request.observe(us)
+
+
+    def sample(self):
+        """
+        Append a sample to the ring buffer, overwriting the oldest once full.
+        """
+
+        fields = len(SAMPLE_FIELDS)
+        previous_alloc = self.latest("heap_allocated")
+
+        collect = self.gc_every and self.sample_count % self.gc_every == self.gc_every - 1
+        if collect:
+            start = time.ticks_us()
+            gc.collect()
+            self.gc_last_us = time.ticks_diff(time.ticks_us(), start)
+            self.gc_us_total += self.gc_last_us
+            self.gc_collections += 1
+            self.heap_free_after_gc = gc.mem_free()
+
+        heap_allocated = gc.mem_alloc()
+        if self.count and heap_allocated < previous_alloc and not collect:
+            self.gc_detected += 1
+
+        offset = self.head * fields
+        self.samples[offset] = int(time.time())
+        self.samples[offset + 1] = gc.mem_free()
+        self.samples[offset + 2] = heap_allocated
+        self.samples[offset + 3] = self.frame_render.take_window_max()
+        self.samples[offset + 4] = self.http_request.take_window_max()
+
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        self.sample_count += 1
+
+
+    def latest(self, field: str) -> int:
+        """
+        A field of the most recent sample, or 0 if there are none yet.
+        """
+
+        if not self.count:
+            return 0
+        index = (self.head - 1) % self.capacity
+        return self.samples[index * len(SAMPLE_FIELDS) + SAMPLE_FIELDS.index(field)]
+
+
+    async def run(self):
+        """
+        Sample every sample_interval_ms for the lifetime of the program.
+        """
+
+        while True:
+            self.sample()
+            await uasyncio.sleep_ms(self.sample_interval_ms)
+
+
+    def prometheus_lines(self, history: bool = False):
+        """
+        Yields:
+            the metrics in Prometheus text format, a line at a time. With history, the heap
+            and max latency gauges include every buffered sample with its timestamp,
+            e.g. for charting the last hour after a problem.
+        """
+
+        fields = len(SAMPLE_FIELDS)
+        gauges = (
+            (1, "lamp_heap_free_bytes", "Free heap, without a collection"),
+            (2, "lamp_heap_allocated_bytes", "Allocated heap, without a collection"),
+            (3, "lamp_frame_render_max_seconds", "Slowest frame render in the sample interval"),
+            (4, "lamp_http_request_max_seconds", "Slowest HTTP request in the sample interval"),
+        )
+
+        for field, name, help_text in gauges:
+            yield f"# HELP {name} {help_text}\n"
+            yield f"# TYPE {name} gauge\n"
+            seconds = name.endswith("_seconds")
+            # oldest first; only the latest sample unless history is wanted
+            first = 0 if history else self.count - 1
+            for i in range(max(0, first), self.count):
+                offset = ((self.head - self.count + i) % self.capacity) * fields
+                value = self.samples[offset + field]
+                if seconds:
+                    value = value / 1000000
+                if history:
+                    # Prometheus timestamps are in ms
+                    yield f"{name} {value} {self.samples[offset] * 1000}\n"
+                else:
+                    yield f"{name} {value}\n"
+
+        yield "# HELP lamp_heap_free_after_gc_bytes Free heap after the last timed collection\n"
+        yield "# TYPE lamp_heap_free_after_gc_bytes gauge\n"
+        yield f"lamp_heap_free_after_gc_bytes {self.heap_free_after_gc}\n"
+
+        yield "# HELP lamp_gc_collections_total Timed garbage collections\n"
+        yield "# TYPE lamp_gc_collections_total counter\n"
+        yield f"lamp_gc_collections_total {self.gc_collections}\n"
+        yield "# HELP lamp_gc_last_duration_seconds Duration of the last timed garbage collection\n"
+        yield "# TYPE lamp_gc_last_duration_seconds gauge\n"
+        yield f"lamp_gc_last_duration_seconds {self.gc_last_us / 1000000}\n"
+        yield "# HELP lamp_gc_seconds_total Time spent in timed garbage collections\n"
+        yield "# TYPE lamp_gc_seconds_total counter\n"
+        yield f"lamp_gc_seconds_total {self.gc_us_total / 1000000}\n"
+        yield "# HELP lamp_gc_detected_total Automatic garbage collections seen between samples\n"
+        yield "# TYPE lamp_gc_detected_total counter\n"
+        yield f"lamp_gc_detected_total {self.gc_detected}\n"
+
+        yield "# HELP lamp_task_wakeups_total Wakeups of each long-running task\n"
+        yield "# TYPE lamp_task_wakeups_total counter\n"
+        for task in self.wakeups:
+            yield f'lamp_task_wakeups_total{{task="{task}"}} {self.wakeups[task]}\n'
+
+        yield "# HELP lamp_startup_seconds Time from boot until each startup milestone was first reached\n"
+        yield "# TYPE lamp_startup_seconds gauge\n"
+        for milestone in self.marks:
+            yield f'lamp_startup_seconds{{milestone="{milestone}"}} {self.marks[milestone] / 1000}\n'
+
+        yield "# HELP lamp_uptime_seconds Time since telemetry started\n"
+        yield "# TYPE lamp_uptime_seconds gauge\n"
+        yield f"lamp_uptime_seconds {int(time.time()) - int(self.start_time)}\n"
+
+        yield from self.frame_render.prometheus_lines("lamp_frame_render_seconds", "Frame render and write time")
+        yield from self.http_request.prometheus_lines("lamp_http_request_seconds", "HTTP request handling time")
+
+
+telemetry = Telemetry()
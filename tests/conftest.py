@@ -0,0 +1,53 @@
+"""
+The tests run the lamp's modules on the host stand-ins (see host/__init__.py).
+
+From the repository root:
+    pytest
+
+(`python -m pytest` doesn't work from the repository root: it puts the root first on
+sys.path, so pytest's own `import logging` finds the lamp's logging.py.)
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import host  # noqa: E402
+from host.clock import Clock  # noqa: E402
+
+host.install()
+
+import uasyncio  # noqa: E402
+
+from leds import main_led  # noqa: E402
+from renderer import renderer  # noqa: E402
+
+
+@pytest.fixture
+def virtual_clock():
+    """
+    A virtual clock driving the stand-ins for the test, for use with host.virtual.run().
+    """
+
+    real_clock = host.clock
+    clock = Clock(virtual=True)
+    host.set_clock(clock)
+    yield clock
+    host.set_clock(real_clock)
+
+
+@pytest.fixture
+def solo_renderer(virtual_clock):
+    """
+    The shared renderer driving only main_led, with an event for this test's loop.
+    """
+
+    controllers = renderer.controllers
+    renderer.controllers = [main_led]
+    renderer.wake_event = uasyncio.Event()
+    yield renderer
+    renderer.controllers = controllers
+    renderer.wake_event = uasyncio.Event()
@@ -0,0 +1,59 @@
+"""
+In-memory stand-ins for the uasyncio streams a client connection gives the server.
+"""
+
+import uasyncio
+
+
+class FakeReader:
+    """
+    Returns the given segments one read() at a time (split further if a read asks for less),
+    then b"" as if the client had closed the connection.
+    """
+
+    def __init__(self, *segments: bytes):
+        self.segments = list(segments)
+
+    async def read(self, limit: int = -1) -> bytes:
+        if not self.segments:
+            return b""
+        segment = self.segments.pop(0)
+        if 0 <= limit < len(segment):
+            self.segments.insert(0, segment[limit:])
+            segment = segment[:limit]
+        return segment
+
+
+class FakeWriter:
+    """
+    Collects everything written.
+    """
+
+    def __init__(self, stalled: bool = False):
+        """
+        Args:
+            stalled: drain() never completes, as for a client that has stopped reading
+        """
+
+        self.data = bytearray()
+        self.closed = False
+        self.stalled = stalled
+
+    def write(self, data):
+        self.data.extend(data)
+
+    async def drain(self):
+        if self.stalled:
+            await uasyncio.Event().wait()
+
+    def close(self):
+        self.closed = True
+
+    async def wait_closed(self):
+        pass
+
+    def status_lines(self) -> list:
+        """
+        The status line of every response written, e.g. [b"HTTP/1.1 200 OK"].
+        """
+        return [line for line in bytes(self.data).split(b"\r\n") if line.startswith(b"HTTP/1.1 ")]
@@ -0,0 +1,133 @@
+import pytest
+import uasyncio
+
+from http_request import RequestError, RequestReader, parse_query, url_decode
+from streams import FakeReader
+
+
+def read_all(*segments: bytes, **limits) -> list:
+    """
+    Every request on a connection delivering segments, until it closes.
+    """
+
+    async def main():
+        reader = RequestReader(FakeReader(*segments), **limits)
+        requests = []
+        while True:
+            request = await reader.read_request()
+            if request is None:
+                return requests
+            requests.append(request)
+
+    return uasyncio.run(main())
+
+
+def error_status(*segments: bytes, **limits) -> bytes:
+    with pytest.raises(RequestError) as e:
+        read_all(*segments, **limits)
+    return e.value.status
+
+
+POST = b"POST /api/state?x=1 HTTP/1.1\r\nHost: lamp\r\nContent-Length: 17\r\n\r\n{\"brightness\":40}"
+
+
+def test_request_in_one_segment():
+
+    (request,) = read_all(POST)
+
+    assert request.method == "POST"
+    assert request.path == "/api/state"
+    assert request.query == {"x": "1"}
+    assert request.version == "HTTP/1.1"
+    assert request.headers == {"host": "lamp", "content-length": "17"}
+    assert request.body == b'{"brightness":40}'
+
+
+def test_request_split_across_segments():
+
+    one_byte_segments = [POST[i:i + 1] for i in range(len(POST))]
+    (request,) = read_all(*one_byte_segments)
+
+    assert request.headers["host"] == "lamp"
+    assert request.body == b'{"brightness":40}'
+
+
+def test_pipelined_requests_keep_the_leftover():
+
+    get = b"GET /events HTTP/1.1\r\n\r\n"
+    # the second request starts in the same segment as the first, and ends in a later one
+    requests = read_all(POST + get[:10], get[10:] + b"\r\n" + get)
+
+    assert [r.path for r in requests] == ["/api/state", "/events", "/events"]
+    assert requests[0].body == b'{"brightness":40}'
+    assert requests[1].body == b""
+
+
+def test_body_read_by_content_length():
+
+    (request,) = read_all(b"POST / HTTP/1.1\r\nContent-Length: 5\r\n\r\nab", b"cde")
+
+    assert request.body == b"abcde"
+
+
+def test_closed_between_requests():
+    assert read_all() == []
+    assert read_all(b"\r\n") == []
+
+
+@pytest.mark.parametrize("segments,limits,status", [
+    ((b"GET /" + b"x" * 3000 + b" HTTP/1.1\r\n\r\n",), {}, b"431 Request Header Fields Too Large"),
+    ((b"GET / HTTP/1.1\r\n" + b"X: y\r\n" * 40 + b"\r\n",), {}, b"431 Request Header Fields Too Large"),
+    ((b"GET / HTTP/1.1\r\n" + b"X: " + b"y" * 100, b"y" * 100), {"max_header_bytes": 128}, b"431 Request Header Fields Too Large"),
+    ((b"POST / HTTP/1.1\r\nContent-Length: 4096\r\n\r\n",), {}, b"413 Payload Too Large"),
+    ((b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n",), {}, b"501 Not Implemented"),
+    ((b"GET /\r\n\r\n",), {}, b"400 Bad Request"),
+    ((b"GET / HTTP/1.1\r\nno colon\r\n\r\n",), {}, b"400 Bad Request"),
+    ((b"POST / HTTP/1.1\r\nContent-Length: x\r\n\r\n",), {}, b"400 Bad Request"),
+    ((b"POST / HTTP/1.1\r\nContent-Length: -1\r\n\r\n",), {}, b"400 Bad Request"),
+    ((b"POST / HTTP/1.1\r\nContent-Length: 10\r\n\r\nabc",), {}, b"400 Bad Request"),
+    ((b"GET / HTTP/1.1\r\nHost: la",), {}, b"400 Bad Request"),
+    ], ids=[
+    "long request line", "too many headers", "long header over segments", "large body",
+    "chunked", "malformed request line", "malformed header", "invalid content-length",
+    "negative content-length", "incomplete body", "incomplete headers",
+    ])
+def test_rejected_requests(segments, limits, status):
+    assert error_status(*segments, **limits) == status
+
+
+@pytest.mark.parametrize("segments", [
+    (b"\xff\xfe / HTTP/1.1\r\n\r\n",),
+    (b"GET / HTTP/1.1\r\nX-Name: \xff\r\n\r\n",),
+    (b"GET /?brightness=%FF HTTP/1.1\r\n\r\n",),
+    ], ids=["request line", "header", "query"])
+def test_non_utf8_is_a_bad_request(segments):
+    assert error_status(*segments) == b"400 Bad Request"
+
+
+def test_non_utf8_form_body():
+
+    (request,) = read_all(b"POST / HTTP/1.1\r\nContent-Length: 14\r\n\r\npercentage=%FF")
+
+    with pytest.raises(RequestError) as e:
+        request.form()
+    assert e.value.status == b"400 Bad Request"
+
+
+def test_url_decoding():
+
+    assert url_decode("07%3A15") == "07:15"
+    assert url_decode("a+b%20c") == "a b c"
+    assert url_decode("caf%C3%A9") == "café"
+    # not escapes - kept as they were
+    assert url_decode("100%") == "100%"
+    assert url_decode("%zz") == "%zz"
+    assert parse_query("time=07%3A15&main_led=white&&time=08%3A00") == {"time": "08:00", "main_led": "white"}
+
+
+def test_new_reader_has_read_nothing():
+
+    reader = RequestReader(FakeReader())
+
+    assert reader.buffer == b""
+    assert reader.header_bytes == 0
@@ -0,0 +1,111 @@
+import time
+import tracemalloc
+
+import pytest
+import uasyncio
+
+import colour
+from host import virtual
+from leds import frame_count_lines, main_led, sunrise_led
+from renderer import renderer
+
+
+def peak_allocation(f) -> int:
+    """
+    Bytes allocated at the peak of a call of f, after a warm-up call.
+    """
+
+    f()
+    tracemalloc.start()
+    try:
+        f()
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        f()
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("controller", [main_led, sunrise_led], ids=["rgb", "rgbw"])
+def test_solid_frame_allocates_nothing(controller):
+    """
+    A solid-colour frame (write_all_leds() then show()) allocates nothing that outlives it,
+    and nothing while it runs beyond the temporaries CPython itself needs.
+
+    CPython allocates an object for every range() iterator, which MicroPython doesn't (its
+    compiler turns `for i in range(...)` into a counter), and the host's uasyncio Event
+    allocates in set(). So write_all_leds() is allowed the peak of the same loops and
+    request_frame() on their own. Strings are kept to 12 LEDs, so every index is a small int
+    (CPython boxes ints above 256; MicroPython doesn't below 2**30).
+    """
+
+    col = controller.adjust_for_rgbw([255, 200, 100])
+    lut = colour.brightness_lut(100, 1.0)
+    buf = controller.neopix.buf
+    bpp = controller.bpp
+
+    def interpreter_temporaries():
+        for i in range(bpp):
+            pass
+        for offset in range(0, len(buf), bpp):
+            for i in range(bpp):
+                pass
+        renderer.request_frame()
+
+    def frame():
+        controller.write_all_leds(col, lut)
+        controller.show()
+
+    frame()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for _ in range(50):
+            frame()
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+    assert retained == 0
+    assert peak_allocation(controller.show) == 0
+    assert peak_allocation(lambda: controller.write_all_leds(col, lut)) <= peak_allocation(interpreter_temporaries)
+
+
+def test_frame_counts_are_exported():
+    main_led.write_all_leds([1, 2, 3])
+    main_led.show()
+    main_led.show()  # unchanged, so skipped
+    written, skipped = main_led.frame_counts[main_led.mode]
+
+    lines = list(frame_count_lines())
+
+    assert lines[1] == "# TYPE lamp_frames_total counter\n"
+    assert f'lamp_frames_total{{string="main_led",mode="{main_led.mode}",result="written"}} {written}\n' in lines
+    assert f'lamp_frames_total{{string="main_led",mode="{main_led.mode}",result="skipped"}} {skipped}\n' in lines
+    assert any(line.startswith('lamp_frames_total{string="sunrise_led",') for line in lines)
+
+
+@pytest.mark.parametrize("switch_s", [0.5, 0.51, 0.525, 0.54])
+def test_no_old_mode_frame_after_a_switch(solo_renderer, virtual_clock, switch_s):
+
+    main_led.neopix.frames.clear()
+    off_frame = bytes(len(main_led.neopix.buf))
+
+    async def scenario():
+        task = uasyncio.create_task(renderer.run())
+        main_led.request_mode("rainbow")
+        await uasyncio.sleep(switch_s)
+        counts = list(main_led.frame_counts["off"])
+        switched_ms = time.ticks_ms()
+        main_led.request_mode("off")
+        await uasyncio.sleep(0.5)
+        task.cancel()
+        return counts, switched_ms
+
+    (counts, switched_ms), _ = virtual.run(scenario(), virtual_clock)
+
+    # only the off frame is written, and nothing else is counted under the new mode
+    after = [frame for ticks, frame in main_led.neopix.frames if time.ticks_diff(ticks, switched_ms) >= 0]
+    assert after == [off_frame]
+    assert main_led.frame_counts["off"] == [counts[0] + 1, counts[1]]
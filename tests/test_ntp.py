@@ -0,0 +1,158 @@
+import calendar
+import socket
+import time
+
+import pytest
+import uasyncio
+
+import host
+from host import ntp_server
+from host.clock import Clock
+from dates import datetime_to_epoch, epoch_to_datetime
+from ntp import NTPClient
+
+
+@pytest.fixture
+def real_clock():
+    """
+    A real-time clock of its own, as the client sets the RTC.
+    """
+
+    saved_clock = host.clock
+    clock = Clock()
+    host.set_clock(clock)
+    yield clock
+    host.set_clock(saved_clock)
+
+
+@pytest.fixture
+def start_server():
+    """
+    Starts local NTP servers (see host/ntp_server.py), shut down after the test.
+    """
+
+    servers = []
+
+    def start(**kwargs):
+        server = ntp_server.start(**kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_query_recovers_the_offset(real_clock, start_server):
+
+    server = start_server(offset_ms=1500, drift_ppm=40)
+    client = NTPClient(servers=("127.0.0.1",), port=server.port)
+
+    epoch_ms, ticks = uasyncio.run(client.query("127.0.0.1"))
+
+    served_ms = server.now() * 1000
+    assert abs(epoch_ms + time.ticks_diff(time.ticks_ms(), ticks) - served_ms) < 50
+
+    client.apply_sync(epoch_ms, ticks)
+    assert client.synced
+    assert abs(client.model_now_ms() - server.now() * 1000) < 50
+
+
+def test_sync_sets_the_rtc(real_clock, start_server):
+
+    server = start_server(offset_ms=-3600000)
+    client = NTPClient(servers=("127.0.0.1",), port=server.port)
+    resets = []
+    client.on_set.append(lambda: resets.append(True))
+
+    assert uasyncio.run(client.sync())
+
+    assert abs(real_clock.epoch() - server.now()) < 1
+    assert client.syncs == 1 and client.last_server == "127.0.0.1"
+    assert resets == [True]
+
+
+def test_failover_to_the_next_server(real_clock, start_server, monkeypatch):
+
+    down = start_server()
+    down.available = False
+    up = start_server()
+    addresses = {"down.test": ("127.0.0.1", down.port), "up.test": ("127.0.0.1", up.port)}
+    monkeypatch.setattr(socket, "getaddrinfo", lambda name, port: [(None, None, None, "", addresses[name])])
+
+    client = NTPClient(servers=("down.test", "up.test"), timeout_ms=200)
+    assert uasyncio.run(client.sync())
+
+    assert down.requests == 1 and up.requests == 1
+    assert client.last_server == "up.test"
+    assert client.syncs == 1 and client.failures == 0
+
+    up.available = False
+    assert not uasyncio.run(client.sync())
+    assert client.failures == 1
+
+
+def sync_with_crystal(client, intervals: list, error_ppm: float, start_ticks: int, start_ms: int):
+    """
+    Sync client at each of its intervals from NTP times synthesised for a crystal running
+    error_ppm slow, appending the interval used to intervals.
+
+    Returns:
+        the ticks and NTP time of the last sync
+    """
+
+    elapsed_ms = client.interval_s * 1000
+    ticks = time.ticks_add(start_ticks, elapsed_ms)
+    epoch_ms = start_ms + round(elapsed_ms * (1 + error_ppm / 1e6))
+    intervals.append(client.interval_s)
+    client.apply_sync(epoch_ms, ticks)
+    return ticks, epoch_ms
+
+
+def test_drift_and_interval_adapt():
+
+    client = NTPClient(min_interval_s=900, max_interval_s=86400, target_error_ms=250)
+    ticks, epoch_ms = 0, 1774400000000
+    client.apply_sync(epoch_ms, ticks)
+
+    # 40 ppm: the drift converges, and the interval doubles up to the maximum
+    intervals = []
+    for _ in range(10):
+        ticks, epoch_ms = sync_with_crystal(client, intervals, 40, ticks, epoch_ms)
+    assert abs(client.drift * 1e6 - 40) < 0.5
+    assert intervals == [900, 1800, 3600, 7200, 14400, 28800, 57600, 86400, 86400, 86400]
+    assert abs(client.last_offset_ms) < 250 / 2
+
+    # the crystal warms up to 60 ppm: a day's error is well over target_error_ms, so the
+    # interval halves, then doubles again once the new drift is learned
+    intervals = []
+    for _ in range(3):
+        ticks, epoch_ms = sync_with_crystal(client, intervals, 60, ticks, epoch_ms)
+    assert intervals == [86400, 43200, 86400]
+    assert abs(client.drift * 1e6 - 60) < 0.5
+
+
+def test_drift_needs_a_minimum_window():
+
+    client = NTPClient()
+    client.apply_sync(1774400000000, 0)
+    client.apply_sync(1774400000000 + 10010, 10000)
+
+    # 10 ms in 10 s would be 1000 ppm - too short a window to estimate from
+    assert client.drift == 0
+    assert client.interval_s == client.min_interval_s
+
+
+@pytest.mark.parametrize("datetime", [
+    (1970, 1, 1, 3, 0, 0, 0, 0),
+    (2000, 2, 29, 1, 12, 34, 56, 0),
+    (2026, 3, 29, 6, 1, 0, 0, 0),
+    (2026, 12, 31, 3, 23, 59, 59, 0),
+    (2100, 3, 1, 0, 0, 0, 0, 0),
+    ])
+def test_epoch_to_datetime_round_trips(datetime):
+
+    epoch = datetime_to_epoch(datetime)
+    assert epoch_to_datetime(epoch) == datetime
+    assert epoch == calendar.timegm(datetime[:3] + datetime[4:7])
@@ -0,0 +1,112 @@
+import uasyncio
+
+import colour
+from brightness_control import brightness_control
+from host import virtual
+from leds import main_led
+from renderer import renderer
+
+
+def run_with_renderer(scenario, clock):
+    """
+    Run scenario() alongside the renderer.
+
+    Returns:
+        (scheduler ticks, frames written) during the scenario
+    """
+
+    async def main():
+        task = uasyncio.create_task(renderer.run())
+        await uasyncio.sleep(0.1)
+        ticks, writes = renderer.tick_count, main_led.neopix.write_count
+        await scenario()
+        await uasyncio.sleep(0.1)
+        task.cancel()
+        return renderer.tick_count - ticks, main_led.neopix.write_count - writes
+
+    result, _ = virtual.run(main(), clock)
+    return result
+
+
+def test_fade_takes_one_tick_per_frame(solo_renderer, virtual_clock):
+
+    async def fade():
+        main_led.write_all_leds(main_led.adjust_for_rgbw([255, 255, 255]))
+        await uasyncio.sleep(0.1)
+        await main_led.fadeout_leds(fade_duration=10)
+
+    ticks, writes = run_with_renderer(fade, virtual_clock)
+
+    assert writes >= 255
+    # the write of the initial frame, plus the frame that turns the string off after the fade
+    assert ticks <= writes + 2
+
+
+def test_static_redraw_takes_one_tick(solo_renderer, virtual_clock):
+
+    async def brightness_changes():
+        main_led.turn_on()
+        await uasyncio.sleep(0.1)
+        for i in range(10):
+            brightness_control.brightness = 0.2 + 0.05 * i
+            await uasyncio.sleep(0.1)
+
+    ticks, writes = run_with_renderer(brightness_changes, virtual_clock)
+
+    assert writes == 11
+    assert ticks == 11
+
+
+def test_failing_frame_source_is_dropped(solo_renderer, virtual_clock):
+
+    errors = []
+    renderer.on_error.append(lambda controller, e: errors.append((controller, str(e))))
+
+    def failing_source(now):
+        raise ValueError("bad frame")
+
+    async def scenario():
+        task = uasyncio.create_task(renderer.run())
+        main_led.set_frame_source(failing_source)
+        await uasyncio.sleep(0.1)
+        dropped = main_led.frame_source is None
+        # the renderer carries on with the next mode
+        writes = main_led.neopix.write_count
+        main_led.request_mode("white", restart=True)
+        await uasyncio.sleep(0.1)
+        running = not task.done()
+        task.cancel()
+        return dropped, running, main_led.neopix.write_count - writes
+
+    try:
+        (dropped, running, writes), _ = virtual.run(scenario(), virtual_clock)
+    finally:
+        renderer.on_error.clear()
+
+    assert dropped and running
+    assert writes == 1
+    assert errors == [(main_led, "bad frame")]
+
+
+def test_gamma_change_redraws_static_frames(solo_renderer, virtual_clock):
+
+    brightness_control.brightness = 0.5
+    writes = []
+
+    async def gamma_change():
+        main_led.turn_on()
+        await uasyncio.sleep(0.1)
+        writes.append(main_led.neopix.write_count)
+        brightness_control.gamma = 2.2
+        await uasyncio.sleep(0.1)
+        writes.append(main_led.neopix.write_count)
+
+    try:
+        run_with_renderer(gamma_change, virtual_clock)
+        frame = main_led.neopix.pixels()[0]
+    finally:
+        brightness_control.gamma = 1.0
+
+    assert writes[1] - writes[0] == 1
+    # full-brightness channels at half brightness, through the curve
+    assert frame[0] == int(255 * (colour.brightness_to_level(0.5) / 255) ** 2.2)
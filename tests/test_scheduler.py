@@ -0,0 +1,187 @@
+import calendar
+
+import pytest
+import uasyncio
+
+from host import virtual
+from scheduler import EVERY_DAY, WEEKDAYS, WEEKEND, Alarm, Scheduler, days_to_mask, mask_to_days
+
+
+def utc(*datetime) -> int:
+    """
+    Seconds since 1970 for a UTC (year, month, day, hours, minutes).
+    """
+    return calendar.timegm(datetime + (0,))
+
+
+def test_days_to_mask():
+
+    assert days_to_mask("weekdays") == WEEKDAYS
+    assert days_to_mask("Weekend") == WEEKEND
+    assert days_to_mask("daily") == EVERY_DAY
+    assert days_to_mask("mon, wed,fri") == 0b0010101
+    assert days_to_mask("sun") == 0b1000000
+    assert days_to_mask(5) == 5
+    assert mask_to_days(0b1010101) == "mon,wed,fri,sun"
+
+    for invalid in ("monday", 128, -1):
+        with pytest.raises(ValueError):
+            days_to_mask(invalid)
+
+
+@pytest.mark.parametrize("year,start,end", [
+    (2026, utc(2026, 3, 29, 1, 0), utc(2026, 10, 25, 1, 0)),
+    (2027, utc(2027, 3, 28, 1, 0), utc(2027, 10, 31, 1, 0)),
+    # 31 March and 31 October are themselves Sundays
+    (2024, utc(2024, 3, 31, 1, 0), utc(2024, 10, 27, 1, 0)),
+    (2030, utc(2030, 3, 31, 1, 0), utc(2030, 10, 27, 1, 0)),
+    ])
+def test_summer_time_is_from_the_last_sundays(year, start, end):
+    assert Scheduler().summer_time(utc(year, 7, 1, 0, 0)) == (start, end)
+
+
+@pytest.mark.parametrize("alarm,after,start", [
+    # the clocks go forward at 01:00 UTC on 29 March 2026: 01:30 doesn't happen, and moves to 02:30
+    (Alarm(1, 30), utc(2026, 3, 29, 0, 0), utc(2026, 3, 29, 1, 20)),
+    (Alarm(7, 0), utc(2026, 3, 28, 12, 0), utc(2026, 3, 29, 5, 50)),
+    # past midnight local time, on the Saturday
+    (Alarm(0, 5, days="sat"), utc(2026, 3, 26, 12, 0), utc(2026, 3, 27, 23, 55)),
+    (Alarm(7, 0, days="weekdays"), utc(2026, 3, 28, 12, 0), utc(2026, 3, 30, 5, 50)),
+    # the clocks go back at 01:00 UTC on 25 October 2026: 01:30 happens twice, the first time in summer time
+    (Alarm(1, 30), utc(2026, 10, 25, 0, 0), utc(2026, 10, 25, 0, 20)),
+    (Alarm(1, 30), utc(2026, 10, 25, 0, 20), utc(2026, 10, 26, 1, 20)),
+    (Alarm(0, 5), utc(2026, 10, 24, 12, 0), utc(2026, 10, 24, 22, 55)),
+    (Alarm(7, 0, days="weekdays"), utc(2026, 10, 24, 12, 0), utc(2026, 10, 26, 6, 50)),
+    # weekday masks
+    (Alarm(7, 0, days="mon,wed,fri", lead_s=0), utc(2026, 1, 7, 8, 0), utc(2026, 1, 9, 7, 0)),
+    (Alarm(7, 0, days="sun", lead_s=0), utc(2026, 1, 4, 6, 59), utc(2026, 1, 4, 7, 0)),
+    (Alarm(7, 0, days="sun", lead_s=0), utc(2026, 1, 4, 7, 0), utc(2026, 1, 11, 7, 0)),
+    # the lead time can put the lights on the day before
+    (Alarm(0, 10, days="mon", lead_s=3600), utc(2026, 1, 4, 12, 0), utc(2026, 1, 4, 23, 10)),
+    ])
+def test_next_start(alarm, after, start):
+    assert Scheduler().next_start(alarm, after) == start
+
+
+def test_next_start_in_another_time_zone():
+
+    # Central European Time: summer time starts and ends at the same UTC instants
+    scheduler = Scheduler(utc_offset_s=3600)
+    assert scheduler.next_start(Alarm(2, 30, lead_s=0), utc(2026, 3, 29, 0, 0)) == utc(2026, 3, 29, 1, 30)
+    assert scheduler.next_start(Alarm(2, 30, lead_s=0), utc(2026, 10, 24, 12, 0)) == utc(2026, 10, 25, 0, 30)
+    assert Scheduler(dst=False).next_start(Alarm(7, 0, lead_s=0), utc(2026, 7, 1, 0, 0)) == utc(2026, 7, 1, 7, 0)
+
+
+def test_alarms_that_never_go_off():
+
+    scheduler = Scheduler()
+    assert scheduler.next_start(Alarm(7, 0, enabled=False), utc(2026, 1, 1, 0, 0)) is None
+    assert scheduler.next_start(Alarm(7, 0, days=0), utc(2026, 1, 1, 0, 0)) is None
+
+
+def run_alarms(clock, alarms: list, start: int, until: int) -> list:
+    """
+    Run Scheduler.wait() in virtual time from start to until (seconds since 1970 UTC).
+
+    Returns:
+        (seconds since 1970 UTC, alarm time) for each alarm returned
+    """
+
+    clock.set_epoch(start)
+    fired = []
+
+    async def scenario():
+        scheduler = Scheduler(alarms)
+
+        async def consume():
+            while True:
+                alarm = await scheduler.wait()
+                fired.append((round(clock.epoch()), alarm.time))
+
+        task = uasyncio.create_task(consume())
+        await uasyncio.sleep(until - start)
+        task.cancel()
+        try:
+            await task
+        except uasyncio.CancelledError:
+            pass
+
+    virtual.run(scenario(), clock)
+    return fired
+
+
+def test_wait_across_the_clock_changes(virtual_clock):
+
+    alarms = [Alarm(1, 30, lead_s=0), Alarm(6, 0, days="sun", lead_s=0)]
+
+    fired = run_alarms(virtual_clock, alarms, utc(2026, 3, 28, 0, 0), utc(2026, 3, 30, 12, 0))
+    assert fired == [
+        (utc(2026, 3, 28, 1, 30), (1, 30)),
+        (utc(2026, 3, 29, 1, 30), (1, 30)),  # 02:30 summer time, as 01:30 was skipped
+        (utc(2026, 3, 29, 5, 0), (6, 0)),
+        (utc(2026, 3, 30, 0, 30), (1, 30)),
+        ]
+
+    # the repeated 01:30 only goes off the first time
+    fired = run_alarms(virtual_clock, alarms, utc(2026, 10, 24, 0, 0), utc(2026, 10, 26, 12, 0))
+    assert fired == [
+        (utc(2026, 10, 24, 0, 30), (1, 30)),
+        (utc(2026, 10, 25, 0, 30), (1, 30)),
+        (utc(2026, 10, 25, 6, 0), (6, 0)),
+        (utc(2026, 10, 26, 1, 30), (1, 30)),
+        ]
+
+
+def test_wait_skips_alarms_later_than_their_fade_in(virtual_clock):
+
+    virtual_clock.set_epoch(utc(2026, 1, 5, 6, 0))
+    alarm = Alarm(6, 35, fade_in_s=1200, lead_s=600)
+
+    async def late_by(seconds):
+        scheduler = Scheduler([alarm])
+        # e.g. another alarm was running when the lights were due to start at 06:25
+        virtual_clock.set_epoch(utc(2026, 1, 5, 6, 25) + seconds)
+        await scheduler.wait()
+        return round(virtual_clock.epoch())
+
+    # within the lead and fade-in time - goes off straight away
+    started, _ = virtual.run(late_by(1799), virtual_clock)
+    assert started == utc(2026, 1, 5, 6, 25) + 1799
+
+    # later - skipped, and the next day's goes off
+    virtual_clock.set_epoch(utc(2026, 1, 5, 6, 0))
+    started, _ = virtual.run(late_by(1800), virtual_clock)
+    assert started == utc(2026, 1, 6, 6, 25)
+
+
+def test_alarm_from_dict():
+
+    alarm = Alarm.from_dict({"time": "07:05", "days": "weekend", "fade_in_s": 600, "enabled": False})
+
+    assert alarm.time == (7, 5)
+    assert alarm.days == WEEKEND
+    assert alarm.fade_in_s == 600
+    assert alarm.enabled is False
+    assert Alarm.from_dict(alarm.to_dict()).to_dict() == alarm.to_dict()
+    assert Alarm.from_dict({"time": "07:05", "days": 3}).days == 3
+
+
+@pytest.mark.parametrize("settings", [
+    {"time": "07:00", "enabled": "false"},
+    {"time": "07:00", "enabled": 0},
+    {"time": "07:00", "days": ["mon", "tue"]},
+    {"time": "07:00", "days": True},
+    {"time": "07:00", "days": None},
+    {"time": "07:00", "fade_in_s": 1.5},
+    {"time": "07:00", "fade_out_s": "600"},
+    {"time": "07:00", "lead_s": True},
+    {"time": "7"},
+    {"days": "daily"},
+    ["07:00"],
+    ], ids=[
+    "enabled string", "enabled int", "days list", "days bool", "days null", "fade_in_s float",
+    "fade_out_s string", "lead_s bool", "time without minutes", "no time", "not a dict",
+    ])
+def test_alarm_from_dict_rejects_invalid_types(settings):
+    with pytest.raises(ValueError):
+        Alarm.from_dict(settings)
@@ -0,0 +1,61 @@
+import uasyncio
+
+from host import virtual
+from server import HTTPServer
+from streams import FakeReader, FakeWriter
+
+
+def serve(*segments: bytes) -> FakeWriter:
+    """
+    Serve one client connection delivering segments.
+    """
+
+    server = HTTPServer("ssid", "password")
+    writer = FakeWriter()
+    uasyncio.run(server.serve_client(FakeReader(*segments), writer))
+    return writer
+
+
+def test_non_utf8_request_line_gets_a_400():
+
+    writer = serve(b"\xff\xfe / HTTP/1.1\r\n\r\n")
+
+    assert writer.status_lines() == [b"HTTP/1.1 400 Bad Request"]
+    assert writer.closed
+
+
+def test_non_utf8_form_gets_a_400():
+
+    writer = serve(b"POST / HTTP/1.1\r\nConnection: close\r\nContent-Length: 14\r\n\r\npercentage=%FF")
+
+    assert writer.status_lines() == [b"HTTP/1.1 400 Bad Request"]
+    assert writer.closed
+
+
+def test_client_that_stops_reading_frees_its_slot(virtual_clock):
+
+    server = HTTPServer("ssid", "password")
+    writers = [FakeWriter(stalled=True) for _ in range(server.max_clients)]
+
+    async def scenario():
+        clients = [
+            uasyncio.create_task(server.serve_client(FakeReader(b"GET / HTTP/1.1\r\n\r\n"), writer))
+            for writer in writers
+            ]
+        await uasyncio.sleep_ms(server.request_timeout_ms // 2)
+        busy = server.active_clients
+        await uasyncio.sleep_ms(server.request_timeout_ms)
+        for client in clients:
+            assert client.done()
+
+        # so the next client is served, not turned away
+        writer = FakeWriter()
+        await server.serve_client(FakeReader(b"GET / HTTP/1.1\r\nConnection: close\r\n\r\n"), writer)
+        assert writer.status_lines() == [b"HTTP/1.1 200 OK"]
+        return busy
+
+    busy, _ = virtual.run(scenario(), virtual_clock)
+
+    assert busy == server.max_clients
+    assert server.active_clients == 0
+    assert all(writer.closed for writer in writers)
@@ -0,0 +1,115 @@
+import network
+import time
+import uasyncio
+from telemetry import telemetry
+
+
+class WiFiManager:
+    """
+    Connects to Wi-Fi in the background, and reconnects if the link drops.
+
+    Failed attempts are retried with exponential backoff, so an absent access point doesn't
+    keep the radio busy. Nothing waits on the connection: the LEDs and buttons run from
+    boot, and the server and time sync are told when the link comes up via on_connect.
+    """
+
+    def __init__(
+        self,
+        ssid: str,
+        password: str,
+        status_led=None,
+        connect_timeout_ms: int = 10000,
+        check_interval_ms: int = 5000,
+        backoff_initial_ms: int = 2000,
+        backoff_max_ms: int = 300000,
+        ):
+        """
+        Args:
+            ssid: network name
+            password: network password
+            status_led: Pin toggled while connecting, and turned off once connected
+            connect_timeout_ms: time allowed for each connection attempt
+            check_interval_ms: how often a connected link is checked
+            backoff_initial_ms: wait after the first failed attempt; doubles after each failure
+            backoff_max_ms: longest wait between attempts
+        """
+
+        self.ssid = ssid
+        self.password = password
+        self.status_led = status_led
+        self.connect_timeout_ms = connect_timeout_ms
+        self.check_interval_ms = check_interval_ms
+        self.backoff_initial_ms = backoff_initial_ms
+        self.backoff_max_ms = backoff_max_ms
+
+        self.wlan = network.WLAN(network.STA_IF)
+        self.ip = None
+        # set while connected
+        self.connected = uasyncio.Event()
+        # callables(ip), called each time the link comes up
+        self.on_connect = []
+
+        self.attempts = 0
+        self.reconnects = 0
+
+
+    async def connect(self) -> bool:
+        """
+        One connection attempt, polled without blocking the event loop.
+
+        Returns:
+            True if connected within connect_timeout_ms
+        """
+
+        print("Connecting to Wi-Fi...")
+        telemetry.wake("wifi")
+        self.attempts += 1
+        self.wlan.active(True)
+        self.wlan.connect(self.ssid, self.password)
+
+        start = time.ticks_ms()
+        while not self.wlan.isconnected():
+            if time.ticks_diff(time.ticks_ms(), start) >= self.connect_timeout_ms:
+                print("Failed to connect to Wi-Fi, status", self.wlan.status())
+                self.wlan.disconnect()
+                return False
+            if self.status_led:
+                self.status_led.toggle()
+            await uasyncio.sleep_ms(250)
+
+        self.ip = self.wlan.ifconfig()[0]
+        print(f"Connected on {self.ip}")
+        if self.status_led:
+            self.status_led.value(False)
+        return True
+
+
+    async def run(self):
+        """
+        Keep the link up for the lifetime of the program.
+        """
+
+        backoff_ms = self.backoff_initial_ms
+
+        while True:
+
+            if not await self.connect():
+                print(f"Retrying Wi-Fi in {backoff_ms // 1000} s")
+                await uasyncio.sleep_ms(backoff_ms)
+                backoff_ms = min(2 * backoff_ms, self.backoff_max_ms)
+                continue
+
+            backoff_ms = self.backoff_initial_ms
+            telemetry.mark("wifi_connected")
+            self.connected.set()
+            for callback in self.on_connect:
+                callback(self.ip)
+
+            # watch the link
+            while self.wlan.isconnected():
+                await uasyncio.sleep_ms(self.check_interval_ms)
+
+            print("Wi-Fi connection lost")
+            self.connected.clear()
+            self.ip = None
+            self.reconnects += 1